@@ -1,34 +1,133 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Request, Response, g, request, jsonify, render_template, send_file
 from flask_cors import CORS
 import numpy as np
-import librosa
-import joblib
+import json
 import os
-import subprocess
 import tempfile
 import random
+import shutil
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features import DURATION, SAMPLE_RATE, compute_features, compute_features_batch
+from audio_io import DecodeError, decode_window
+from feature_cache import DEFAULT_MAX_ENTRIES, FeatureCache, stream_key
+from streaming import StreamingFeatureExtractor, pcm_to_float32, stream_settings
+from resampling import StreamResampler
+from timeline import iter_segments
+from inference import DEFAULT_MODEL_PATH, INFERENCE_PRECISION, NumpyMLP
+from model_store import ModelStore
+from job_queue import REQUEST_TIMEOUT, JobQueue, QueueFull
+from batcher import MicroBatcher
+from metrics import Registry
+from profiling import Profiler
+from async_jobs import AsyncJobs
+from result_cache import RESULT_CACHE_SIZE, ResultCache
+import thread_limits
+
+try:
+    from flask_sock import Sock
+except ImportError:  # optional, only needed for the /stream WebSocket endpoint
+    Sock = None
+
+# Each BLAS/OpenMP pool gets INTRA_OP_THREADS threads, so the gunicorn processes
+# and their job threads don't oversubscribe the cores (see thread_limits.py)
+thread_limits.configure()
+
+# Uploads are kept in memory up to this size; larger ones spill to an anonymous,
+# uniquely named temp file in UPLOAD_DIR
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', 'uploads')
+UPLOAD_SPILL_BYTES = int(os.environ.get('UPLOAD_SPILL_BYTES', 10 * 1024 * 1024))
+
+def spooled_upload_file():
+    return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPILL_BYTES, dir=UPLOAD_DIR)
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return spooled_upload_file()
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)  # Enable CORS for all routes
 
 # Create uploads directory if it doesn't exist
-if not os.path.exists('uploads'):
-    os.makedirs('uploads')
+if not os.path.exists(UPLOAD_DIR):
+    os.makedirs(UPLOAD_DIR)
 
-# Load the trained model, scaler, and encoder
-try:
-    model = joblib.load('models/saved_model.pkl')
-    scaler = joblib.load('models/scaler.pkl')
-    encoder = joblib.load('models/label_encoder.pkl')
-    MODEL_AVAILABLE = True
-    print("Models loaded successfully!")
-except FileNotFoundError:
-    print("Warning: Trained models not found. Running in demo mode.")
-    print("To train models, run: python models/train_models.py")
-    model = None
-    scaler = None
-    encoder = None
-    MODEL_AVAILABLE = False
+# Load the trained model. The exported NumPy model (models/model.npz) needs no
+# sklearn; older pickled model/scaler/encoder files are converted on load.
+PICKLE_PATHS = ('models/saved_model.pkl', 'models/scaler.pkl', 'models/label_encoder.pkl')
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') != '0'
+# How long a request waits for the initial model load before using demo mode
+MODEL_LOAD_TIMEOUT = float(os.environ.get('MODEL_LOAD_TIMEOUT', 30.0))
+
+# INFERENCE_PRECISION=float32 or int8 serves a reduced-precision copy of the network
+def load_engine():
+    if os.path.exists(DEFAULT_MODEL_PATH):
+        engine = NumpyMLP.load(DEFAULT_MODEL_PATH)
+    else:
+        import joblib
+        model, scaler, encoder = (joblib.load(path) for path in PICKLE_PATHS)
+        engine = NumpyMLP.from_estimators(model, scaler, encoder)
+    if engine.precision != INFERENCE_PRECISION:
+        engine = engine.with_precision(INFERENCE_PRECISION)
+    return engine
+
+# The first feature extraction JIT-compiles librosa's kernels and pulls in
+# scipy; do it once on a dummy clip before reporting ready
+def warm_up(engine):
+    noise = np.random.default_rng(0).normal(scale=0.01, size=int(DURATION * SAMPLE_RATE)).astype(np.float32)
+    features = compute_features(noise, SAMPLE_RATE)
+    if engine is not None:
+        engine.predict(features.reshape(1, -1))
+
+# Loaded in the background so the server starts accepting requests at once;
+# reloaded and swapped whenever the artifacts change (MODEL_RELOAD_INTERVAL=0 disables)
+model_store = ModelStore(load_engine, (DEFAULT_MODEL_PATH,) + PICKLE_PATHS)
+model_store.start(warmup=warm_up if MODEL_WARMUP else None)
+
+def current_engine():
+    model_store.wait_loaded(MODEL_LOAD_TIMEOUT)
+    return model_store.engine
+
+# Feature vectors of previously seen uploads (FEATURE_CACHE_SIZE=0 disables it)
+feature_cache = FeatureCache() if DEFAULT_MAX_ENTRIES > 0 else None
+
+# Finished predictions by upload content and model version, so re-submitted clips
+# skip the queue and the model (RESULT_CACHE_SIZE=0 disables it)
+result_cache = ResultCache() if RESULT_CACHE_SIZE > 0 else None
+
+WEBM_CONVERSION_ERROR = 'Failed to convert WebM file.'
+
+# Batch prediction limits
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg', '.webm')
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 1000))
+# Uncompressed size of one archive member and of all members of a request, so
+# a small zip bomb can't fill memory or the spill directory
+BATCH_MAX_MEMBER_BYTES = int(os.environ.get('BATCH_MAX_MEMBER_BYTES', 100 * 1024 * 1024))
+BATCH_MAX_ARCHIVE_BYTES = int(os.environ.get('BATCH_MAX_ARCHIVE_BYTES', 1024 * 1024 * 1024))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+# Equal-length clips extracted together in one vectorized pass
+BATCH_EXTRACT_SIZE = int(os.environ.get('BATCH_EXTRACT_SIZE', 16))
+
+# Prometheus metrics, served on /metrics
+metrics = Registry('aurasense')
+REQUEST_SECONDS = metrics.histogram('request_seconds', 'Request latency by endpoint.', ('endpoint',))
+RESPONSES = metrics.counter('responses', 'Responses by endpoint and HTTP status.', ('endpoint', 'status'))
+STAGE_SECONDS = metrics.histogram('stage_seconds', 'Time spent in each processing stage.', ('stage',))
+PREDICTIONS = metrics.counter('predictions', 'Clips classified, by the model or in demo mode.', ('mode',))
+DECODE_FAILURES = metrics.counter('decode_failures', 'Uploads that could not be decoded.', ('format',))
+MICROBATCH_SIZE = metrics.histogram('microbatch_size', 'Clips per micro-batched forward pass.',
+                                    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+# Feature extraction and inference run on a bounded job queue (INFERENCE_WORKERS,
+# INFERENCE_QUEUE_SIZE, REQUEST_TIMEOUT); batches and timelines get longer
+job_queue = JobQueue(observer=lambda wait, run: STAGE_SECONDS.observe(wait, stage='job_queue_wait'))
+LONG_REQUEST_TIMEOUT = float(os.environ.get('LONG_REQUEST_TIMEOUT', 300.0))
 
 # Emotion to emoji and color mapping
 EMOTION_CONFIG = {
@@ -42,138 +141,607 @@ EMOTION_CONFIG = {
     'surprised': {'emoji': '😮', 'color': 'emotions-surprised', 'aura': 'aura-surprised'}
 }
 
-# Function to convert WebM to WAV using ffmpeg
-def convert_webm_to_wav(webm_path, wav_path):
-    try:
-        # Use ffmpeg to convert WebM to WAV
-        ffmpeg_path = r"C:\Users\panig\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0-full_build\bin\ffmpeg.exe"
-        cmd = [
-            ffmpeg_path, '-i', webm_path, 
-            '-acodec', 'pcm_s16le', 
-            '-ar', '22050', 
-            '-ac', '1', 
-            '-y', wav_path
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"FFmpeg conversion failed: {e}")
-        return False
-    except FileNotFoundError:
-        print("FFmpeg not found. Please install ffmpeg.")
-        return False
-
-# Function to extract features from an audio file
-def extract_features(file_path):
-    try:
-        data, sample_rate = librosa.load(file_path, duration=2.5, offset=0.6, sr=None)
-        
-        result = np.array([])
-        # ZCR
-        zcr = np.mean(librosa.feature.zero_crossing_rate(y=data).T, axis=0)
-        result = np.hstack((result, zcr))
-        # Chroma_stft
-        stft = np.abs(librosa.stft(data))
-        chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, chroma_stft))
-        # MFCC
-        mfcc = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, mfcc))
-        # RMS Value
-        rms = np.mean(librosa.feature.rms(y=data).T, axis=0)
-        result = np.hstack((result, rms))
-        # MelSpectogram
-        mel = np.mean(librosa.feature.melspectrogram(y=data, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, mel))
-        
-        return result
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
-        return None
-
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/health')
 def health():
+    status = model_store.status()
     return jsonify({
         'status': 'healthy',
-        'model_available': MODEL_AVAILABLE,
-        'message': 'AuraSense Backend is running' + (' (Demo Mode)' if not MODEL_AVAILABLE else ' (Full Mode)')
+        **status,
+        'inference_precision': INFERENCE_PRECISION,
+        'queue': job_queue.stats(),
+        'batcher': predict_batcher.stats(),
+        'async_jobs': async_jobs.stats(),
+        'result_cache': result_cache.stats() if result_cache is not None else None,
+        'threads': thread_limits.report(),
+        'message': 'AuraSense Backend is running' + (' (Demo Mode)' if not status['model_available'] else ' (Full Mode)')
+    })
+
+# Readiness probe: 503 until the model is loaded and the extractor warmed up
+@app.route('/ready')
+def ready():
+    status = model_store.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+# Run one scaler + MLP pass over a (n_clips, n_features) matrix
+def predict_emotions(feature_matrix):
+    # One engine per call, so a hot reload never mixes models within a batch
+    engine = current_engine()
+    if engine is not None:
+        # A single forward pass gives the labels and probabilities
+        with STAGE_SECONDS.time(stage='model'):
+            emotions, prediction_proba = engine.predict(feature_matrix)
+        PREDICTIONS.inc(len(feature_matrix), mode='model')
+        confidences = np.max(prediction_proba, axis=1) * 100  # Convert to percentage
+        return [(str(emotion), float(confidence)) for emotion, confidence in zip(emotions, confidences)]
+
+    # Demo mode - return random emotions with realistic confidence
+    PREDICTIONS.inc(len(feature_matrix), mode='demo')
+    emotions_list = list(EMOTION_CONFIG.keys())
+    results = []
+    for _ in range(len(feature_matrix)):
+        emotion = random.choice(emotions_list)
+        confidence = round(random.uniform(70, 95), 1)
+        results.append((emotion, confidence))
+    if len(results) == 1:
+        print(f"Demo mode: Returning {emotion} with {confidence}% confidence")
+    else:
+        print(f"Demo mode: Returning {len(results)} random predictions")
+    return results
+
+def observe_microbatch(size, waits, run):
+    MICROBATCH_SIZE.observe(size)
+    for wait in waits:
+        STAGE_SECONDS.observe(wait, stage='microbatch_wait')
+
+# Backpressure: a full queue is answered at once with a hint when to retry
+def busy_response(e):
+    response = jsonify({'error': 'Server is busy, please retry shortly.', 'retry_after': e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def timeout_response():
+    return jsonify({'error': 'Request timed out.'}), 504
+
+# Single clips from concurrent requests share one forward pass
+# (MICROBATCH_MAX_SIZE rows, MICROBATCH_MAX_WAIT_MS)
+predict_batcher = MicroBatcher(lambda feature_matrix: predict_emotions(feature_matrix),
+                               observer=observe_microbatch)
+
+metrics.gauge('job_queue_depth', 'Jobs running or waiting on the inference queue.',
+              lambda: job_queue.stats()['pending'])
+metrics.gauge('microbatch_backlog', 'Clips waiting for the micro-batcher.',
+              lambda: predict_batcher.stats()['backlog'])
+metrics.gauge('model_ready', '1 once the model is loaded and warmed up.', lambda: int(model_store.ready))
+metrics.gauge('model_info', 'Model version being served (demo when none).',
+              lambda: {(model_store.version or 'demo', model_store.state): 1}, ('version', 'state'))
+metrics.gauge('model_loaded_timestamp_seconds', 'When the current model was loaded.',
+              lambda: model_store.loaded_at)
+metrics.gauge('feature_cache_lookups', 'Feature cache lookups since start, by result.',
+              lambda: {} if feature_cache is None else {
+                  ('hit',): feature_cache.hits, ('miss',): feature_cache.misses}, ('result',))
+metrics.gauge('result_cache_lookups', 'Prediction result cache lookups since start, by result.',
+              lambda: {} if result_cache is None else {
+                  ('hit',): result_cache.hits, ('miss',): result_cache.misses}, ('result',))
+
+# Opt-in per-request profiles (PROFILE_TOKEN in an X-Profile header, or
+# PROFILE_SAMPLE_RATE), stored in PROFILE_DIR and listed on /profiles
+profiler = Profiler()
+
+def profile_id_for(name):
+    g.profile_id = profiler.request_profile(name, request.headers.get('X-Profile'))
+    return g.profile_id
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    if 'request_start' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+    profile_id = g.get('profile_id')
+    if profile_id is not None and profiler.path(profile_id) is not None:
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.route('/profiles')
+def list_profiles():
+    if not profiler.authorized(request.headers.get('X-Profile')):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'profiles': profiler.list()})
+
+# The raw .prof file (for pstats/snakeviz), or ?format=text for the top functions
+@app.route('/profiles/<profile_id>')
+def download_profile(profile_id):
+    if not profiler.authorized(request.headers.get('X-Profile')):
+        return jsonify({'error': 'Forbidden'}), 403
+    path = profiler.path(profile_id)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({'error': "sort must be 'cumulative', 'tottime' or 'calls'"}), 400
+        return Response(profiler.summary(profile_id, sort=sort), mimetype='text/plain')
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=profile_id + '.prof')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Multipart bodies are parsed (and spooled) on first access of request.files
+def uploaded_files():
+    with STAGE_SECONDS.time(stage='upload'):
+        return request.files
+
+def emotion_result(emotion, confidence):
+    # Get emotion configuration
+    emotion_config = EMOTION_CONFIG.get(emotion.lower(), {
+        'emoji': '🤷',
+        'color': 'emotions-neutral',
+        'aura': 'aura-neutral'
     })
 
+    return {
+        'emotion': emotion,
+        'confidence': confidence,
+        'emoji': emotion_config['emoji'],
+        'color': emotion_config['color'],
+        'aura': emotion_config['aura'],
+        'demo_mode': not model_store.available
+    }
+
 @app.route('/predict', methods=['POST'])
 def predict():
-    if 'file' not in request.files:
+    files = uploaded_files()
+    if 'file' not in files:
         return jsonify({'error': 'No file part'})
     
-    file = request.files['file']
+    file = files['file']
     
     if file.filename == '':
         return jsonify({'error': 'No selected file'})
 
-    temp_upload_path = None
     try:
-        temp_upload_path = os.path.join('uploads', "temp_" + file.filename)
-        file.save(temp_upload_path)
-
-        # Check if file needs conversion (WebM to WAV)
-        process_path = temp_upload_path
-        if file.filename.lower().endswith('.webm'):
-            wav_path = temp_upload_path.replace('.webm', '.wav')
-            if convert_webm_to_wav(temp_upload_path, wav_path):
-                process_path = wav_path
-            else:
-                return jsonify({'error': 'Failed to convert WebM file. Please try uploading a WAV or MP3 file.'})
+        cache_key, version, cached = cached_result(file.stream)
+        if cached is not None:
+            return jsonify(emotion_result(*cached))
+
+        # The upload is decoded straight from the request's (spooled) stream
+        features, error = job_queue.run(profiler.run, profile_id_for('predict'),
+                                        upload_features, file.filename, file.stream, cache_key)
+        if error == WEBM_CONVERSION_ERROR:
+            return jsonify({'error': 'Failed to convert WebM file. Please try uploading a WAV or MP3 file.'})
 
-        # Extract features
-        features = extract_features(process_path)
-        
         if features is not None:
-            if MODEL_AVAILABLE:
-                # Scale features and reshape for the model
-                features = scaler.transform(features.reshape(1, -1))
-                
-                # Predict using the MLP model and get probabilities
-                prediction = model.predict(features)
-                prediction_proba = model.predict_proba(features)
-                
-                # Get the emotion label and confidence
-                emotion = encoder.inverse_transform(prediction)[0]
-                confidence = float(np.max(prediction_proba) * 100)  # Convert to percentage
-            else:
-                # Demo mode - return random emotion with realistic confidence
-                import random
-                emotions_list = list(EMOTION_CONFIG.keys())
-                emotion = random.choice(emotions_list)
-                confidence = round(random.uniform(70, 95), 1)
-                print(f"Demo mode: Returning {emotion} with {confidence}% confidence")
-            
-            # Get emotion configuration
-            emotion_config = EMOTION_CONFIG.get(emotion.lower(), {
-                'emoji': '🤷',
-                'color': 'emotions-neutral',
-                'aura': 'aura-neutral'
-            })
-            
-            return jsonify({
-                'emotion': emotion,
-                'confidence': confidence,
-                'emoji': emotion_config['emoji'],
-                'color': emotion_config['color'],
-                'aura': emotion_config['aura'],
-                'demo_mode': not MODEL_AVAILABLE
-            })
+            emotion, confidence = predict_batcher.predict(features, timeout=REQUEST_TIMEOUT)
+            store_result(cache_key, version, (emotion, confidence))
+            return jsonify(emotion_result(emotion, confidence))
         else:
             return jsonify({'error': 'Feature extraction failed.'})
 
+    except QueueFull as e:
+        return busy_response(e)
+    except TimeoutError:
+        return timeout_response()
     except Exception as e:
         print(f"Error during prediction: {e}")
         return jsonify({'error': 'Failed to process audio file.'})
+
+class ArchiveTooLarge(Exception):
+    pass
+
+# Collect every uploaded file (or every audio member of an uploaded zip/tar) as
+# a seekable stream. Archive members are copied into spooled buffers that only
+# spill to disk above UPLOAD_SPILL_BYTES. Their sizes are checked against
+# BATCH_MAX_MEMBER_BYTES and BATCH_MAX_ARCHIVE_BYTES before anything is read;
+# zipfile and tarfile never return more than a member's declared size.
+# Returns a list of (filename, stream).
+def collect_batch_uploads(files, streams):
+    unpacked = [0]
+
+    def add(filename, size, open_member):
+        if len(streams) >= BATCH_MAX_FILES:
+            raise ValueError(f'Too many files in batch (max {BATCH_MAX_FILES})')
+        if size > BATCH_MAX_MEMBER_BYTES:
+            raise ArchiveTooLarge(f'{filename} is larger than {BATCH_MAX_MEMBER_BYTES} bytes uncompressed')
+        unpacked[0] += size
+        if unpacked[0] > BATCH_MAX_ARCHIVE_BYTES:
+            raise ArchiveTooLarge(f'Archive contents are larger than {BATCH_MAX_ARCHIVE_BYTES} bytes uncompressed')
+        source = open_member()
+        if source is None:
+            return
+        with source:
+            spool = spooled_upload_file()
+            shutil.copyfileobj(source, spool)
+        streams.append((filename, spool))
+
+    for file in files:
+        if file.filename == '':
+            continue
+        name = file.filename.lower()
+        if name.endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(AUDIO_EXTENSIONS):
+                        add(info.filename, info.file_size, lambda: archive.open(info))
+        elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+            with tarfile.open(fileobj=file.stream, mode='r:*') as archive:
+                for member in archive.getmembers():
+                    if member.isfile() and member.name.lower().endswith(AUDIO_EXTENSIONS):
+                        add(member.name, member.size, lambda: archive.extractfile(member))
+        else:
+            if len(streams) >= BATCH_MAX_FILES:
+                raise ValueError(f'Too many files in batch (max {BATCH_MAX_FILES})')
+            streams.append((file.filename, file.stream))
+    return streams
+
+# Content key, model version and cached (emotion, confidence) for an upload.
+# Nothing is cached in demo mode.
+def cached_result(stream):
+    version = model_store.version
+    if result_cache is None or version is None:
+        return None, None, None
+    with STAGE_SECONDS.time(stage='cache_lookup'):
+        cache_key = stream_key(stream)
+        return cache_key, version, result_cache.get(cache_key, version)
+
+def store_result(cache_key, version, prediction):
+    if cache_key is not None:
+        result_cache.put(cache_key, version, prediction)
+
+# Decode one upload stream, resampled to SAMPLE_RATE (the rate the model was
+# trained at). Repeat uploads are served from the feature cache without
+# decoding; cache_key skips re-hashing the stream. Returns (cache_key, cached
+# features, (data, sample_rate), error), with only one of the last three set.
+def decode_upload(filename, stream, cache_key=None):
+    if feature_cache is not None:
+        with STAGE_SECONDS.time(stage='cache_lookup'):
+            cache_key = cache_key or stream_key(stream)
+            features = feature_cache.get(cache_key)
+        if features is not None:
+            return cache_key, features, None, None
+
+    is_webm = filename.lower().endswith('.webm')
+    try:
+        with STAGE_SECONDS.time(stage='decode'):
+            return cache_key, None, decode_window(stream), None
+    except DecodeError as e:
+        print(f"Decoding {filename} failed: {e}")
+        DECODE_FAILURES.inc(format='webm' if is_webm else 'other')
+        return cache_key, None, None, WEBM_CONVERSION_ERROR if is_webm else 'Feature extraction failed.'
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return cache_key, None, None, 'Feature extraction failed.'
+
+def observe_feature_timings(timings):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=f'feature_{stage}')
+
+# The cache is an optimisation: failing to store a vector never fails the request
+def remember_features(cache_key, features):
+    if feature_cache is not None:
+        try:
+            feature_cache.put(cache_key, features)
+        except Exception as e:
+            print(f"Feature cache write failed: {e}")
+
+# Features for one decoded clip. Returns (features, None) or (None, error message).
+def clip_features(filename, cache_key, clip):
+    timings = {}
+    try:
+        features = compute_features(*clip, timings=timings)
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return None, 'Feature extraction failed.'
+    observe_feature_timings(timings)
+    remember_features(cache_key, features)
+    return features, None
+
+# Decode and extract features for one upload stream.
+# Returns (features, None) or (None, error message).
+def upload_features(filename, stream, cache_key=None):
+    cache_key, features, clip, error = decode_upload(filename, stream, cache_key)
+    if clip is None:
+        return features, error
+    return clip_features(filename, cache_key, clip)
+
+# Decode a chunk of uploads. The clips that share a length (every full analysis
+# window) are then extracted together in one vectorized pass.
+def extract_upload_chunk(chunk):
+    decoded = [decode_upload(*item) for item in chunk]
+    results = [(features, error) for _, features, _, error in decoded]
+    groups = {}
+    for k, (_, _, clip, _) in enumerate(decoded):
+        if clip is not None:
+            groups.setdefault((len(clip[0]), clip[1]), []).append(k)
+
+    for (_, sample_rate), rows in groups.items():
+        timings = {}
+        try:
+            matrix = compute_features_batch(np.stack([decoded[k][2][0] for k in rows]), sample_rate,
+                                            timings=timings)
+        except Exception as e:
+            # Clip by clip, so only the bad clip fails
+            print(f"Batch feature extraction failed, retrying clip by clip: {e}")
+            for k in rows:
+                results[k] = clip_features(chunk[k][0], decoded[k][0], decoded[k][2])
+            continue
+        # Per-clip share of the batch, so the stage histograms stay comparable
+        observe_feature_timings({stage: seconds / len(rows) for stage, seconds in timings.items()})
+        for k, features in zip(rows, matrix):
+            remember_features(decoded[k][0], features)
+            results[k] = (features, None)
+    return results
+
+# Chunks of up to BATCH_EXTRACT_SIZE uploads run on BATCH_WORKERS threads;
+# only the chunks in flight are held decoded
+def extract_uploads(uploads):
+    size = max(1, min(BATCH_EXTRACT_SIZE, -(-len(uploads) // BATCH_WORKERS)))
+    chunks = [uploads[k:k + size] for k in range(0, len(uploads), size)]
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        return [result for results in pool.map(extract_upload_chunk, chunks) for result in results]
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    files = uploaded_files()
+    files = files.getlist('files') or files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No file part'})
+
+    uploads = []
+    try:
+        try:
+            collect_batch_uploads(files, uploads)
+        except ArchiveTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+            return jsonify({'error': str(e)})
+        if not uploads:
+            return jsonify({'error': 'No audio files found'})
+
+        # Extract features for all files in parallel, as one job on the queue
+        extracted = job_queue.run(extract_uploads, uploads, timeout=LONG_REQUEST_TIMEOUT)
+
+        # One scaler + MLP pass over every clip that was extracted
+        ok = [i for i, (features, _) in enumerate(extracted) if features is not None]
+        predictions = {}
+        if ok:
+            feature_matrix = np.vstack([extracted[i][0] for i in ok])
+            predictions = dict(zip(ok, predict_emotions(feature_matrix)))
+
+        results = []
+        for i, (filename, _) in enumerate(uploads):
+            if i in predictions:
+                results.append({'filename': filename, **emotion_result(*predictions[i])})
+            else:
+                results.append({'filename': filename, 'error': extracted[i][1]})
+
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'failed': len(results) - len(predictions),
+            'demo_mode': not model_store.available
+        })
+    except QueueFull as e:
+        return busy_response(e)
+    except TimeoutError:
+        return timeout_response()
+    except Exception as e:
+        print(f"Error during batch prediction: {e}")
+        return jsonify({'error': 'Failed to process audio files.'})
     finally:
-        if temp_upload_path and os.path.exists(temp_upload_path):
-            os.remove(temp_upload_path)
+        for _, stream in uploads:
+            stream.close()
+
+TIMELINE_OPTIONS_ERROR = "mode must be 'fixed' or 'vad' and hop a positive number of seconds"
+
+def timeline_options(form):
+    mode = form.get('mode', 'fixed')
+    try:
+        hop = float(form.get('hop', DURATION))
+    except ValueError:
+        raise ValueError(TIMELINE_OPTIONS_ERROR)
+    if mode not in ('fixed', 'vad') or hop <= 0:
+        raise ValueError(TIMELINE_OPTIONS_ERROR)
+    return mode, hop
+
+# Classify the voiced segments of a timeline in one batch
+def build_timeline(segments):
+    voiced = [segment['features'] for segment in segments if segment['features'] is not None]
+    predictions = iter(predict_emotions(np.vstack(voiced)) if voiced else [])
+
+    timeline = []
+    emotion_counts = {}
+    for segment in segments:
+        entry = {'start': segment['start'], 'end': segment['end']}
+        if segment['features'] is None:
+            entry['silence'] = True
+        else:
+            entry.update(emotion_result(*next(predictions)))
+            emotion_counts[entry['emotion']] = emotion_counts.get(entry['emotion'], 0) + 1
+        timeline.append(entry)
+
+    return {
+        'timeline': timeline,
+        'segments': len(timeline),
+        'duration': segments[-1]['end'],
+        'emotion_counts': emotion_counts,
+        'dominant_emotion': max(emotion_counts, key=emotion_counts.get) if emotion_counts else None,
+        'demo_mode': not model_store.available
+    }
+
+# Emotion timeline for a long recording: the upload is decoded block by block
+# and cut into 2.5s windows (every `hop` seconds, non-overlapping by default).
+# With mode=vad, mostly silent windows are reported as silence and skipped by
+# the model. All windows go through the scaler and MLP in one batch.
+@app.route('/predict_timeline', methods=['POST'])
+def predict_timeline():
+    files = uploaded_files()
+    if 'file' not in files:
+        return jsonify({'error': 'No file part'})
+
+    file = files['file']
+
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'})
+
+    try:
+        mode, hop = timeline_options(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+
+    try:
+        segments = job_queue.run(
+            profiler.run, profile_id_for('timeline'),
+            lambda: list(iter_segments(file.stream, hop=hop, vad=mode == 'vad')),
+            timeout=LONG_REQUEST_TIMEOUT
+        )
+    except QueueFull as e:
+        return busy_response(e)
+    except TimeoutError:
+        return timeout_response()
+    except DecodeError as e:
+        print(f"Decoding {file.filename} failed: {e}")
+        return jsonify({'error': 'Failed to decode audio file.'})
+    except Exception as e:
+        print(f"Error during timeline prediction: {e}")
+        return jsonify({'error': 'Failed to process audio file.'})
+    if not segments:
+        return jsonify({'error': 'No audio found in file.'})
+
+    return jsonify(build_timeline(segments))
+
+# Asynchronous jobs (see async_jobs.py): POST /jobs returns a job id at once and
+# ASYNC_JOB_WORKERS background threads run the prediction or timeline. Results
+# are polled on /jobs/<id> or POSTed to a local callback_url.
+def run_async_job(record, upload_path):
+    options = record['options']
+    with open(upload_path, 'rb') as stream:
+        if record['kind'] == 'timeline':
+            try:
+                segments = list(iter_segments(stream, hop=options['hop'], vad=options['mode'] == 'vad'))
+            except DecodeError:
+                raise ValueError('Failed to decode audio file.')
+            if not segments:
+                raise ValueError('No audio found in file.')
+            return build_timeline(segments)
+        cache_key, version, cached = cached_result(stream)
+        if cached is not None:
+            return emotion_result(*cached)
+        features, error = upload_features(record['filename'], stream, cache_key)
+    if features is None:
+        raise ValueError(error)
+    prediction = predict_batcher.predict(features, timeout=REQUEST_TIMEOUT)
+    store_result(cache_key, version, prediction)
+    return emotion_result(*prediction)
+
+async_jobs = AsyncJobs(run_async_job).start()
+
+metrics.gauge('async_jobs_pending', 'Asynchronous jobs waiting for a worker.', lambda: async_jobs.stats()['pending'])
+
+def job_view(record):
+    return {**record, 'status_url': f"/jobs/{record['id']}"}
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    files = uploaded_files()
+    if 'file' not in files or files['file'].filename == '':
+        return jsonify({'error': 'No file part'}), 400
+    file = files['file']
+
+    kind = request.form.get('kind', 'predict')
+    options = {}
+    if kind == 'timeline':
+        try:
+            mode, hop = timeline_options(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        options = {'mode': mode, 'hop': hop}
+    elif kind != 'predict':
+        return jsonify({'error': "kind must be 'predict' or 'timeline'"}), 400
+
+    try:
+        record = async_jobs.submit(kind, file.stream, file.filename, options, request.form.get('callback_url'))
+    except QueueFull as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(job_view(record))
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{record['id']}"
+    return response
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    record = async_jobs.get(job_id)
+    if record is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_view(record))
+
+# Live emotion updates over a WebSocket. The client may first send a JSON text
+# message such as {"sample_rate": 16000, "format": "s16", "hop": 0.25}, then
+# binary messages of mono little-endian PCM. Every hop the server replies with
+# the emotion of the last 2.5 seconds: {"time": ..., "emotion": ..., ...}.
+def stream_emotions(ws):
+    config = {}
+    extractor = None
+    resampler = None  # client rate -> SAMPLE_RATE
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+        if isinstance(message, str):
+            if message == 'stop':
+                break
+            try:
+                parsed = json.loads(message)
+                if not isinstance(parsed, dict):
+                    raise TypeError('stream configuration must be a JSON object')
+                sample_rate, hop = stream_settings(parsed)
+                resampler = StreamResampler(sample_rate, SAMPLE_RATE)
+                extractor = StreamingFeatureExtractor(hop=hop)
+                config = parsed
+            except (ValueError, TypeError, OverflowError):
+                ws.send(json.dumps({'error': 'Invalid stream configuration'}))
+            continue
+
+        if extractor is None:
+            extractor = StreamingFeatureExtractor()
+            resampler = StreamResampler(SAMPLE_RATE, SAMPLE_RATE)
+        try:
+            samples = pcm_to_float32(message, config.get('format', 'f32'))
+        except ValueError as e:
+            ws.send(json.dumps({'error': str(e)}))
+            continue
+
+        emitted = extractor.push(resampler.push(samples))
+        if emitted:
+            # Hops are batched with other streams' and requests' clips
+            pending = [predict_batcher.submit(features) for _, features in emitted]
+            for (end, _), future in zip(emitted, pending):
+                try:
+                    prediction = future.result(REQUEST_TIMEOUT)
+                except FutureTimeoutError:
+                    # The rest of this chunk's hops are queued behind it; drop them too
+                    for waiting in pending:
+                        waiting.cancel()
+                    ws.send(json.dumps({'time': round(end, 3), 'error': 'Request timed out.'}))
+                    break
+                ws.send(json.dumps({'time': round(end, 3), **emotion_result(*prediction)}))
+
+if Sock is not None:
+    Sock(app).route('/stream')(stream_emotions)
+else:
+    print("flask-sock not installed: the /stream WebSocket endpoint is disabled.")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
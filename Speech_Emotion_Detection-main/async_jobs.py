@@ -0,0 +1,398 @@
+"""
+Asynchronous jobs for uploads that take too long to answer in one request.
+
+POST /jobs saves the upload under JOB_DIR and returns a job id at once. A pool
+of ASYNC_JOB_WORKERS threads takes jobs off a local queue, runs them, and
+stores the result. Clients poll GET /jobs/<id>, or name a callback URL that
+gets the finished job POSTed to it as JSON. Callbacks may only go to
+JOB_CALLBACK_HOSTS (local hosts by default).
+
+The queue is pluggable (ASYNC_JOB_BACKEND):
+
+  sqlite   jobs.sqlite3 in JOB_DIR; survives restarts and is shared by every
+           gunicorn worker using the same JOB_DIR (default). A claimed job
+           is leased to its backend (host:pid:instance) for JOB_LEASE seconds and the
+           lease is renewed while it runs; a job whose lease ran out (its
+           process died) is queued again for the next claim.
+  memory   a dict and a condition variable, for tests and single-process runs
+
+Both keep the same job records: id, kind, status (queued, running, done,
+failed), timestamps, options, result or error, and callback delivery status.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+JOB_DIR = os.environ.get('JOB_DIR', 'data/jobs')
+ASYNC_JOB_BACKEND = os.environ.get('ASYNC_JOB_BACKEND', 'sqlite')
+ASYNC_JOB_WORKERS = int(os.environ.get('ASYNC_JOB_WORKERS', 2))
+# Queued jobs beyond this are refused with 429
+ASYNC_JOB_MAX_PENDING = int(os.environ.get('ASYNC_JOB_MAX_PENDING', 1000))
+# Finished jobs (and their uploads) are deleted after this many seconds
+JOB_TTL = float(os.environ.get('JOB_TTL', 24 * 3600))
+JOB_CALLBACK_HOSTS = tuple(
+    host.strip() for host in os.environ.get('JOB_CALLBACK_HOSTS', 'localhost,127.0.0.1,::1').split(',')
+    if host.strip()
+)
+# A running job whose process stops renewing its lease for this long is run again
+JOB_LEASE = float(os.environ.get('JOB_LEASE', 60))
+CALLBACK_TIMEOUT = 5.0
+CALLBACK_ATTEMPTS = 3
+
+FINISHED = ('done', 'failed')
+
+
+def new_record(kind, filename=None, options=None, callback_url=None):
+    return {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'status': 'queued',
+        'filename': filename,
+        'options': options or {},
+        'callback_url': callback_url,
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'result': None,
+        'error': None,
+        'callback_status': None,
+    }
+
+
+def validate_callback(url):
+    """Raise ValueError unless url is an http(s) URL on an allowed host."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError('callback_url must be an http(s) URL')
+    if '*' not in JOB_CALLBACK_HOSTS and parsed.hostname not in JOB_CALLBACK_HOSTS:
+        raise ValueError(f"callback_url host must be one of {', '.join(JOB_CALLBACK_HOSTS)}")
+
+
+class MemoryBackend:
+    """In-process job queue. Jobs are lost on restart."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._queue = []
+        self._cond = threading.Condition()
+
+    def enqueue(self, record):
+        with self._cond:
+            self._jobs[record['id']] = dict(record)
+            self._queue.append(record['id'])
+            self._cond.notify()
+
+    def claim(self, timeout=None):
+        """Take the oldest queued job and mark it running, or None after timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queue, timeout):
+                return None
+            record = self._jobs[self._queue.pop(0)]
+            record.update(status='running', started_at=time.time())
+            return dict(record)
+
+    def update(self, job_id, **fields):
+        with self._cond:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._cond:
+            record = self._jobs.get(job_id)
+            return dict(record) if record is not None else None
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def purge(self, before):
+        """Drop finished jobs older than `before`; returns their ids."""
+        with self._cond:
+            old = [job_id for job_id, record in self._jobs.items()
+                   if record['status'] in FINISHED and record['finished_at'] < before]
+            for job_id in old:
+                del self._jobs[job_id]
+            return old
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Job queue in a local SQLite file, shared between processes."""
+
+    FIELDS = ('id', 'kind', 'status', 'filename', 'options', 'callback_url', 'created_at', 'started_at',
+              'finished_at', 'result', 'error', 'callback_status')
+    JSON_FIELDS = ('options', 'result')
+
+    # Who is running a job and until when, kept out of the job records
+    LEASE_FIELDS = ('owner', 'lease_until')
+
+    def __init__(self, path, poll_interval=0.2, lease=JOB_LEASE):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._closed = threading.Event()
+        self._heartbeat = None
+        self._instance = uuid.uuid4().hex[:8]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as db:
+            db.execute(f"CREATE TABLE IF NOT EXISTS jobs ({', '.join(self.FIELDS + self.LEASE_FIELDS)}, "
+                       "PRIMARY KEY (id))")
+            columns = {row['name'] for row in db.execute('PRAGMA table_info(jobs)')}
+            for name in self.LEASE_FIELDS:
+                if name not in columns:  # a queue file from before leases
+                    db.execute(f'ALTER TABLE jobs ADD COLUMN {name}')
+            db.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)')
+
+    @property
+    def owner(self):
+        # Per call, so a forked worker never renews its parent's leases
+        return f'{socket.gethostname()}:{os.getpid()}:{self._instance}'
+
+    def _renew_leases(self, pid):
+        while not self._closed.wait(self.lease / 3) and os.getpid() == pid:
+            try:
+                with self._connect() as db:
+                    db.execute("UPDATE jobs SET lease_until = ? WHERE status = 'running' AND owner = ?",
+                               (time.time() + self.lease, self.owner))
+            except sqlite3.Error as e:
+                print(f"Renewing job leases failed: {e}")
+
+    def _start_heartbeat(self):
+        with self._wakeup:
+            if self._heartbeat is None or self._heartbeat[0] != os.getpid():
+                thread = threading.Thread(target=self._renew_leases, args=(os.getpid(),), daemon=True,
+                                          name='job-lease')
+                thread.start()
+                self._heartbeat = (os.getpid(), thread)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            # Readers (status polls) don't block the workers' writes
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return _Transaction(db)
+
+    def _encode(self, record):
+        return [json.dumps(record[name]) if name in self.JSON_FIELDS else record[name] for name in self.FIELDS]
+
+    def _decode(self, row):
+        record = dict(row)
+        for name in self.JSON_FIELDS:
+            record[name] = json.loads(record[name]) if record[name] is not None else None
+        return record
+
+    def enqueue(self, record):
+        with self._connect() as db:
+            db.execute(f"INSERT INTO jobs ({', '.join(self.FIELDS)}) VALUES ({', '.join('?' * len(self.FIELDS))})",
+                       self._encode(record))
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def claim(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._start_heartbeat()
+        while True:
+            with self._connect() as db:
+                now = time.time()
+                # Jobs whose process died (lease not renewed) start over
+                db.execute("UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL, lease_until = NULL "
+                           "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (now,))
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = 'running', started_at = ?, owner = ?, lease_until = ? "
+                               "WHERE id = ?", (now, self.owner, now + self.lease, row['id']))
+            if row is not None:
+                return self.get(row['id'])
+            remaining = self.poll_interval if deadline is None else min(self.poll_interval,
+                                                                        deadline - time.monotonic())
+            if remaining <= 0:
+                return None
+            # Woken at once by enqueues in this process; other processes' jobs are polled for
+            with self._wakeup:
+                self._wakeup.wait(remaining)
+
+    def update(self, job_id, **fields):
+        names = list(fields)
+        values = [json.dumps(fields[name]) if name in self.JSON_FIELDS else fields[name] for name in names]
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {', '.join(name + ' = ?' for name in names)} WHERE id = ?",
+                       values + [job_id])
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(self.FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def pending(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def purge(self, before):
+        with self._connect() as db:
+            old = [row['id'] for row in db.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (before,))]
+            db.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in old])
+        return old
+
+    def close(self):
+        self._closed.set()
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block, so a claim can't race another process."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def make_backend(name=ASYNC_JOB_BACKEND, job_dir=JOB_DIR):
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(os.path.join(job_dir, 'jobs.sqlite3'))
+    raise ValueError(f"Unknown ASYNC_JOB_BACKEND '{name}', expected 'sqlite' or 'memory'")
+
+
+def post_callback(url, record):
+    """POST the job as JSON; returns the HTTP status, or an error string after CALLBACK_ATTEMPTS tries."""
+    body = json.dumps(record).encode()
+    error = None
+    for attempt in range(CALLBACK_ATTEMPTS):
+        try:
+            request = Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+            with urlopen(request, timeout=CALLBACK_TIMEOUT) as response:
+                return response.status
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            time.sleep(0.5 * 2 ** attempt)
+    print(f"Callback for job {record['id']} to {url} failed: {error}")
+    return error
+
+
+class AsyncJobs:
+    """
+    Job submission plus the worker threads that run them.
+
+    handler(record, upload_path) runs a job and returns its JSON-serialisable
+    result; an exception marks the job failed with its message.
+    """
+
+    def __init__(self, handler, backend=None, workers=ASYNC_JOB_WORKERS, job_dir=JOB_DIR,
+                 max_pending=ASYNC_JOB_MAX_PENDING, ttl=JOB_TTL):
+        self.handler = handler
+        self.job_dir = job_dir
+        self.backend = backend if backend is not None else make_backend(job_dir=job_dir)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._stopped = threading.Event()
+        self._threads = []
+        self._last_purge = 0.0
+        os.makedirs(os.path.join(job_dir, 'uploads'), exist_ok=True)
+
+    def upload_path(self, job_id):
+        return os.path.join(self.job_dir, 'uploads', job_id)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'async-job-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, kind, stream, filename=None, options=None, callback_url=None):
+        """
+        Save the upload stream and queue the job; returns its record.
+        Raises job_queue.QueueFull when max_pending jobs are already waiting.
+        """
+        from job_queue import QueueFull
+
+        if self.backend.pending() >= self.max_pending:
+            raise QueueFull(retry_after=5)
+        if callback_url:
+            validate_callback(callback_url)
+        record = new_record(kind, filename, options, callback_url)
+        path = self.upload_path(record['id'])
+        with open(path + '.tmp', 'wb') as f:
+            while True:
+                chunk = stream.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+        os.replace(path + '.tmp', path)
+        self.backend.enqueue(record)
+        return record
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'workers': self.workers, 'pending': self.backend.pending()}
+
+    def _work(self):
+        while not self._stopped.is_set():
+            self._purge()
+            record = self.backend.claim(timeout=1.0)
+            if record is not None:
+                self.run(record)
+
+    def run(self, record):
+        job_id = record['id']
+        try:
+            result = self.handler(record, self.upload_path(job_id))
+            fields = {'status': 'done', 'result': result}
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            fields = {'status': 'failed', 'error': str(e) or type(e).__name__}
+        fields['finished_at'] = time.time()
+        self.backend.update(job_id, **fields)
+        try:
+            os.remove(self.upload_path(job_id))
+        except OSError:
+            pass
+        if record.get('callback_url'):
+            status = post_callback(record['callback_url'], self.backend.get(job_id))
+            self.backend.update(job_id, callback_status=status)
+
+    def _purge(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        for job_id in self.backend.purge(now - self.ttl):
+            try:
+                os.remove(self.upload_path(job_id))
+            except OSError:
+                pass
+
+    def shutdown(self, timeout=None):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.backend.close()
@@ -0,0 +1,261 @@
+"""
+In-memory audio decoding for uploads.
+
+A source is raw bytes, a path, or a seekable binary file object (for example
+a SpooledTemporaryFile holding a request upload).
+
+Backends are tried in order:
+  1. soundfile (libsndfile): WAV, FLAC, OGG and, with libsndfile >= 1.1, MP3
+  2. PyAV (bundled FFmpeg libraries): WebM/Opus, M4A and anything else FFmpeg reads
+  3. an ffmpeg binary (FFMPEG_BINARY, or `ffmpeg` on PATH) reading stdin and
+     writing raw float32 samples to stdout
+
+None of them write to disk. The result is always a mono float32 signal.
+soundfile and PyAV decode at the native rate and resample with
+resampling.resample, the same resampler whatever the format; the ffmpeg
+binary resamples itself, as raw PCM output needs a fixed rate.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import threading
+
+import numpy as np
+import soundfile as sf
+
+from features import DURATION, OFFSET, SAMPLE_RATE
+from resampling import StreamResampler, resample
+
+try:
+    import av
+except ImportError:  # optional, the ffmpeg binary is used instead
+    av = None
+
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg')
+
+
+class DecodeError(Exception):
+    """Raised when no backend can decode the audio."""
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def _read(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    source.seek(0)
+    return source.read()
+
+
+def _trim(data, sample_rate, offset, duration):
+    # Same frame arithmetic as librosa.load
+    start = int(offset * sample_rate)
+    end = None if duration is None else start + int(duration * sample_rate)
+    return data[start:end]
+
+
+def _decode_soundfile(source, sr, offset, duration):
+    # Same order as librosa.load: seek and read at the native rate, downmix, then resample
+    with sf.SoundFile(_open(source)) as f:
+        native_sr = f.samplerate
+        start = int(offset * native_sr)
+        if start:
+            f.seek(start)
+        frames = -1 if duration is None else int(duration * native_sr)
+        samples = f.read(frames=frames, dtype='float32', always_2d=True)
+    samples = np.mean(samples, axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    if sr is not None and sr != native_sr:
+        return resample(samples, native_sr, sr), sr
+    return np.ascontiguousarray(samples), native_sr
+
+
+def _decode_pyav(source, sr, offset, duration):
+    with av.open(_open(source), mode='r') as container:
+        stream = container.streams.audio[0]
+        # Downmix only; resampling is left to resampling.resample
+        rate = stream.codec_context.sample_rate or stream.rate
+        resampler = av.AudioResampler(format='flt', layout='mono', rate=rate)
+        chunks = []
+        for frame in container.decode(stream):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().reshape(-1))
+    if not chunks:
+        raise DecodeError('no audio frames decoded')
+    samples = _trim(np.concatenate(chunks).astype(np.float32, copy=False), rate, offset, duration)
+    if sr is not None and sr != rate:
+        return resample(samples, rate, sr), sr
+    return samples, rate
+
+
+def _decode_ffmpeg(source, sr, offset, duration, ffmpeg_binary=None):
+    ffmpeg_binary = ffmpeg_binary or FFMPEG_BINARY
+    if not ffmpeg_binary:
+        raise DecodeError('ffmpeg not found. Install ffmpeg or set FFMPEG_BINARY.')
+    # Raw PCM carries no header, so the output rate has to be fixed up front
+    rate = sr or SAMPLE_RATE
+    if isinstance(source, (str, os.PathLike)):
+        input_arg, data = os.fspath(source), None
+    else:
+        input_arg, data = 'pipe:0', _read(source)
+    cmd = [
+        ffmpeg_binary, '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-i', input_arg,
+        '-f', 'f32le', '-acodec', 'pcm_f32le',
+        '-ar', str(rate),
+        '-ac', '1',
+        'pipe:1'
+    ]
+    try:
+        result = subprocess.run(cmd, input=data, check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise DecodeError(f'ffmpeg decoding failed: {e}') from e
+    samples = np.frombuffer(result.stdout, dtype='<f4').astype(np.float32)
+    return _trim(samples, rate, offset, duration), rate
+
+
+def decode_audio(source, sr=SAMPLE_RATE, offset=0.0, duration=None):
+    """
+    Decode bytes, a path or a binary file object to (mono float32 signal, sample rate).
+
+    sr=None keeps the native rate (the ffmpeg fallback then uses SAMPLE_RATE).
+    offset and duration are in seconds, as in librosa.load.
+    """
+    errors = []
+    try:
+        return _decode_soundfile(source, sr, offset, duration)
+    except Exception as e:
+        errors.append(f'soundfile: {e}')
+    if av is not None:
+        try:
+            return _decode_pyav(source, sr, offset, duration)
+        except Exception as e:
+            errors.append(f'pyav: {e}')
+    try:
+        return _decode_ffmpeg(source, sr, offset, duration)
+    except DecodeError as e:
+        errors.append(f'ffmpeg: {e}')
+    raise DecodeError('; '.join(errors))
+
+
+def decode_window(source, sr=SAMPLE_RATE):
+    """Decode only the analysis window used by the feature extractor."""
+    return decode_audio(source, sr=sr, offset=OFFSET, duration=DURATION)
+
+
+def _soundfile_blocks(f, sr, block_seconds):
+    native_sr = f.samplerate
+    rate = sr or native_sr
+    resampler = StreamResampler(native_sr, rate)
+    for block in f.blocks(blocksize=max(1, int(block_seconds * native_sr)), dtype='float32', always_2d=True):
+        samples = resampler.push(np.mean(block, axis=1) if block.shape[1] > 1 else block[:, 0])
+        if len(samples):
+            yield samples, rate
+    tail = resampler.flush()
+    if len(tail):
+        yield tail, rate
+
+
+def _pyav_blocks(container, sr, block_seconds):
+    stream = container.streams.audio[0]
+    native_sr = stream.codec_context.sample_rate or stream.rate
+    rate = sr or native_sr
+    downmix = av.AudioResampler(format='flt', layout='mono', rate=native_sr,
+                                frame_size=max(1, int(block_seconds * native_sr)))
+    resampler = StreamResampler(native_sr, rate)
+    for frame in container.decode(stream):
+        for out in downmix.resample(frame):
+            samples = resampler.push(out.to_ndarray().reshape(-1))
+            if len(samples):
+                yield samples, rate
+    for out in downmix.resample(None):
+        samples = resampler.push(out.to_ndarray().reshape(-1))
+        if len(samples):
+            yield samples, rate
+    tail = resampler.flush()
+    if len(tail):
+        yield tail, rate
+
+
+def _ffmpeg_blocks(source, sr, block_seconds):
+    if not FFMPEG_BINARY:
+        raise DecodeError('ffmpeg not found. Install ffmpeg or set FFMPEG_BINARY.')
+    rate = sr or SAMPLE_RATE
+    from_path = isinstance(source, (str, os.PathLike))
+    cmd = [
+        FFMPEG_BINARY, '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-i', os.fspath(source) if from_path else 'pipe:0',
+        '-f', 'f32le', '-acodec', 'pcm_f32le',
+        '-ar', str(rate),
+        '-ac', '1',
+        'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdin=None if from_path else subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def feed():
+        # Write the input from a thread so that reading stdout can't deadlock
+        try:
+            handle = _open(source)
+            for chunk in iter(lambda: handle.read(1 << 20), b''):
+                process.stdin.write(chunk)
+        except (OSError, ValueError):
+            pass
+        finally:
+            process.stdin.close()
+
+    if not from_path:
+        threading.Thread(target=feed, daemon=True).start()
+    try:
+        block_bytes = max(4, int(block_seconds * rate) * 4)
+        for chunk in iter(lambda: process.stdout.read(block_bytes), b''):
+            usable = len(chunk) - len(chunk) % 4
+            yield np.frombuffer(chunk[:usable], dtype='<f4').astype(np.float32), rate
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def iter_audio_blocks(source, sr=SAMPLE_RATE, block_seconds=10.0):
+    """
+    Decode a (possibly hours-long) file block by block, yielding
+    (mono float32 samples, sample rate) pairs of about block_seconds each.
+    Memory use doesn't depend on the length of the file.
+    """
+    errors = []
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        f = sf.SoundFile(_open(source))
+    except Exception as e:
+        errors.append(f'soundfile: {e}')
+    else:
+        with f:
+            yield from _soundfile_blocks(f, sr, block_seconds)
+        return
+    if av is not None:
+        try:
+            container = av.open(_open(source), mode='r')
+        except Exception as e:
+            errors.append(f'pyav: {e}')
+        else:
+            with container:
+                yield from _pyav_blocks(container, sr, block_seconds)
+            return
+    if not FFMPEG_BINARY:
+        errors.append('ffmpeg: not found')
+        raise DecodeError('; '.join(errors))
+    yield from _ffmpeg_blocks(source, sr, block_seconds)
@@ -0,0 +1,110 @@
+"""
+Dynamic micro-batching of model calls from concurrent requests.
+
+Each request submits its feature vector and gets a Future back. A single
+thread takes the first waiting row, collects more for up to `max_wait`
+seconds or until `max_batch` rows are gathered, runs the batch through the
+model in one call and hands every request its own row of the result.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent import futures
+
+import numpy as np
+
+MICROBATCH_MAX_SIZE = int(os.environ.get('MICROBATCH_MAX_SIZE', 64))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get('MICROBATCH_MAX_WAIT_MS', 2.0))
+
+
+class MicroBatcher:
+    """
+    `fn` takes a (n, n_features) matrix and returns n results in row order.
+    """
+
+    def __init__(self, fn, max_batch=MICROBATCH_MAX_SIZE, max_wait=MICROBATCH_MAX_WAIT_MS / 1000.0,
+                 name='microbatcher', observer=None):
+        self._fn = fn
+        self.observer = observer  # called with (batch size, per-row waits, run time) in seconds
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue one feature vector; the Future resolves to its result."""
+        future = futures.Future()
+        self._queue.put((np.asarray(row).reshape(-1), future, time.perf_counter()))
+        return future
+
+    def predict(self, row, timeout=None):
+        future = self.submit(row)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Prediction did not finish within {timeout}s") from None
+
+    def _loop(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(items) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._run(items)
+
+    def _run(self, items):
+        # Requests that gave up (timed out and cancelled) are left out
+        items = [item for item in items if item[1].set_running_or_notify_cancel()]
+        if not items:
+            return
+        start = time.perf_counter()
+        try:
+            results = self._fn(np.vstack([row for row, _, _ in items]))
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(items, results):
+                future.set_result(result)
+        end = time.perf_counter()
+
+        waits = [start - queued for _, _, queued in items]
+        with self._lock:
+            self.batches += 1
+            self.items += len(items)
+            self.largest_batch = max(self.largest_batch, len(items))
+            self._wait_seconds += sum(waits)
+            self._run_seconds += end - start
+        if self.observer is not None:
+            self.observer(len(items), waits, end - start)
+
+    def stats(self):
+        with self._lock:
+            items = max(self.items, 1)
+            return {
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': round(self.items / max(self.batches, 1), 2),
+                'largest_batch': self.largest_batch,
+                'mean_wait_ms': round(1000.0 * self._wait_seconds / items, 3),
+                'mean_run_ms': round(1000.0 * self._run_seconds / max(self.batches, 1), 3),
+                # Throughput of the model calls themselves
+                'rows_per_second': round(self.items / self._run_seconds, 1) if self._run_seconds else 0.0,
+                'backlog': self._queue.qsize(),
+            }
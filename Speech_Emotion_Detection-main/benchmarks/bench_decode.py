@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare the ways a browser WebM/Opus recording can be turned into features.
+
+  legacy    write temp .webm, ffmpeg subprocess -> temp .wav, librosa.load
+  pipe      ffmpeg subprocess over stdin/stdout, no temp files
+  pyav      in-process decoding with PyAV
+
+Usage: python benchmarks/bench_decode.py [--seconds 5] [--repeat 30]
+"""
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import librosa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_io
+from features import SAMPLE_RATE
+
+
+def make_webm(seconds, sample_rate=48000):
+    import av
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    buffer = io.BytesIO()
+    with av.open(buffer, 'w', format='webm') as container:
+        stream = container.add_stream('libopus', rate=sample_rate, layout='mono')
+        frame = av.AudioFrame.from_ndarray(tone.reshape(1, -1), format='flt', layout='mono')
+        frame.sample_rate = sample_rate
+        for packet in list(stream.encode(frame)) + list(stream.encode(None)):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def decode_legacy(data):
+    with tempfile.TemporaryDirectory() as tmp:
+        webm_path = os.path.join(tmp, 'clip.webm')
+        wav_path = os.path.join(tmp, 'clip.wav')
+        with open(webm_path, 'wb') as f:
+            f.write(data)
+        subprocess.run([
+            audio_io.FFMPEG_BINARY, '-i', webm_path, '-acodec', 'pcm_s16le',
+            '-ar', str(SAMPLE_RATE), '-ac', '1', '-y', wav_path
+        ], check=True, capture_output=True)
+        return librosa.load(wav_path, sr=None)
+
+
+def decode_pipe(data):
+    return audio_io._decode_ffmpeg(data, SAMPLE_RATE, 0.0, None)
+
+
+def decode_pyav(data):
+    return audio_io._decode_pyav(data, SAMPLE_RATE, 0.0, None)
+
+
+def measure(fn, data, repeat):
+    fn(data)  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, [50, 99]), np.mean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5.0, help='length of the synthetic recording')
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    if audio_io.av is None:
+        sys.exit('PyAV is required to generate the WebM clip (pip install av)')
+    data = make_webm(args.seconds)
+
+    paths = {'pyav': decode_pyav}
+    if audio_io.FFMPEG_BINARY:
+        paths['pipe'] = decode_pipe
+        paths['legacy'] = decode_legacy
+    else:
+        print('ffmpeg not found (set FFMPEG_BINARY); only timing the in-process path')
+
+    print(f"{args.seconds:.1f}s WebM/Opus clip, {len(data)} bytes, {args.repeat} runs")
+    print(f"{'path':<8} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, fn in paths.items():
+        (p50, p99), mean = measure(fn, data, args.repeat)
+        print(f"{name:<8} {mean:9.2f} {p50:9.2f} {p99:9.2f}")
+
+
+if __name__ == '__main__':
+    main()
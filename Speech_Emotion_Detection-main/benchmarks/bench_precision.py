@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compare float64, float32 and int8 inference for the exported network.
+
+Accuracy is checked on the held-out rows of the training feature matrix (the
+same train_test_split as models/train_models.py) when it exists. Otherwise
+random rows are used and only agreement with float64 is reported. Latency is
+measured for single rows and batches. Memory is what the engine holds, and
+saved is the size of its arrays in model.npz: int8 only shrinks the latter,
+since it runs as float32.
+
+Usage: python benchmarks/bench_precision.py [--model models/model.npz] [--repeat 200] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_suite import load_engine, percentiles
+from features import N_FEATURES
+from feature_store import DEFAULT_MATRIX_DIR, FeatureMatrix
+from inference import DEFAULT_MODEL_PATH, PRECISIONS, compare_precisions
+
+BATCH_SIZES = (1, 8, 64, 512)
+
+
+def held_out(matrix_dir, engine):
+    """(X, labels, source) for the accuracy check."""
+    if os.path.exists(os.path.join(matrix_dir, 'index.json')):
+        from sklearn.model_selection import train_test_split
+
+        matrix = FeatureMatrix(matrix_dir)
+        _, test_rows = train_test_split(np.arange(len(matrix)), random_state=0, shuffle=True)
+        test_rows = np.sort(test_rows)
+        return np.asarray(matrix.features[test_rows]), matrix.label_names(test_rows), matrix_dir
+    # Without extracted features there are no labels; random rows still show agreement
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(2000, engine.n_features)), None, 'random'
+
+
+def latency(engine, X, batch, repeat):
+    x = np.ascontiguousarray(X[:batch])
+    engine.predict(x)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.predict(x)
+        times.append((time.perf_counter() - start) * 1000)
+    return percentiles(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--matrix', default=DEFAULT_MATRIX_DIR)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    engine, model_source = load_engine(args.model)
+    X, labels, data_source = held_out(args.matrix, engine)
+    print(f"Model: {model_source}, held-out rows: {len(X)} from {data_source}\n")
+
+    report = compare_precisions(engine, X, labels)
+    print(f"{'precision':<10}{'accuracy':>10}{'agreement':>11}{'max |dp|':>10}{'mem KiB':>10}{'saved KiB':>11}")
+    for precision, check in report.items():
+        accuracy = f"{check['accuracy']*100:.2f}%" if check['accuracy'] is not None else 'n/a'
+        print(f"{precision:<10}{accuracy:>10}{check['agreement']*100:>10.2f}%"
+              f"{check['max_proba_error']:>10.4f}{check['nbytes'] / 1024:>10.0f}{check['stored_nbytes'] / 1024:>11.0f}")
+
+    rows = np.tile(X, (max(1, -(-max(BATCH_SIZES) // len(X))), 1))
+    print(f"\n{'precision':<10}" + ''.join(f"{f'batch {b} p50':>16}" for b in BATCH_SIZES))
+    for precision in PRECISIONS:
+        candidate = engine.with_precision(precision)
+        report[precision]['latency_ms'] = {}
+        for batch in BATCH_SIZES:
+            report[precision]['latency_ms'][batch] = latency(candidate, rows, batch, args.repeat)
+        print(f"{precision:<10}" + ''.join(f"{report[precision]['latency_ms'][b]['p50_ms']:>13.3f} ms"
+                                           for b in BATCH_SIZES))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model': model_source, 'data': data_source, 'rows': len(X), 'n_features': N_FEATURES,
+                       'precisions': report}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
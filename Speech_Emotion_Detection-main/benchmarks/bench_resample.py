@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Compare the resampling modes in resampling.py on the analysis window
+(OFFSET + DURATION seconds) and on a long recording.
+
+For every input rate and mode it reports the time to resample to SAMPLE_RATE
+and the relative error of the resulting feature vector against soxr_vhq.
+librosa's resampy 'kaiser_best' (the old librosa default) is included when
+resampy is installed.
+
+Usage: python benchmarks/bench_resample.py [--repeat 20] [--long-seconds 60]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features import DURATION, OFFSET, SAMPLE_RATE, compute_features
+from resampling import QUALITIES, resample
+
+INPUT_RATES = (16000, 44100, 48000)
+
+
+def make_signal(seconds, sample_rate):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    phase = 2 * np.pi * np.cumsum(140 + 40 * np.sin(2 * np.pi * 0.7 * t)) / sample_rate
+    harmonics = sum(np.sin(k * phase) / k for k in range(1, 12))
+    return (0.1 * harmonics + 0.01 * rng.normal(size=t.size)).astype(np.float32)
+
+
+def timed(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--long-seconds', type=float, default=60.0)
+    args = parser.parse_args()
+
+    modes = {quality: (lambda x, sr, q=quality: resample(x, sr, SAMPLE_RATE, quality=q)) for quality in QUALITIES}
+    try:
+        import resampy  # noqa: F401
+        import librosa
+
+        modes['kaiser_best'] = lambda x, sr: librosa.resample(x, orig_sr=sr, target_sr=SAMPLE_RATE,
+                                                              res_type='kaiser_best')
+    except ImportError:
+        print('resampy not installed, skipping kaiser_best')
+
+    print(f"{'rate':>6} {'mode':<12} {'window ms':>10} {'long ms':>10} {'feature err':>12}")
+    for rate in INPUT_RATES:
+        window = make_signal(OFFSET + DURATION, rate)
+        long = make_signal(args.long_seconds, rate)
+        reference = compute_features(modes['soxr_vhq'](window, rate), SAMPLE_RATE)
+        for name, fn in modes.items():
+            window_ms = timed(lambda: fn(window, rate), args.repeat)
+            long_ms = timed(lambda: fn(long, rate), max(1, args.repeat // 5))
+            features = compute_features(np.asarray(fn(window, rate), dtype=np.float32), SAMPLE_RATE)
+            error = np.linalg.norm(features - reference) / np.linalg.norm(reference)
+            print(f"{rate:>6} {name:<12} {window_ms:10.3f} {long_ms:10.2f} {error:12.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Reproducible performance suite: feature extraction, model inference and the
+/predict endpoint, written as JSON so runs can be compared.
+
+  extraction  decode and resample to SAMPLE_RATE (as /predict does) + every
+              feature block for synthetic clips of several lengths, sample
+              rates and formats (WAV, MP3, WebM/Opus)
+  batch       vectorized extraction of equal-length 2.5s clips at several
+              batch sizes, against a compute_features loop over the same clips
+  inference   NumpyMLP forward pass at batch sizes 1..1024
+  api         /predict latency (p50/p95/p99) and throughput at fixed
+              concurrency levels, in-process or against --url
+
+Usage:
+  python benchmarks/bench_suite.py --output results.json
+  python benchmarks/bench_suite.py --compare baseline.json results.json [--threshold 0.10]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import urllib.request
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_io
+from features import DURATION, N_FEATURES, SAMPLE_RATE, compute_features, compute_features_batch
+from inference import DEFAULT_MODEL_PATH, NumpyMLP
+
+LENGTHS = (1.0, 2.5, 10.0, 60.0)
+SAMPLE_RATES = (16000, 22050, 44100, 48000)
+FORMATS = ('wav', 'mp3', 'webm')
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+EXTRACT_BATCH_SIZES = (1, 8, 32, 128)
+CONCURRENCY = (1, 4, 16)
+# Which model answered the api requests, as /health reports it
+MODEL_FIELDS = ('model_available', 'model_version')
+
+# Same layer sizes as models/train_models.py, used when no exported model exists
+HIDDEN_LAYERS = (256, 128, 64)
+N_CLASSES = 8
+
+
+def make_clip(seconds, sample_rate, seed=0):
+    """Deterministic speech-like test signal: a gliding harmonic tone with noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    signal = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    return (0.2 * envelope * signal + 0.01 * rng.normal(size=t.size)).astype(np.float32)
+
+
+def encode(samples, sample_rate, fmt):
+    if fmt == 'webm':
+        import av
+
+        buffer = io.BytesIO()
+        with av.open(buffer, 'w', format='webm') as container:
+            # Opus only takes 8/12/16/24/48 kHz
+            rate = sample_rate if sample_rate in (8000, 12000, 16000, 24000, 48000) else 48000
+            stream = container.add_stream('libopus', rate=rate, layout='mono')
+            frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format='flt', layout='mono')
+            frame.sample_rate = sample_rate
+            for packet in list(stream.encode(frame)) + list(stream.encode(None)):
+                container.mux(packet)
+        return buffer.getvalue()
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format=fmt.upper())
+    return buffer.getvalue()
+
+
+def percentiles(times):
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    return {'mean_ms': float(np.mean(times)), 'p50_ms': float(p50), 'p95_ms': float(p95),
+            'p99_ms': float(p99)}
+
+
+def bench_extraction(repeat, formats, lengths, sample_rates):
+    results = []
+    for fmt in formats:
+        if fmt == 'webm' and audio_io.av is None:
+            print('PyAV not installed, skipping WebM')
+            continue
+        for sample_rate in sample_rates:
+            for seconds in lengths:
+                data = encode(make_clip(seconds, sample_rate), sample_rate, fmt)
+                # Decoded and resampled to SAMPLE_RATE, as app.py does for every upload
+                compute_features(*audio_io.decode_window(data))  # warm up
+
+                totals, decodes, stages = [], [], {}
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    samples, rate = audio_io.decode_window(data)
+                    decoded = time.perf_counter()
+                    timings = {}
+                    compute_features(samples, rate, timings=timings)
+                    end = time.perf_counter()
+                    decodes.append((decoded - start) * 1000)
+                    totals.append((end - start) * 1000)
+                    for stage, seconds_spent in timings.items():
+                        stages.setdefault(stage, []).append(seconds_spent * 1000)
+
+                results.append({
+                    'name': f'extract/{fmt}/{sample_rate}/{seconds:g}s',
+                    'format': fmt, 'sample_rate': sample_rate, 'seconds': seconds, 'bytes': len(data),
+                    **percentiles(totals),
+                    'stages_ms': {'decode': float(np.median(decodes)),
+                                  **{stage: float(np.median(v)) for stage, v in stages.items()}},
+                })
+                print(f"{results[-1]['name']:<28} p50 {results[-1]['p50_ms']:8.2f} ms")
+    return results
+
+
+def bench_batch_extraction(repeat, batch_sizes):
+    results = []
+    for batch in batch_sizes:
+        clips = np.stack([make_clip(DURATION, SAMPLE_RATE, seed=i) for i in range(batch)])
+        compute_features_batch(clips, SAMPLE_RATE)  # warm up
+        loop, vectorized = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for clip in clips:
+                compute_features(clip, SAMPLE_RATE)
+            middle = time.perf_counter()
+            compute_features_batch(clips, SAMPLE_RATE)
+            loop.append((middle - start) * 1000)
+            vectorized.append((time.perf_counter() - middle) * 1000)
+        stats = percentiles(vectorized)
+        loop_p50 = float(np.median(loop))
+        results.append({'name': f'extract_batch/{batch}', 'batch': batch, **stats,
+                        'ms_per_clip': stats['p50_ms'] / batch, 'loop_p50_ms': loop_p50,
+                        'speedup': loop_p50 / stats['p50_ms']})
+        print(f"{results[-1]['name']:<28} p50 {stats['p50_ms']:8.2f} ms  "
+              f"{results[-1]['ms_per_clip']:6.2f} ms/clip  {results[-1]['speedup']:.2f}x vs loop")
+    return results
+
+
+def random_engine():
+    """A network of the trained model's shape with fixed random weights."""
+    rng = np.random.default_rng(0)
+    sizes = (N_FEATURES,) + HIDDEN_LAYERS + (N_CLASSES,)
+    weights = [rng.normal(scale=1 / np.sqrt(n), size=(n, m)) for n, m in zip(sizes, sizes[1:])]
+    biases = [np.zeros(m) for m in sizes[1:]]
+    return NumpyMLP(weights, biases, 'relu', 'softmax', [f'class{i}' for i in range(N_CLASSES)])
+
+
+def load_engine(model_path):
+    if os.path.exists(model_path):
+        return NumpyMLP.load(model_path), model_path
+    return random_engine(), 'random'
+
+
+def bench_inference(repeat, model_path, batch_sizes):
+    engine, source = load_engine(model_path)
+    rng = np.random.default_rng(0)
+    results = []
+    for batch in batch_sizes:
+        X = rng.normal(size=(batch, N_FEATURES))
+        engine.predict(X)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            engine.predict(X)
+            times.append((time.perf_counter() - start) * 1000)
+        stats = percentiles(times)
+        results.append({'name': f'inference/batch{batch}', 'batch': batch, 'model': source, **stats,
+                        'rows_per_second': batch / (stats['p50_ms'] / 1000)})
+        print(f"{results[-1]['name']:<28} p50 {stats['p50_ms']:8.3f} ms  {results[-1]['rows_per_second']:12.0f} rows/s")
+    return results
+
+
+def multipart(filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def make_poster(url):
+    """
+    Return post(filename, data) -> JSON response, over HTTP or in-process, and
+    model() -> the model_available/model_version the server reports.
+
+    In-process without trained artifacts the app would answer in demo mode and
+    skip the forward pass, so the random_engine() stand-in is served instead.
+    """
+    if url:
+        def post(filename, data):
+            body, content_type = multipart(filename, data)
+            req = urllib.request.Request(url.rstrip('/') + '/predict', data=body,
+                                         headers={'Content-Type': content_type})
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return json.loads(response.read())
+
+        def model():
+            with urllib.request.urlopen(url.rstrip('/') + '/health', timeout=60) as response:
+                status = json.loads(response.read())
+            return {key: status.get(key) for key in MODEL_FIELDS}
+        return post, model
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+    import app as app_module
+
+    store = app_module.model_store
+    store.wait_ready()
+    if not store.available:
+        store.engine, store.version = random_engine(), 'random'
+    local = threading.local()
+
+    def post(filename, data):
+        if not hasattr(local, 'client'):
+            local.client = app_module.app.test_client()
+        return local.client.post('/predict', data={'file': (io.BytesIO(data), filename)}).get_json()
+
+    def model():
+        status = store.status()
+        return {key: status[key] for key in MODEL_FIELDS}
+    return post, model
+
+
+def bench_api(requests_per_level, concurrency_levels, url=None):
+    post, model = make_poster(url)
+    base = encode(make_clip(3.0, 22050), 22050, 'wav')
+
+    def clip(i):
+        # Every request gets distinct bytes (its index in the last two samples),
+        # so the feature cache never answers for the benchmark
+        return base[:-4] + struct.pack('<I', i)
+
+    post('warmup.wav', clip(2 ** 32 - 1))
+
+    results = []
+    offset = 0
+    for concurrency in concurrency_levels:
+        latencies, errors = [], []
+        lock = threading.Lock()
+        counter = iter(range(offset, offset + requests_per_level))
+        offset += requests_per_level
+
+        def worker():
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    response = post(f'clip{i}.wav', clip(i))
+                    failed = 'error' in response
+                except Exception as e:
+                    failed, response = True, str(e)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    if failed:
+                        errors.append(response)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        results.append({'name': f'api/predict/c{concurrency}', 'concurrency': concurrency,
+                        'requests': len(latencies), 'errors': len(errors),
+                        'requests_per_second': len(latencies) / wall, **percentiles(latencies), **model()})
+        r = results[-1]
+        print(f"{r['name']:<28} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+              f"  {r['requests_per_second']:8.1f} req/s  errors {r['errors']}"
+              + ('' if r['model_available'] else '  DEMO MODE'))
+    return results
+
+
+def environment():
+    import librosa
+    import scipy
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'librosa': librosa.__version__,
+        'soundfile': sf.__version__,
+    }
+
+
+def compare(baseline_path, current_path, threshold):
+    """
+    Print p50 changes per benchmark; returns the names slower than threshold,
+    and the api results where either run was answered in demo mode (no model
+    pass, so the numbers don't measure inference).
+    """
+    with open(baseline_path) as f:
+        baseline = {r['name']: r for section in json.load(f)['results'].values() for r in section}
+    with open(current_path) as f:
+        current = {r['name']: r for section in json.load(f)['results'].values() for r in section}
+
+    regressions = []
+    print(f"{'benchmark':<28} {'base p50':>10} {'new p50':>10} {'change':>8}")
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['p50_ms'], result['p50_ms']
+        change = after / before - 1 if before else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        if not all(run.get('model_available', True) for run in (baseline[name], result)):
+            flag = '  DEMO MODE'
+        print(f"{name:<28} {before:10.3f} {after:10.3f} {change:+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--suites', default='extraction,batch,inference,api',
+                        help='comma-separated subset of extraction, batch, inference, api')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per extraction/inference case')
+    parser.add_argument('--requests', type=int, default=200, help='requests per concurrency level')
+    parser.add_argument('--concurrency', default=','.join(map(str, CONCURRENCY)))
+    parser.add_argument('--url', help='benchmark a running server instead of the app in-process')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--quick', action='store_true', help='fewer cases, for a smoke run')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'))
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed p50 slowdown for --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    suites = set(args.suites.split(','))
+    lengths, sample_rates, batch_sizes, extract_batch_sizes = LENGTHS, SAMPLE_RATES, BATCH_SIZES, EXTRACT_BATCH_SIZES
+    if args.quick:
+        lengths, sample_rates, batch_sizes, extract_batch_sizes = (2.5,), (22050,), (1, 64, 1024), (1, 32)
+
+    results = {}
+    if 'extraction' in suites:
+        results['extraction'] = bench_extraction(args.repeat, FORMATS, lengths, sample_rates)
+    if 'batch' in suites:
+        results['batch'] = bench_batch_extraction(max(1, args.repeat // 4), extract_batch_sizes)
+    if 'inference' in suites:
+        results['inference'] = bench_inference(args.repeat * 10, args.model, batch_sizes)
+    if 'api' in suites:
+        levels = tuple(int(level) for level in args.concurrency.split(','))
+        results['api'] = bench_api(args.requests, levels, args.url)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
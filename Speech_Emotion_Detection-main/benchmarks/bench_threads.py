@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Throughput for combinations of worker processes and intra-op threads.
+
+Each combination starts --workers copies of this script as separate
+processes. Every process has INTRA_OP_THREADS and OMP_NUM_THREADS etc. set
+to the thread count, the same as a gunicorn deployment. Once all of them
+have warmed up they start together and run the workload for --seconds:
+
+  extract  compute_features on a synthetic clip, which is mostly single-threaded
+  infer    the model's forward pass on --batch rows, where BLAS threads matter
+
+Total throughput and per-call latency are printed for every combination. A
+workers x threads product above the core count shows what oversubscription
+costs on this host.
+
+Usage: python benchmarks/bench_threads.py [--workers 1 2 4] [--threads 1 2 4] [--seconds 5] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import thread_limits
+
+WORKLOADS = ('extract', 'infer')
+
+
+def child(args):
+    # Limits come from the environment the parent set; this applies them
+    thread_limits.configure()
+    from bench_suite import load_engine, make_clip
+    from features import SAMPLE_RATE, compute_features
+    from inference import DEFAULT_MODEL_PATH
+
+    if args.workload == 'extract':
+        clip = make_clip(args.clip_seconds, SAMPLE_RATE)
+        call = lambda: compute_features(clip, SAMPLE_RATE)  # noqa: E731
+        items = 1
+    else:
+        engine, _ = load_engine(DEFAULT_MODEL_PATH)
+        X = np.random.default_rng(0).normal(size=(args.batch, engine.n_features))
+        call = lambda: engine.predict(X)  # noqa: E731
+        items = args.batch
+    call()  # warm up
+
+    # Tell the parent we're ready and wait for the common start
+    print('ready', flush=True)
+    sys.stdin.readline()
+    times = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        began = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - began) * 1000)
+    json.dump({'calls': len(times), 'items': len(times) * items, 'seconds': time.perf_counter() - start,
+               'times_ms': times}, sys.stdout)
+
+
+def run_combination(workload, workers, threads, args):
+    env = dict(os.environ, INTRA_OP_THREADS=str(threads),
+               **{var: str(threads) for var in thread_limits.THREAD_ENV_VARS})
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--workload', workload,
+               '--seconds', str(args.seconds), '--batch', str(args.batch), '--clip-seconds', str(args.clip_seconds)]
+    processes = [subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.stdout.readline()
+    for process in processes:
+        process.stdin.write('go\n')
+        process.stdin.flush()
+    results = []
+    for process in processes:
+        out, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Benchmark process exited with status {process.returncode}")
+        results.append(json.loads(out))
+
+    times = np.concatenate([r['times_ms'] for r in results])
+    p50, p95 = np.percentile(times, [50, 95])
+    return {
+        'workload': workload, 'workers': workers, 'threads': threads,
+        'items_per_second': float(sum(r['items'] / r['seconds'] for r in results)),
+        'p50_ms': float(p50), 'p95_ms': float(p95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = thread_limits.available_cores()
+    default_counts = sorted({1, 2, cores})
+    parser.add_argument('--workers', type=int, nargs='+', default=default_counts)
+    parser.add_argument('--threads', type=int, nargs='+', default=default_counts)
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--batch', type=int, default=64, help='rows per forward pass for infer')
+    parser.add_argument('--clip-seconds', type=float, default=3.0, help='clip length for extract')
+    parser.add_argument('--output', help='also write the results as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workload', choices=WORKLOADS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"{cores} core(s) available\n")
+    print(f"{'workload':<9}{'workers':>8}{'threads':>8}{'items/s':>11}{'p50 ms':>10}{'p95 ms':>10}")
+    results = []
+    for workload in args.workloads:
+        for workers in args.workers:
+            for threads in args.threads:
+                result = run_combination(workload, workers, threads, args)
+                results.append(result)
+                flag = '  oversubscribed' if workers * threads > cores else ''
+                print(f"{workload:<9}{workers:>8}{threads:>8}{result['items_per_second']:>11.1f}"
+                      f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{flag}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cores': cores, 'seconds': args.seconds, 'batch': args.batch,
+                       'clip_seconds': args.clip_seconds, 'results': results}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,46 +5,21 @@ This script creates synthetic training data and allows you to add your own audio
 """
 
 import os
+import sys
 import pandas as pd
 import numpy as np
-import librosa
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.neural_network import MLPClassifier
 import joblib
 
-def extract_features(file_path):
-    """Extract audio features from a file."""
-    try:
-        data, sample_rate = librosa.load(file_path, duration=2.5, offset=0.6)
-        
-        result = np.array([])
-        
-        # ZCR
-        zcr = np.mean(librosa.feature.zero_crossing_rate(y=data).T, axis=0)
-        result = np.hstack((result, zcr))
-        
-        # Chroma_stft
-        stft = np.abs(librosa.stft(data))
-        chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, chroma_stft))
-        
-        # MFCC
-        mfcc = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, mfcc))
-        
-        # RMS Value
-        rms = np.mean(librosa.feature.rms(y=data).T, axis=0)
-        result = np.hstack((result, rms))
-        
-        # MelSpectogram
-        mel = np.mean(librosa.feature.melspectrogram(y=data, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, mel))
-        
-        return result
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
-        return None
+from dataset import extract_dataset
+from feature_cache import FeatureCache
+from inference import DEFAULT_MODEL_PATH, export_model
+from incremental import TrainState, update_model
+
+USER_AUDIO_DIR = 'data/user_audio'
+USER_EMOTIONS = ['happy', 'sad', 'angry', 'fearful', 'neutral', 'calm', 'disgust', 'surprised']
 
 def create_synthetic_data():
     """Create synthetic training data for basic model training."""
@@ -101,35 +76,45 @@ def create_synthetic_data():
     
     return synthetic_data
 
+def list_user_audio_files():
+    """(path, emotion) for every audio file under data/user_audio/<emotion>/."""
+    audio_files = []
+    for emotion in USER_EMOTIONS:
+        emotion_dir = os.path.join(USER_AUDIO_DIR, emotion)
+        if os.path.exists(emotion_dir):
+            for filename in os.listdir(emotion_dir):
+                if filename.lower().endswith(('.wav', '.mp3', '.m4a', '.flac')):
+                    audio_files.append((os.path.join(emotion_dir, filename), emotion))
+    return audio_files
+
 def scan_user_audio_files():
     """Scan for user-provided audio files in data/user_audio/."""
-    user_audio_dir = 'data/user_audio'
     user_data = []
     
-    if not os.path.exists(user_audio_dir):
-        os.makedirs(user_audio_dir)
-        print(f"Created directory: {user_audio_dir}")
+    if not os.path.exists(USER_AUDIO_DIR):
+        os.makedirs(USER_AUDIO_DIR)
+        print(f"Created directory: {USER_AUDIO_DIR}")
         print("You can add your own audio files here, organized like:")
         print("  data/user_audio/happy/audio1.wav")
         print("  data/user_audio/sad/audio2.mp3")
         print("  data/user_audio/angry/audio3.wav")
         return user_data
     
-    emotions = ['happy', 'sad', 'angry', 'fearful', 'neutral', 'calm', 'disgust', 'surprised']
+    audio_files = list_user_audio_files()
     
-    for emotion in emotions:
-        emotion_dir = os.path.join(user_audio_dir, emotion)
-        if os.path.exists(emotion_dir):
-            for filename in os.listdir(emotion_dir):
-                if filename.lower().endswith(('.wav', '.mp3', '.m4a', '.flac')):
-                    file_path = os.path.join(emotion_dir, filename)
-                    features = extract_features(file_path)
-                    if features is not None:
-                        user_data.append({
-                            'features': features,
-                            'emotion': emotion
-                        })
-                        print(f"Added real audio: {filename} -> {emotion}")
+    # Extract in parallel, reusing cached vectors of files seen before
+    feature_cache = FeatureCache()
+    vectors, _ = extract_dataset([path for path, _ in audio_files], cache=feature_cache)
+    feature_cache.save()
+    
+    for (file_path, emotion), features in zip(audio_files, vectors):
+        if features is not None:
+            user_data.append({
+                'features': features,
+                'emotion': emotion,
+                'path': file_path
+            })
+            print(f"Added real audio: {os.path.basename(file_path)} -> {emotion}")
     
     return user_data
 
@@ -205,14 +190,30 @@ def train_model():
     joblib.dump(model, 'models/saved_model.pkl')
     joblib.dump(scaler, 'models/scaler.pkl')
     joblib.dump(encoder, 'models/label_encoder.pkl')
+    export_model(model, scaler, encoder, DEFAULT_MODEL_PATH)
+    
+    # Remember which user clips the model has seen, for --incremental
+    state = TrainState()
+    state.reset([(item['path'], item['emotion']) for item in user_data])
+    state.save()
     
     print("✅ Model training completed successfully!")
     print("✅ Models saved to models/ directory")
     
     return True
 
+def update_with_new_audio():
+    """Learn only from user clips added or changed since the last run."""
+    feature_cache = FeatureCache()
+    summary = update_model(list_user_audio_files(), feature_cache)
+    feature_cache.save()
+    return summary is not None
+
 if __name__ == '__main__':
-    success = train_model()
+    if '--incremental' in sys.argv[1:]:
+        success = update_with_new_audio() or train_model()
+    else:
+        success = train_model()
     if success:
         print("\n🎉 Your ML model is ready!")
         print("🚀 Restart the backend server to use the trained model")
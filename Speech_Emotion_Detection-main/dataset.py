@@ -0,0 +1,148 @@
+"""
+Feature extraction over a whole dataset manifest.
+
+Files are spread over a process pool (one librosa pipeline per core, each
+limited to one BLAS/OpenMP thread so the pool doesn't oversubscribe). The
+workers are spawned, not forked: setting thread limits in a child forked from
+a multi-threaded parent can deadlock on a lock held at fork time. Results
+come back in manifest order, a failing file only loses its own row, and
+progress is reported in files/s. Each task decodes EXTRACT_BATCH files and
+extracts the equal-length clips among them (every full analysis window) as
+one vectorized batch. iter_dataset() yields rows one at a time for
+feature_store, which writes them straight to disk.
+"""
+
+import multiprocessing
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import thread_limits
+from features import SAMPLE_RATE, compute_features, compute_features_grouped, load_audio
+
+DEFAULT_WORKERS = int(os.environ.get('EXTRACT_WORKERS', os.cpu_count() or 1))
+EXTRACT_BATCH = int(os.environ.get('EXTRACT_BATCH', 32))
+
+
+def _extract_one(job):
+    # Runs in a worker process; returns (vector, None) or (None, error message)
+    file_path, sr = job
+    try:
+        data, sample_rate = load_audio(file_path, sr=sr)
+        return compute_features(data, sample_rate), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _extract_chunk(jobs):
+    # Runs in a worker process; returns a (vector, error) per job, like _extract_one
+    results = [None] * len(jobs)
+    by_rate = {}
+    for k, (file_path, sr) in enumerate(jobs):
+        try:
+            data, sample_rate = load_audio(file_path, sr=sr)
+        except Exception as e:
+            results[k] = (None, f"{type(e).__name__}: {e}")
+            continue
+        by_rate.setdefault(sample_rate, []).append((k, data))
+
+    for sample_rate, clips in by_rate.items():
+        try:
+            vectors = compute_features_grouped([data for _, data in clips], sample_rate)
+        except Exception:
+            # Redo the clips one by one, so only the failing file loses its row
+            for k, _ in clips:
+                results[k] = _extract_one(jobs[k])
+            continue
+        for (k, _), vector in zip(clips, vectors):
+            results[k] = (vector, None)
+    return results
+
+
+def iter_dataset(file_paths, workers=DEFAULT_WORKERS, sr=SAMPLE_RATE, cache=None, progress_every=100,
+                 batch_size=EXTRACT_BATCH):
+    """
+    Extract features for every file, yielding (index, vector, error) as each
+    one is ready: vector is None and error a message for files that failed.
+    Cache hits come first, then the extracted files in manifest order, so
+    callers can write rows out without holding the whole dataset.
+    """
+    file_paths = list(file_paths)
+    total = len(file_paths)
+    failed = 0
+    keys = {}
+    start = time.perf_counter()
+    done = 0
+
+    def rate():
+        elapsed = time.perf_counter() - start
+        return done / elapsed if elapsed > 0 else 0.0
+
+    # Cache lookups are cheap, so they happen here before anything is sent to the pool
+    pending = []
+    for i, file_path in enumerate(file_paths):
+        if cache is not None:
+            try:
+                keys[i], vector = cache.lookup_file(file_path, sr)
+            except OSError as e:
+                done += 1
+                failed += 1
+                yield i, None, f"{type(e).__name__}: {e}"
+                continue
+            if vector is not None:
+                cache.remember_file(file_path, keys[i], sr)
+                done += 1
+                yield i, vector, None
+                continue
+        pending.append(i)
+
+    jobs = [(file_paths[i], sr) for i in pending]
+    if workers > 1 and len(jobs) > 1:
+        # Small datasets still get spread over every worker
+        size = max(1, min(batch_size, -(-len(jobs) // workers)))
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=thread_limits.configure, initargs=(1,))
+    else:
+        size = max(1, batch_size)
+        pool = None
+    chunks = [jobs[k:k + size] for k in range(0, len(jobs), size)]
+    results = itertools.chain.from_iterable((pool.map if pool is not None else map)(_extract_chunk, chunks))
+
+    try:
+        for i, (vector, error) in zip(pending, results):
+            done += 1
+            if vector is None:
+                print(f"Error processing {file_paths[i]}: {error}")
+                failed += 1
+            elif cache is not None:
+                cache.put(keys[i], vector)
+                cache.remember_file(file_paths[i], keys[i], sr)
+            yield i, vector, error
+            if done % progress_every == 0:
+                print(f"  {done}/{total} files ({rate():.1f} files/s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"Extracted {total - failed}/{total} files in {time.perf_counter() - start:.1f}s "
+          f"({rate():.1f} files/s) with {workers} worker(s), {failed} failed")
+
+
+def extract_dataset(file_paths, workers=DEFAULT_WORKERS, sr=SAMPLE_RATE, cache=None, progress_every=100):
+    """
+    Extract a feature vector for every file, in order.
+
+    Returns (vectors, errors): vectors[i] is None for files that failed and
+    errors is a list of (file_path, message). Vectors found in the optional
+    FeatureCache are reused and new ones are added to it.
+    """
+    file_paths = list(file_paths)
+    vectors = [None] * len(file_paths)
+    errors = []
+    for i, vector, error in iter_dataset(file_paths, workers, sr, cache, progress_every):
+        if vector is None:
+            errors.append((file_paths[i], error))
+        else:
+            vectors[i] = vector
+    return vectors, errors
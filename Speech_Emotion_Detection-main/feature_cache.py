@@ -0,0 +1,263 @@
+"""
+Persistent, size-bounded feature cache keyed by audio content.
+
+Each entry maps sha1(file bytes + extractor parameters) to a 162-float vector.
+Vectors live in a memory-mapped float32 array with a fixed number of slots;
+when it is full the least recently used slot is overwritten. The key stored
+next to every slot is checked on read, so a stale or interrupted write can
+never return another file's features.
+
+Several processes (gunicorn workers, a training run) may share one cache
+directory. Slot allocation, writes and resizing happen under an flock on the
+directory's lock file, and slots are stamped with wall-clock time so LRU order
+holds across processes. Each process's key -> slot index is only a hint: it
+is checked against the shared key array, which is searched on a miss.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, only one process (the dev server) uses the cache
+    fcntl = None
+
+import features
+import resampling
+from features import N_FEATURES, SAMPLE_RATE
+
+DEFAULT_CACHE_DIR = os.environ.get('FEATURE_CACHE_DIR', 'data/feature_cache')
+DEFAULT_MAX_ENTRIES = int(os.environ.get('FEATURE_CACHE_SIZE', 50000))
+
+KEY_DTYPE = 'S40'  # hex sha1
+
+
+def extractor_params(sr=SAMPLE_RATE):
+    """Everything that changes the extracted vector, as a stable string."""
+    return '|'.join(str(value) for value in (
+        sr, features.DURATION, features.OFFSET, features.N_FFT, features.HOP_LENGTH,
+        features.FEATURE_LAYOUT, resampling.RESAMPLE_QUALITY,
+    ))
+
+
+def content_key(data, sr=SAMPLE_RATE):
+    """Cache key for raw audio file bytes extracted at the given sample rate."""
+    digest = hashlib.sha1(data)
+    digest.update(extractor_params(sr).encode())
+    return digest.hexdigest()
+
+
+def stream_key(fileobj, sr=SAMPLE_RATE, chunk_size=1 << 20):
+    """content_key for a seekable binary file object, hashed in chunks."""
+    digest = hashlib.sha1()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    digest.update(extractor_params(sr).encode())
+    return digest.hexdigest()
+
+
+def file_key(file_path, sr=SAMPLE_RATE):
+    with open(file_path, 'rb') as f:
+        return stream_key(f, sr)
+
+
+class FeatureCache:
+    """On-disk LRU cache of feature vectors. Call save() to persist the path index."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock_file = open(self._path('lock'), 'a')
+
+        with self._locked():
+            self._features, self._keys, self._stamps = self._open_arrays()
+            self._load_index()
+
+        # path -> [mtime_ns, size, params, key], lets training skip re-hashing unchanged files
+        self._paths_file = os.path.join(cache_dir, 'paths.json')
+        self._paths = {}
+        if os.path.exists(self._paths_file):
+            with open(self._paths_file) as f:
+                self._paths = json.load(f)
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    @contextmanager
+    def _locked(self):
+        # The thread lock first: flock doesn't exclude threads sharing one file
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        self._slots = {key.decode(): slot for slot, key in enumerate(self._keys) if key}
+        self._inode = os.stat(self._path('keys.npy')).st_ino
+
+    def _follow_resize(self):
+        # Called with the lock held. Another process opened the cache with a
+        # different size and replaced the arrays: use the new files as they are.
+        if os.stat(self._path('keys.npy')).st_ino != self._inode:
+            self._features, self._keys, self._stamps = (
+                np.load(self._path(name), mmap_mode='r+') for name in ('features.npy', 'keys.npy', 'stamps.npy'))
+            self.max_entries = len(self._keys)
+            self._load_index()
+
+    def _find(self, key):
+        # Called with the lock held; the slot holding key, or None
+        slot = self._slots.get(key)
+        if slot is not None and self._keys[slot].decode() == key:
+            return slot
+        self._slots.pop(key, None)
+        # Another process may have written it
+        found = np.flatnonzero(self._keys == key.encode())
+        if len(found):
+            self._slots[key] = int(found[0])
+            return int(found[0])
+        return None
+
+    def _open_arrays(self):
+        shapes = {
+            'features.npy': ((self.max_entries, N_FEATURES), np.float32),
+            'keys.npy': ((self.max_entries,), KEY_DTYPE),
+            'stamps.npy': ((self.max_entries,), np.int64),
+        }
+        existing = {}
+        for name, (shape, dtype) in shapes.items():
+            path = self._path(name)
+            if os.path.exists(path):
+                existing[name] = np.load(path, mmap_mode='r+')
+
+        if len(existing) == len(shapes) and all(
+                existing[name].shape == shape and existing[name].dtype == np.dtype(dtype)
+                for name, (shape, dtype) in shapes.items()):
+            return existing['features.npy'], existing['keys.npy'], existing['stamps.npy']
+
+        # Missing or resized cache: create fresh arrays, keeping the most recent entries
+        fresh = {
+            name: np.lib.format.open_memmap(self._path(name) + '.tmp', mode='w+', dtype=dtype, shape=shape)
+            for name, (shape, dtype) in shapes.items()
+        }
+        if len(existing) == len(shapes) and existing['features.npy'].shape[1:] == (N_FEATURES,):
+            order = np.argsort(existing['stamps.npy'])[::-1]
+            order = order[existing['keys.npy'][order] != b''][:self.max_entries]
+            for name in shapes:
+                fresh[name][:len(order)] = existing[name][order]
+        for array in fresh.values():
+            array.flush()
+        fresh.clear()
+        existing.clear()
+        for name in shapes:
+            os.replace(self._path(name) + '.tmp', self._path(name))
+        return (np.load(self._path('features.npy'), mmap_mode='r+'),
+                np.load(self._path('keys.npy'), mmap_mode='r+'),
+                np.load(self._path('stamps.npy'), mmap_mode='r+'))
+
+    def __len__(self):
+        with self._locked():
+            self._follow_resize()
+            return int(np.count_nonzero(self._keys != b''))
+
+    def __contains__(self, key):
+        with self._locked():
+            self._follow_resize()
+            return self._find(key) is not None
+
+    def get(self, key):
+        """Return a copy of the cached vector for key, or None."""
+        with self._locked():
+            self._follow_resize()
+            slot = self._find(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._stamps[slot] = time.time_ns()
+            self.hits += 1
+            return np.array(self._features[slot], dtype=np.float64)
+
+    def put(self, key, vector):
+        if self.max_entries <= 0:
+            return
+        with self._locked():
+            self._follow_resize()
+            slot = self._find(key)
+            if slot is None:
+                empty = np.flatnonzero(self._keys == b'')
+                if len(empty):
+                    slot = int(empty[0])
+                else:
+                    # Evict the least recently used entry, which may be another process's
+                    slot = int(np.argmin(self._stamps))
+                    self._slots.pop(self._keys[slot].decode(), None)
+            # Clear the key first so an interrupted write never looks valid
+            self._keys[slot] = b''
+            self._features[slot] = vector
+            self._keys[slot] = key.encode()
+            self._stamps[slot] = time.time_ns()
+            self._slots[key] = slot
+
+    def lookup_file(self, file_path, sr=SAMPLE_RATE):
+        """Return (key, cached vector or None) for an audio file."""
+        stat = os.stat(file_path)
+        memo = self._paths.get(os.path.abspath(file_path))
+        if memo and memo[:3] == [stat.st_mtime_ns, stat.st_size, extractor_params(sr)] and memo[3] in self:
+            key = memo[3]
+        else:
+            key = file_key(file_path, sr)
+        return key, self.get(key)
+
+    def remember_file(self, file_path, key, sr=SAMPLE_RATE):
+        """Record the file's stat so lookup_file can skip hashing it next time."""
+        stat = os.stat(file_path)
+        self._paths[os.path.abspath(file_path)] = [stat.st_mtime_ns, stat.st_size, extractor_params(sr), key]
+
+    def extract_features(self, file_path, sr=SAMPLE_RATE):
+        """features.extract_features, reusing cached vectors for unchanged audio."""
+        key, vector = self.lookup_file(file_path, sr)
+        if vector is None:
+            vector = features.extract_features(file_path, sr=sr)
+            if vector is None:
+                return None
+            self.put(key, vector)
+        self.remember_file(file_path, key, sr)
+        return vector
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def save(self):
+        """Flush the vectors to disk and write the path index."""
+        with self._locked():
+            self._features.flush()
+            self._keys.flush()
+            self._stamps.flush()
+            stored = {key.decode() for key in self._keys if key}
+            live = {path: memo for path, memo in self._paths.items() if memo[3] in stored}
+            tmp_path = self._paths_file + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(live, f)
+            os.replace(tmp_path, self._paths_file)
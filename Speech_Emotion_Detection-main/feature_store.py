@@ -0,0 +1,161 @@
+"""
+Float32 feature matrices on disk, for corpora larger than memory.
+
+build_matrix() writes each extracted vector straight into a preallocated,
+memory-mapped float32 array, so extraction never collects the dataset in
+Python lists. A matrix directory holds:
+
+  features.npy   (rows, N_FEATURES) float32
+  labels.npy     (rows,) int32 codes into index.json's classes
+  index.json     sorted class names, the source file of every row, extractor params
+
+Class codes follow sorted class names, as with sklearn's LabelEncoder.
+FeatureMatrix opens the arrays read-only with mmap. iter_chunks() yields
+STORE_CHUNK_ROWS rows at a time, and fit_scaler / train_streaming / evaluate
+use it, so training memory is bounded by the chunk size, not the corpus.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from dataset import DEFAULT_WORKERS, iter_dataset
+from feature_cache import extractor_params
+from features import N_FEATURES, SAMPLE_RATE
+
+DEFAULT_MATRIX_DIR = os.environ.get('FEATURE_MATRIX_DIR', 'data/feature_matrix')
+STORE_CHUNK_ROWS = int(os.environ.get('STORE_CHUNK_ROWS', 4096))
+
+
+class FeatureMatrix:
+    """A read-only, memory-mapped feature matrix written by build_matrix()."""
+
+    def __init__(self, matrix_dir=DEFAULT_MATRIX_DIR):
+        self.matrix_dir = matrix_dir
+        with open(os.path.join(matrix_dir, 'index.json')) as f:
+            index = json.load(f)
+        self.classes = index['classes']
+        self.paths = index['paths']
+        self.params = index['params']
+        self.features = np.load(os.path.join(matrix_dir, 'features.npy'), mmap_mode='r')
+        self.labels = np.load(os.path.join(matrix_dir, 'labels.npy'), mmap_mode='r')
+        if not len(self.features) == len(self.labels) == len(self.paths):
+            raise ValueError(f"Feature matrix in {matrix_dir} is inconsistent; rebuild it")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def label_names(self, rows=None):
+        codes = self.labels if rows is None else self.labels[np.asarray(rows)]
+        return np.asarray(self.classes)[codes]
+
+    def entries(self):
+        """(path, label) for every row, e.g. for incremental.TrainState."""
+        return list(zip(self.paths, self.label_names().tolist()))
+
+    def iter_chunks(self, rows=None, chunk_rows=STORE_CHUNK_ROWS):
+        """Yield (X, y) in-memory chunks over rows (default: all, in order)."""
+        if rows is None:
+            for start in range(0, len(self), chunk_rows):
+                stop = start + chunk_rows
+                yield np.array(self.features[start:stop]), np.array(self.labels[start:stop])
+        else:
+            rows = np.asarray(rows)
+            for start in range(0, len(rows), chunk_rows):
+                chunk = rows[start:start + chunk_rows]
+                yield self.features[chunk], self.labels[chunk]
+
+
+def _save_atomic(path, array):
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.tmp', path)
+
+
+def build_matrix(entries, matrix_dir=DEFAULT_MATRIX_DIR, workers=DEFAULT_WORKERS, cache=None, sr=SAMPLE_RATE,
+                 chunk_rows=STORE_CHUNK_ROWS):
+    """
+    Extract features for (path, label) entries into a matrix directory.
+    Files that fail are left out. Returns (FeatureMatrix, errors).
+    """
+    entries = list(entries)
+    paths = [path for path, _ in entries]
+    os.makedirs(matrix_dir, exist_ok=True)
+    features_path = os.path.join(matrix_dir, 'features.npy')
+
+    X = np.lib.format.open_memmap(features_path + '.tmp', mode='w+', dtype=np.float32,
+                                  shape=(len(entries), N_FEATURES))
+    written = np.zeros(len(entries), dtype=bool)
+    errors = []
+    for i, vector, error in iter_dataset(paths, workers, sr, cache):
+        if vector is None:
+            errors.append((paths[i], error))
+        else:
+            X[i] = vector
+            written[i] = True
+    X.flush()
+
+    keep = np.flatnonzero(written)
+    if len(keep) < len(entries):
+        # Drop the failed rows, copying a chunk at a time
+        compact = np.lib.format.open_memmap(features_path + '.compact', mode='w+', dtype=np.float32,
+                                            shape=(len(keep), N_FEATURES))
+        for start in range(0, len(keep), chunk_rows):
+            rows = keep[start:start + chunk_rows]
+            compact[start:start + len(rows)] = X[rows]
+        compact.flush()
+        del compact, X
+        os.replace(features_path + '.compact', features_path + '.tmp')
+    else:
+        del X
+
+    classes = sorted({str(entries[i][1]) for i in keep})
+    codes = {name: code for code, name in enumerate(classes)}
+    labels = np.array([codes[str(entries[i][1])] for i in keep], dtype=np.int32)
+
+    # index.json goes last: a matrix is only readable once all three files agree
+    os.replace(features_path + '.tmp', features_path)
+    _save_atomic(os.path.join(matrix_dir, 'labels.npy'), labels)
+    index_path = os.path.join(matrix_dir, 'index.json')
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump({'classes': classes, 'paths': [paths[i] for i in keep], 'params': extractor_params(sr)}, f)
+    os.replace(index_path + '.tmp', index_path)
+    return FeatureMatrix(matrix_dir), errors
+
+
+def fit_scaler(matrix, rows=None, chunk_rows=STORE_CHUNK_ROWS):
+    """A StandardScaler fitted chunk by chunk."""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    for X, _ in matrix.iter_chunks(rows, chunk_rows):
+        scaler.partial_fit(X)
+    return scaler
+
+
+def train_streaming(model, scaler, matrix, rows=None, epochs=50, chunk_rows=STORE_CHUNK_ROWS, random_state=0):
+    """
+    Train an MLPClassifier with partial_fit, one chunk at a time. Each epoch
+    visits the chunks in a new random order and shuffles rows within them,
+    which keeps reads mostly sequential.
+    """
+    rng = np.random.default_rng(random_state)
+    rows = np.arange(len(matrix)) if rows is None else np.sort(np.asarray(rows))
+    chunks = [rows[start:start + chunk_rows] for start in range(0, len(rows), chunk_rows)]
+    classes = np.arange(len(matrix.classes))
+    for _ in range(epochs):
+        for c in rng.permutation(len(chunks)):
+            X, y = next(matrix.iter_chunks(chunks[c], chunk_rows))
+            shuffle = rng.permutation(len(y))
+            model.partial_fit(scaler.transform(X)[shuffle], y[shuffle], classes=classes)
+    return model
+
+
+def evaluate(model, scaler, matrix, rows=None, chunk_rows=STORE_CHUNK_ROWS):
+    """Accuracy over the given rows, predicted chunk by chunk."""
+    correct = total = 0
+    for X, y in matrix.iter_chunks(rows, chunk_rows):
+        correct += int(np.sum(model.predict(scaler.transform(X)) == y))
+        total += len(y)
+    return correct / total if total else 0.0
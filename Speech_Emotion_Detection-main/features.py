@@ -0,0 +1,246 @@
+"""
+Shared audio feature extraction for training and serving.
+
+The 162-dim vector layout is: ZCR (1), chroma (12), MFCC (20), RMS (1), mel (128).
+A single STFT is computed per clip and reused for chroma, MFCC and the mel
+spectrogram; ZCR and RMS are time-domain features and use the raw frames.
+
+compute_features_batch() does the same for a 2-D array of equal-length clips
+(compute_features_grouped() sorts a list of clips into such batches),
+with one librosa call per feature for the whole batch instead of one per clip.
+Two steps that librosa would reduce over the whole array are done per clip, so
+every row equals compute_features() on that clip: the tuning estimate behind
+chroma, and the 80 dB floor of the dB-scaled mel spectrogram.
+"""
+
+import functools
+import time
+
+import numpy as np
+import librosa
+
+# Analysis window used for every clip
+SAMPLE_RATE = 22050
+DURATION = 2.5
+OFFSET = 0.6
+
+# STFT / feature parameters (librosa defaults, spelled out so they stay in sync)
+N_FFT = 2048
+HOP_LENGTH = 512
+N_CHROMA = 12
+N_MFCC = 20
+N_MELS = 128
+
+FEATURE_LAYOUT = (
+    ('zcr', 1),
+    ('chroma', N_CHROMA),
+    ('mfcc', N_MFCC),
+    ('rms', 1),
+    ('mel', N_MELS),
+)
+N_FEATURES = sum(size for _, size in FEATURE_LAYOUT)
+
+
+def load_audio(file_path, sr=SAMPLE_RATE):
+    """Load the analysis window of an audio file as a mono float32 signal."""
+    # Same decoder and resampler as the API (imported here: audio_io imports this module)
+    from audio_io import decode_window
+    return decode_window(file_path, sr=sr)
+
+
+@functools.lru_cache(maxsize=8)
+def mel_basis(sample_rate):
+    """Mel filterbank for a sample rate, built once and reused."""
+    return librosa.filters.mel(sr=sample_rate, n_fft=N_FFT, n_mels=N_MELS)
+
+
+class _Laps:
+    """Adds the seconds since the previous lap to timings[stage], if timings is a dict."""
+
+    def __init__(self, timings):
+        self.timings = timings
+        self.last = time.perf_counter() if timings is not None else None
+
+    def __call__(self, stage):
+        if self.timings is not None:
+            now = time.perf_counter()
+            self.timings[stage] = self.timings.get(stage, 0.0) + now - self.last
+            self.last = now
+
+
+def summarize_frames(zcr, stft, rms, sample_rate, timings=None):
+    """
+    Build the feature vector from per-frame values: ZCR and RMS (frames,) and
+    the STFT magnitude (1 + N_FFT // 2, frames). Every block is averaged over frames.
+    Pass a dict as `timings` to get the seconds spent on each feature.
+    """
+    lap = _Laps(timings)
+    power = stft ** 2
+
+    # Chroma_stft
+    chroma = librosa.feature.chroma_stft(S=stft, sr=sample_rate, n_chroma=N_CHROMA)
+    lap('chroma')
+
+    # MelSpectogram
+    mel = np.einsum('ft,mf->mt', power, mel_basis(sample_rate), optimize=True)
+    lap('mel')
+
+    # MFCC (from the same mel spectrogram)
+    mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+    lap('mfcc')
+
+    return np.hstack([
+        np.mean(block, axis=-1) for block in (zcr, chroma, mfcc, rms, mel)
+    ]).astype(np.float64)
+
+
+def compute_features(data, sample_rate, timings=None):
+    """Compute the 162-dim feature vector for an already loaded signal."""
+    lap = _Laps(timings)
+
+    # ZCR
+    zcr = librosa.feature.zero_crossing_rate(y=data, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    lap('zcr')
+
+    # One STFT pass: magnitude for chroma, power for mel and MFCC
+    stft = np.abs(librosa.stft(data, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    lap('stft')
+
+    # RMS Value
+    rms = librosa.feature.rms(y=data, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    lap('rms')
+
+    return summarize_frames(zcr, stft, rms, sample_rate, timings=timings)
+
+
+@functools.lru_cache(maxsize=128)
+def chroma_basis(sample_rate, tuning):
+    """Chroma filterbank for a sample rate and tuning (in 0.01 steps, so few distinct ones)."""
+    return librosa.filters.chroma(sr=sample_rate, n_fft=N_FFT, tuning=tuning, n_chroma=N_CHROMA)
+
+
+def _frame_sums(values, n_samples):
+    # Sums over every centered analysis frame of the (clips, n_samples + N_FFT)
+    # padded values: a frame is N_FFT // HOP_LENGTH whole hops, so add up hop sums
+    hops_per_frame = N_FFT // HOP_LENGTH
+    n_frames = 1 + n_samples // HOP_LENGTH
+    n_hops = n_frames + hops_per_frame - 1
+    hops = values[:, :n_hops * HOP_LENGTH].reshape(len(values), n_hops, HOP_LENGTH).sum(axis=2)
+    return sum(hops[:, k:k + n_frames] for k in range(hops_per_frame))
+
+
+def _zcr_batch(clips):
+    # zero_crossing_rate: a frame's crossings are the sign changes between its
+    # consecutive samples (values within 1e-10 of zero count as positive)
+    padded = np.pad(clips, ((0, 0), (N_FFT // 2, N_FFT // 2)), mode='edge')
+    signs = np.signbit(np.where(np.abs(padded) <= 1e-10, 0, padded))
+    changes = np.zeros(padded.shape, dtype=np.int32)
+    changes[:, 1:] = signs[:, 1:] != signs[:, :-1]
+    # A change at a frame's first sample is with the previous frame's sample
+    first = changes[:, ::HOP_LENGTH][:, :1 + clips.shape[1] // HOP_LENGTH]
+    return (_frame_sums(changes, clips.shape[1]) - first) / N_FFT
+
+
+def _rms_batch(clips):
+    # rms: root of the mean square over each zero-padded frame
+    padded = np.pad(clips.astype(np.float64) ** 2, ((0, 0), (N_FFT // 2, N_FFT // 2)))
+    return np.sqrt(_frame_sums(padded, clips.shape[1]) / N_FFT).astype(clips.dtype)
+
+
+def _tuning_batch(stft, sample_rate):
+    # chroma_stft's estimate_tuning, per clip. piptrack interpolates every bin
+    # but only its peaks are used, so only the peaks are interpolated here.
+    freqs = librosa.fft_frequencies(sr=sample_rate, n_fft=N_FFT)
+    in_range = (freqs >= 150.0) & (freqs < min(4000.0, sample_rate / 2))  # piptrack's fmin/fmax
+    floor = 0.1 * stft.max(axis=1, keepdims=True)  # and its threshold
+    peaks = in_range[:, None] & librosa.util.localmax(stft * (stft > floor), axis=1)
+    clip, bin_, frame = np.nonzero(peaks)
+
+    center = stft[clip, bin_, frame]
+    above = stft[clip, bin_ + 1, frame]
+    below = stft[clip, bin_ - 1, frame]
+    # Parabolic interpolation of the peak position and height
+    curvature = above.astype(np.float64) + below - 2 * center
+    slope = (above.astype(np.float64) - below) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(np.abs(slope) >= np.abs(curvature), 0.0, -slope / curvature).astype(stft.dtype)
+    pitch = ((bin_ + shift) * float(sample_rate) / N_FFT).astype(stft.dtype)
+    mag = center + 0.5 * ((above - below) / 2) * shift
+
+    # Clips without a peak (silence) keep a tuning of 0, as in estimate_tuning
+    tunings = np.zeros(len(stft))
+    bounds = np.searchsorted(clip, np.arange(len(stft) + 1))
+    for i, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        if hi > lo:
+            clip_pitch, clip_mag = pitch[lo:hi], mag[lo:hi]
+            tunings[i] = librosa.pitch_tuning(clip_pitch[clip_mag >= np.median(clip_mag)],
+                                              bins_per_octave=N_CHROMA)
+    return tunings
+
+
+def compute_features_batch(clips, sample_rate, timings=None):
+    """
+    Compute the feature vectors for a (n_clips, n_samples) array of equal-length
+    clips at once. Returns a (n_clips, N_FEATURES) float64 matrix whose rows
+    match compute_features() on each clip.
+    """
+    clips = np.asarray(clips)
+    if clips.ndim != 2:
+        raise ValueError(f"Expected a 2-D (clips, samples) array, got shape {clips.shape}")
+    lap = _Laps(timings)
+
+    zcr = _zcr_batch(clips)
+    lap('zcr')
+
+    stft = np.abs(librosa.stft(clips, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    lap('stft')
+
+    rms = _rms_batch(clips)
+    lap('rms')
+
+    # Each clip's own chroma filterbank, in one batched product
+    bases = np.stack([chroma_basis(sample_rate, tuning) for tuning in _tuning_batch(stft, sample_rate)])
+    chroma = librosa.util.normalize(np.matmul(bases, stft), norm=np.inf, axis=1)
+    lap('chroma')
+
+    mel = np.einsum('nft,mf->nmt', stft ** 2, mel_basis(sample_rate), optimize=True)
+    lap('mel')
+
+    # power_to_db(mel) with its top_db floor taken from each clip's own maximum
+    mel_db = 10.0 * np.log10(np.maximum(1e-10, mel))
+    mel_db = np.maximum(mel_db, mel_db.max(axis=(1, 2), keepdims=True) - 80.0)
+    mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=N_MFCC)
+    lap('mfcc')
+
+    return np.concatenate([
+        zcr.mean(axis=-1, keepdims=True), chroma.mean(axis=-1), mfcc.mean(axis=-1),
+        rms.mean(axis=-1, keepdims=True), mel.mean(axis=-1),
+    ], axis=1).astype(np.float64)
+
+
+def compute_features_grouped(signals, sample_rate, batch_size=64, timings=None):
+    """
+    Feature vectors for a list of 1-D signals, as a (len(signals), N_FEATURES)
+    matrix in the same order. Signals of equal length (every full analysis
+    window) go through compute_features_batch() together, batch_size at a time.
+    """
+    out = np.empty((len(signals), N_FEATURES))
+    by_length = {}
+    for i, signal in enumerate(signals):
+        by_length.setdefault(len(signal), []).append(i)
+    for rows in by_length.values():
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            out[chunk] = compute_features_batch(np.stack([signals[i] for i in chunk]), sample_rate,
+                                                timings=timings)
+    return out
+
+
+def extract_features(file_path, sr=SAMPLE_RATE):
+    """Extract audio features from a file. Returns None if the file can't be processed."""
+    try:
+        data, sample_rate = load_audio(file_path, sr=sr)
+        return compute_features(data, sample_rate)
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return None
@@ -0,0 +1,30 @@
+# Production server: gunicorn -c gunicorn.conf.py
+# One process per core; each process runs INFERENCE_WORKERS extraction threads
+# behind its bounded job queue and a few more threads to accept requests.
+import os
+
+wsgi_app = 'app:app'
+pythonpath = 'app'
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# Per-process defaults; the cores are already split between the processes
+os.environ.setdefault('INFERENCE_WORKERS', '1')
+os.environ.setdefault('INFERENCE_QUEUE_SIZE', '4')
+cores = os.cpu_count() or 1
+os.environ.setdefault('BATCH_WORKERS', str(max(1, cores // workers)))
+# BLAS/OpenMP threads per process: cores // (workers x INFERENCE_WORKERS), see thread_limits.py
+os.environ.setdefault('INTRA_OP_THREADS',
+                      str(max(1, cores // (workers * int(os.environ['INFERENCE_WORKERS'])))))
+
+# Requests are bounded by REQUEST_TIMEOUT / LONG_REQUEST_TIMEOUT in the app;
+# this only recycles a worker that stopped responding altogether
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# The model is loaded on a background thread, which must start after the fork
+preload_app = False
@@ -0,0 +1,81 @@
+"""
+Cross-validated hyperparameter search for the emotion MLP.
+
+Every configuration of PARAM_GRID (or a random sample of n_iter of them) is
+scored with stratified k-fold cross-validation. The (configuration, fold) fits
+run in parallel across SEARCH_JOBS processes. The StandardScaler is part of
+the pipeline, so each fold is scaled with statistics from its own training
+split only.
+
+The search runs on feature vectors that are already extracted (the feature
+cache), so trying another configuration never decodes audio again.
+models/search_models.py is the command-line entry point.
+"""
+
+import json
+import os
+
+import numpy as np
+
+SEARCH_JOBS = int(os.environ.get('SEARCH_JOBS', -1))
+SEARCH_FOLDS = int(os.environ.get('SEARCH_FOLDS', 5))
+
+# Includes the configuration used by models/train_models.py
+PARAM_GRID = {
+    'hidden_layer_sizes': [(128,), (256,), (256, 128), (256, 128, 64), (512, 256, 128)],
+    'alpha': [1e-5, 1e-4, 1e-3, 1e-2],
+    'batch_size': [32, 64, 128],
+    'learning_rate_init': [1e-3, 3e-3],
+    'activation': ['relu', 'tanh'],
+}
+
+
+def build_search(param_grid=PARAM_GRID, folds=SEARCH_FOLDS, n_iter=0, jobs=SEARCH_JOBS, max_iter=500,
+                 random_state=42):
+    """A GridSearchCV (n_iter=0) or RandomizedSearchCV over a scaler + MLP pipeline."""
+    from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, StratifiedKFold
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('mlp', MLPClassifier(solver='adam', learning_rate='adaptive', max_iter=max_iter,
+                              random_state=random_state)),
+    ])
+    grid = {'mlp__' + name: values for name, values in param_grid.items()}
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    if n_iter:
+        return RandomizedSearchCV(pipeline, grid, n_iter=n_iter, cv=cv, n_jobs=jobs, scoring='accuracy',
+                                  random_state=random_state, verbose=1)
+    return GridSearchCV(pipeline, grid, cv=cv, n_jobs=jobs, scoring='accuracy', verbose=1)
+
+
+def leaderboard(search):
+    """One row per configuration, best first."""
+    results = search.cv_results_
+    rows = []
+    for i, params in enumerate(results['params']):
+        rows.append({
+            'rank': int(results['rank_test_score'][i]),
+            'mean_accuracy': float(results['mean_test_score'][i]),
+            'std_accuracy': float(results['std_test_score'][i]),
+            'mean_fit_seconds': float(results['mean_fit_time'][i]),
+            'params': json.dumps({name.replace('mlp__', '', 1): value for name, value in params.items()}),
+        })
+    return sorted(rows, key=lambda row: (row['rank'], -row['mean_accuracy']))
+
+
+def run_search(X, labels, **options):
+    """
+    Search on a feature matrix and its string labels.
+    Returns (search, encoder, leaderboard rows); search.best_estimator_ is
+    refitted on all samples.
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(labels)
+    search = build_search(**options)
+    search.fit(np.asarray(X), y)
+    return search, encoder, leaderboard(search)
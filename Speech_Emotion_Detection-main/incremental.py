@@ -0,0 +1,182 @@
+"""
+Incremental model updates for newly added training clips.
+
+models/train_state.json records the mtime, size and label of every file the
+current model was trained on. update_model() compares a manifest against it
+and only extracts features for new or changed files. It updates the
+StandardScaler statistics with partial_fit and warm-starts the MLP with a few
+partial_fit epochs over the new clips, mixed with a replay sample of earlier
+ones read back from the feature cache so the model doesn't forget them.
+
+A full retrain is still needed (update_model returns None) when there is no
+trained model yet or a new clip carries a label the model has never seen.
+"""
+
+import json
+import os
+import random
+
+import numpy as np
+
+from dataset import extract_dataset
+
+MODEL_DIR = 'models'
+STATE_FILE = 'train_state.json'
+INCREMENTAL_EPOCHS = int(os.environ.get('INCREMENTAL_EPOCHS', 20))
+# Earlier clips replayed per new clip during an update
+INCREMENTAL_REPLAY = int(os.environ.get('INCREMENTAL_REPLAY', 4))
+
+
+def _signature(file_path, label):
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size, str(label)]
+
+
+class TrainState:
+    """Which files (by stat and label) the saved model has been trained on."""
+
+    def __init__(self, model_dir=MODEL_DIR):
+        self.path = os.path.join(model_dir, STATE_FILE)
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.files = json.load(f)['files']
+
+    def changed(self, entries):
+        """(path, label) entries that are new or modified since training; see vanished() for deleted ones."""
+        changed = []
+        for path, label in entries:
+            try:
+                signature = _signature(path, label)
+            except OSError:
+                continue
+            if self.files.get(os.path.abspath(path)) != signature:
+                changed.append((path, label))
+        return changed
+
+    def vanished(self, entries):
+        """Manifest entries whose file no longer exists (deleted after the manifest was built)."""
+        return [path for path, _ in entries if not os.path.exists(path)]
+
+    def missing(self, entries):
+        """Trained-on files that are no longer in the manifest."""
+        current = {os.path.abspath(path) for path, _ in entries}
+        return [path for path in self.files if path not in current]
+
+    def record(self, entries):
+        for path, label in entries:
+            self.files[os.path.abspath(path)] = _signature(path, label)
+
+    def reset(self, entries):
+        self.files = {}
+        self.record(entries)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files}, f)
+        os.replace(tmp_path, self.path)
+
+
+def rescale_first_layer(model, old_mean, old_scale, new_mean, new_scale):
+    """
+    Adjust the first layer in place so the network computes the same function
+    on inputs standardised with the new scaler statistics:
+    (x - m) / s == (x - m') / s' * (s' / s) + (m' - m) / s
+    """
+    weights, bias = model.coefs_[0], model.intercepts_[0]
+    bias += ((new_mean - old_mean) / old_scale) @ weights
+    weights *= (new_scale / old_scale)[:, None]
+
+
+def update_model(entries, cache, model_dir=MODEL_DIR, epochs=INCREMENTAL_EPOCHS, replay=INCREMENTAL_REPLAY,
+                 random_state=0):
+    """
+    Update the saved model with the new or changed (path, label) entries.
+    Returns a summary dict, or None if a full retrain is required.
+    """
+    import joblib
+    from inference import DEFAULT_MODEL_PATH, export_model
+
+    paths = {name: os.path.join(model_dir, name + '.pkl') for name in ('saved_model', 'scaler', 'label_encoder')}
+    if not all(os.path.exists(path) for path in paths.values()):
+        print("No trained model found; a full training run is required.")
+        return None
+
+    state = TrainState(model_dir)
+    new_entries = state.changed(entries)
+    removed = state.missing(entries)
+    vanished = state.vanished(entries)
+    if removed:
+        print(f"{len(removed)} previously trained files are gone; run a full retrain to forget them.")
+    for path in vanished:
+        print(f"Error processing {path}: file not found, skipped")
+    if not new_entries:
+        print("No new or changed files; the model is up to date.")
+        return {'new': 0, 'removed': len(removed), 'vanished': len(vanished)}
+
+    model = joblib.load(paths['saved_model'])
+    scaler = joblib.load(paths['scaler'])
+    encoder = joblib.load(paths['label_encoder'])
+
+    unknown = sorted({str(label) for _, label in new_entries} - set(encoder.classes_))
+    if unknown:
+        print(f"New labels {unknown} are not in the model; a full training run is required.")
+        return None
+
+    print(f"Extracting features for {len(new_entries)} new or changed files...")
+    vectors, errors = extract_dataset([path for path, _ in new_entries], cache=cache)
+    usable = [(entry, vector) for entry, vector in zip(new_entries, vectors) if vector is not None]
+    if not usable:
+        print("None of the new files could be processed.")
+        return None
+    X_new = np.array([vector for _, vector in usable])
+    y_new = encoder.transform([label for (_, label), _ in usable])
+
+    # Scaler statistics over old + new samples, with the network adjusted to match
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X_new)
+    rescale_first_layer(model, old_mean, old_scale, scaler.mean_, scaler.scale_)
+    accuracy_before = model.score(scaler.transform(X_new), y_new)
+
+    # Replay a sample of earlier clips; their vectors are feature-cache hits
+    rng = random.Random(random_state)
+    new_paths = {os.path.abspath(path) for path, _ in new_entries}
+    labels = {os.path.abspath(path): label for path, label in entries}
+    old = [path for path in state.files if path not in new_paths and path in labels]
+    X_old, y_old = [], []
+    for path in rng.sample(old, min(len(old), replay * len(usable))):
+        try:
+            vector = cache.lookup_file(path)[1]
+        except OSError:  # deleted since it was trained on
+            continue
+        if vector is not None and labels[path] in encoder.classes_:
+            X_old.append(vector)
+            y_old.append(labels[path])
+
+    X_train = scaler.transform(np.vstack([X_new] + ([np.array(X_old)] if X_old else [])))
+    y_train = np.concatenate([y_new, encoder.transform(y_old)]) if y_old else y_new
+    order = np.random.default_rng(random_state)
+    print(f"Updating the model on {len(y_new)} new and {len(y_old)} replayed clips for {epochs} epochs...")
+    for _ in range(epochs):
+        shuffle = order.permutation(len(y_train))
+        model.partial_fit(X_train[shuffle], y_train[shuffle])
+    accuracy_after = model.score(scaler.transform(X_new), y_new)
+    print(f"Accuracy on the new clips: {accuracy_before*100:.2f}% -> {accuracy_after*100:.2f}%")
+
+    joblib.dump(model, paths['saved_model'])
+    joblib.dump(scaler, paths['scaler'])
+    export_model(model, scaler, encoder, os.path.join(model_dir, os.path.basename(DEFAULT_MODEL_PATH)))
+
+    state.record([entry for entry, _ in usable])
+    state.save()
+    return {
+        'new': len(usable),
+        'failed': len(errors),
+        'replayed': len(y_old),
+        'removed': len(removed),
+        'vanished': len(vanished),
+        'accuracy_before': accuracy_before,
+        'accuracy_after': accuracy_after,
+    }
@@ -0,0 +1,248 @@
+"""
+NumPy-only inference for the trained MLP.
+
+export_model() folds the StandardScaler into the first layer of the network
+and writes the weights and class labels to a versioned .npz file. NumpyMLP
+loads it without sklearn or joblib and returns labels and probabilities from
+a single forward pass.
+
+The forward pass can run at reduced precision (INFERENCE_PRECISION):
+
+  float64   as trained (default)
+  float32   half the weight and activation bytes
+  int8      weights quantized per output unit with a float32 scale, so
+            W ~= q * scale. A storage and download format: the file is
+            about an eighth of the float64 one, but NumPy has no int8
+            matrix product, so the weights are dequantized to float32 once
+            when the engine is built and the forward pass is the float32
+            one. The int8 arrays are kept for save(), so memory is a
+            quarter above float32. The folded-in scaler gives the first
+            layer's rows very different magnitudes, so they are equalized
+            first by a per-feature input_scale, folded back in on load.
+
+compare_precisions() checks agreement with the float64 model on held-out
+rows, and benchmarks/bench_precision.py reports accuracy and latency.
+"""
+
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 2  # 2 added precision and int8 scales; version 1 files are float64
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+DEFAULT_MODEL_PATH = 'models/model.npz'
+
+PRECISIONS = ('float64', 'float32', 'int8')
+INFERENCE_PRECISION = os.environ.get('INFERENCE_PRECISION', 'float64')
+
+ACTIVATIONS = {
+    'identity': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'tanh': np.tanh,
+    'logistic': lambda x: 0.5 * (1.0 + np.tanh(0.5 * x)),  # overflow-free sigmoid
+}
+
+
+def _softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def _quantize(weights):
+    """Symmetric int8 quantization with one scale per output unit (column)."""
+    scales = np.abs(weights).max(axis=0) / 127.0
+    scales[scales == 0] = 1.0
+    return np.rint(weights / scales).astype(np.int8), scales.astype(np.float32)
+
+
+class NumpyMLP:
+    """Scaler + MLP forward pass with plain NumPy matrix products."""
+
+    def __init__(self, weights, biases, activation, out_activation, labels, mean=None, scale=None,
+                 precision='float64', scales=None, input_scale=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision '{precision}', expected one of {PRECISIONS}")
+        if precision == 'int8':
+            # Already quantized (see with_precision); the scaler must be folded in beforehand
+            if scales is None or mean is not None or scale is not None:
+                raise ValueError("int8 weights need their scales and a folded-in scaler")
+            weights = [np.asarray(w, dtype=np.int8) for w in weights]
+            scales = [np.asarray(s, dtype=np.float32) for s in scales]
+            biases = [np.asarray(b, dtype=np.float32) for b in biases]
+            if input_scale is not None:
+                input_scale = np.asarray(input_scale, dtype=np.float32)
+        else:
+            weights = [np.asarray(w, dtype=np.float64) for w in weights]
+            biases = [np.asarray(b, dtype=np.float64) for b in biases]
+            # Fold (x - mean) / scale into the first layer:
+            # x @ (W / scale) + (b - (mean / scale) @ W)
+            if mean is not None or scale is not None:
+                n_inputs = weights[0].shape[0]
+                mean = np.zeros(n_inputs) if mean is None else np.asarray(mean, dtype=np.float64)
+                scale = np.ones(n_inputs) if scale is None else np.asarray(scale, dtype=np.float64)
+                biases[0] = biases[0] - (mean / scale) @ weights[0]
+                weights[0] = weights[0] / scale[:, None]
+            weights = [w.astype(precision, copy=False) for w in weights]
+            biases = [b.astype(precision, copy=False) for b in biases]
+            scales = input_scale = None
+        if scales is None:
+            self._forward_weights = weights
+        else:
+            # Dequantized once here; widening per call would allocate a float32 copy every time
+            self._forward_weights = [w.astype(np.float32) * s for w, s in zip(weights, scales)]
+            if input_scale is not None:
+                self._forward_weights[0] *= input_scale[:, None]
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{activation}'")
+        self.weights = weights
+        self.biases = biases
+        self.scales = scales
+        self.input_scale = input_scale
+        self.precision = precision
+        self.dtype = np.dtype(np.float64 if precision == 'float64' else np.float32)
+        self.activation = activation
+        self.out_activation = out_activation
+        self.labels = np.asarray(labels)
+        self.n_features = weights[0].shape[0]
+
+    @classmethod
+    def from_estimators(cls, model, scaler=None, encoder=None):
+        """Build from a fitted MLPClassifier, StandardScaler and LabelEncoder."""
+        labels = encoder.inverse_transform(model.classes_) if encoder is not None else model.classes_
+        return cls(
+            model.coefs_, model.intercepts_, model.activation, model.out_activation_, labels,
+            mean=getattr(scaler, 'mean_', None), scale=getattr(scaler, 'scale_', None),
+        )
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version not in SUPPORTED_FORMAT_VERSIONS:
+                raise ValueError(f"Unsupported model format version {version} (expected {FORMAT_VERSION})")
+            n_layers = int(data['n_layers'])
+            precision = str(data['precision']) if 'precision' in data.files else 'float64'
+            # Weights are stored with the scaler already folded in
+            return cls(
+                [data[f'W{i}'] for i in range(n_layers)],
+                [data[f'b{i}'] for i in range(n_layers)],
+                str(data['activation']), str(data['out_activation']), data['labels'],
+                precision=precision,
+                scales=[data[f'S{i}'] for i in range(n_layers)] if precision == 'int8' else None,
+                input_scale=data['input_scale'] if 'input_scale' in data.files else None,
+            )
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        arrays = {f'W{i}': w for i, w in enumerate(self.weights)}
+        arrays.update({f'b{i}': b for i, b in enumerate(self.biases)})
+        if self.scales is not None:
+            arrays.update({f'S{i}': s for i, s in enumerate(self.scales)})
+        if self.input_scale is not None:
+            arrays['input_scale'] = self.input_scale
+        # Written next to the target and renamed, so a server watching the
+        # file never loads a partial model
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                format_version=np.int64(FORMAT_VERSION),
+                n_layers=np.int64(len(self.weights)),
+                activation=np.str_(self.activation),
+                out_activation=np.str_(self.out_activation),
+                precision=np.str_(self.precision),
+                labels=self.labels.astype(str),
+                **arrays
+            )
+        os.replace(tmp_path, path)
+
+    @property
+    def stored_nbytes(self):
+        """Uncompressed size of the weights, biases and scales save() writes."""
+        extra = (self.scales or []) + ([self.input_scale] if self.input_scale is not None else [])
+        return sum(a.nbytes for a in self.weights + self.biases + extra)
+
+    @property
+    def nbytes(self):
+        """Memory held, including the dequantized weights of an int8 network."""
+        if self.scales is None:
+            return self.stored_nbytes
+        return self.stored_nbytes + sum(w.nbytes for w in self._forward_weights)
+
+    def float_weights(self):
+        """float64 weights, dequantized for int8."""
+        if self.scales is None:
+            return [w.astype(np.float64) for w in self.weights]
+        weights = [w * s.astype(np.float64) for w, s in zip(self.weights, self.scales)]
+        if self.input_scale is not None:
+            weights[0] *= self.input_scale.astype(np.float64)[:, None]
+        return weights
+
+    def with_precision(self, precision):
+        """A copy of this network running at the given precision."""
+        weights = self.float_weights()
+        biases = [b.astype(np.float64) for b in self.biases]
+        if precision == 'int8':
+            # Equalize the first layer's rows: x @ W == (x * r) @ (W / r)
+            input_scale = np.abs(weights[0]).max(axis=1)
+            input_scale[input_scale == 0] = 1.0
+            weights[0] = weights[0] / input_scale[:, None]
+            weights, scales = zip(*(_quantize(w) for w in weights))
+            return NumpyMLP(weights, biases, self.activation, self.out_activation, self.labels,
+                            precision='int8', scales=scales, input_scale=input_scale)
+        return NumpyMLP(weights, biases, self.activation, self.out_activation, self.labels, precision=precision)
+
+    def predict_proba(self, X):
+        """Class probabilities for raw (unscaled) feature rows."""
+        hidden = ACTIVATIONS[self.activation]
+        x = np.asarray(X, dtype=self.dtype)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self._forward_weights, self.biases)):
+            x = x @ w
+            x += b
+            if i < last:
+                x = hidden(x)
+
+        if self.out_activation == 'softmax':
+            return _softmax(x)
+        # Binary classifier: one logistic output unit
+        p = ACTIVATIONS['logistic'](x[:, 0])
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        """Return (labels, probabilities) from one forward pass."""
+        probabilities = self.predict_proba(X)
+        return self.labels[np.argmax(probabilities, axis=1)], probabilities
+
+
+def export_model(model, scaler, encoder, path=DEFAULT_MODEL_PATH, precision='float64'):
+    """Write a fitted MLPClassifier + StandardScaler + LabelEncoder for NumpyMLP."""
+    engine = NumpyMLP.from_estimators(model, scaler, encoder)
+    if precision != 'float64':
+        engine = engine.with_precision(precision)
+    engine.save(path)
+    return engine
+
+
+def compare_precisions(engine, X, labels=None, precisions=PRECISIONS):
+    """
+    Run held-out rows through the network at each precision. Reports how often
+    the predicted label agrees with float64, the largest probability error, the
+    accuracy when true labels are given, the memory held and the size saved.
+    """
+    reference_labels, reference_proba = engine.with_precision('float64').predict(X)
+    report = {}
+    for precision in precisions:
+        candidate = engine.with_precision(precision)
+        predicted, proba = candidate.predict(X)
+        report[precision] = {
+            'agreement': float(np.mean(predicted == reference_labels)),
+            'max_proba_error': float(np.max(np.abs(proba - reference_proba))),
+            'accuracy': float(np.mean(predicted == np.asarray(labels))) if labels is not None else None,
+            'nbytes': candidate.nbytes,
+            'stored_nbytes': candidate.stored_nbytes,
+        }
+    return report
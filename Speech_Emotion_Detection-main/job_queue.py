@@ -0,0 +1,141 @@
+"""
+Bounded job queue in front of feature extraction and inference.
+
+Request handlers hand their CPU-bound work to a JobQueue, which runs it on a
+fixed number of worker threads. At most `max_pending` jobs may be running or
+waiting; beyond that submit() raises QueueFull straight away with an estimate
+of when to retry, instead of letting requests pile up behind a slow upload.
+
+Python threads can't be stopped, so a job that run() gives up on while it is
+already running keeps going until it returns. It hands its worker slot back
+at once, though: the next job starts instead of waiting behind it. The
+abandoned job still counts towards `max_pending` until it finishes, so slow
+uploads can't pile up threads without bound; once the queue is full they get
+QueueFull like everyone else.
+"""
+
+import math
+import os
+import threading
+import time
+from concurrent import futures
+
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', min(4, os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', 16))
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT', 30.0))
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Job:
+    # Guarded by JobQueue._lock
+    __slots__ = ('running', 'abandoned')
+
+    def __init__(self):
+        self.running = False
+        self.abandoned = False
+
+
+class JobQueue:
+    def __init__(self, workers=INFERENCE_WORKERS, max_pending=INFERENCE_QUEUE_SIZE, name='inference',
+                 observer=None):
+        self.workers = workers
+        self.observer = observer  # called with (queue wait, run time) in seconds per job
+        self.max_pending = max(max_pending, workers)
+        # One thread per pending job; the `workers` slots decide how many run at once
+        self._executor = futures.ThreadPoolExecutor(max_workers=self.max_pending, thread_name_prefix=name)
+        self._slots = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._avg_seconds = 1.0  # moving average of job run time, for Retry-After
+        self.completed = 0
+        self.rejected = 0
+        self.abandoned = 0  # timed-out jobs that were still running
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return its Future, or raise QueueFull."""
+        return self._submit(_Job(), fn, args, kwargs)
+
+    def _submit(self, job, fn, args, kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(self._retry_after())
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._timed, job, fn, args, kwargs, time.perf_counter())
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, timeout=REQUEST_TIMEOUT, **kwargs):
+        """
+        Submit a job and wait for its result. Raises QueueFull if the queue is
+        full and TimeoutError if the job doesn't finish within `timeout` seconds.
+        A job that hasn't started yet is dropped; one that is running finishes
+        in the background but frees its worker slot for the next job.
+        """
+        job = _Job()
+        future = self._submit(job, fn, args, kwargs)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError:
+            with self._lock:
+                job.abandoned = True
+                if job.running:
+                    self.abandoned += 1
+                    self._slots.release()
+            future.cancel()
+            raise TimeoutError(f"Job did not finish within {timeout}s") from None
+
+    def _timed(self, job, fn, args, kwargs, submitted):
+        self._slots.acquire()
+        with self._lock:
+            if job.abandoned:
+                # Timed out while waiting for a slot: nobody wants the result
+                self._slots.release()
+                raise futures.CancelledError()
+            job.running = True
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                job.running = False
+                if not job.abandoned:
+                    self._slots.release()  # an abandoned job's slot was handed back already
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+                self.completed += 1
+            if self.observer is not None:
+                self.observer(start - submitted, elapsed)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _retry_after(self):
+        # Time for the workers to drain what is queued now, in whole seconds
+        return max(1, math.ceil(self._avg_seconds * self._pending / self.workers))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'abandoned': self.abandoned,
+                'avg_seconds': round(self._avg_seconds, 4),
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
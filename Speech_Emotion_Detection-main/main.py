@@ -1,43 +1,30 @@
+import argparse
 import os
-import pandas as pd
 
-def create_data_csv(data_dir='data/RAVDESS'):
+from manifest import LABEL_SCHEMES, MANIFEST_WORKERS, build_manifest, rejected_path
+
+def create_data_csv(data_dir='data/RAVDESS', scheme='ravdess', output='data/sample_data.csv',
+                    workers=MANIFEST_WORKERS):
     """
-    Scans the RAVDESS directory, extracts emotions from filenames,
-    and saves the data to data/sample_data.csv.
+    Scans the dataset directory, labels files with the given filename scheme,
+    validates their headers and saves the manifest to data/sample_data.csv.
+    Files that fail validation are listed in data/sample_data.rejected.csv.
     """
-    emotions = {
-        '01': 'neutral',
-        '02': 'calm',
-        '03': 'happy',
-        '04': 'sad',
-        '05': 'angry',
-        '06': 'fearful',
-        '07': 'disgust',
-        '08': 'surprised'
-    }
-    
-    data = []
     base_path = os.path.abspath(os.path.dirname(__file__))
     full_data_dir = os.path.join(base_path, data_dir)
+    csv_path = os.path.join(base_path, output)
 
-    for dirname, _, filenames in os.walk(full_data_dir):
-        for filename in filenames:
-            if filename.endswith('.wav'):
-                try:
-                    emotion_code = filename.split('-')[2]
-                    emotion = emotions.get(emotion_code)
-                    if emotion:
-                        full_path = os.path.join(dirname, filename)
-                        relative_path = os.path.relpath(full_path, base_path).replace('\\', '/')
-                        data.append({'filepath': relative_path, 'emotion': emotion})
-                except IndexError:
-                    continue
-
-    df = pd.DataFrame(data)
-    csv_path = os.path.join(base_path, 'data/sample_data.csv')
-    df.to_csv(csv_path, index=False)
-    print(f"'{csv_path}' created successfully with {len(df)} entries.")
+    summary = build_manifest(full_data_dir, csv_path, scheme=scheme, base_dir=base_path, workers=workers)
+    print(f"'{csv_path}' created successfully with {summary['valid']} entries.")
+    if summary['rejected']:
+        print(f"{summary['rejected']} files failed validation; see '{rejected_path(csv_path)}'.")
 
 if __name__ == '__main__':
-    create_data_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Build the training manifest from a directory of audio files.')
+    parser.add_argument('--data-dir', default='data/RAVDESS')
+    parser.add_argument('--scheme', default='ravdess',
+                        help=f"filename labelling: {', '.join(sorted(LABEL_SCHEMES))} or module:function")
+    parser.add_argument('--output', default='data/sample_data.csv')
+    parser.add_argument('--workers', type=int, default=MANIFEST_WORKERS)
+    args = parser.parse_args()
+    create_data_csv(args.data_dir, args.scheme, args.output, args.workers)
@@ -0,0 +1,281 @@
+"""
+Dataset manifest builder.
+
+Walks one or more directory trees with a thread pool. Each directory is one
+task, and subdirectories are queued as they are found, so slow network
+filesystems are listed many directories at a time. Every audio file gets a
+label from a filename scheme and a header probe (soundfile.info, no samples
+decoded) for duration, sample rate and channels. For WAV files, the frame
+count declared in the RIFF 'data' chunk is checked against what is actually
+on disk, which catches truncated copies.
+
+Valid files go to the manifest CSV (filepath, emotion and the header metadata)
+and rejected ones to <manifest>.rejected.csv with the reason. Rows of an
+existing manifest are reused when a file's size and mtime are unchanged, so a
+rescan only probes new or modified files.
+
+Label schemes map a file path to a label, or None to skip the file. Add one
+with @register_scheme('name'), or pass 'package.module:function' on the
+command line.
+"""
+
+import csv
+import importlib
+import os
+import struct
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import soundfile as sf
+
+from features import OFFSET
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3')
+# Directory listings and header reads are I/O bound, so this can exceed the core count
+MANIFEST_WORKERS = int(os.environ.get('MANIFEST_WORKERS', 32))
+# Clips no longer than the feature offset have no audio left to extract
+MIN_DURATION = float(os.environ.get('MANIFEST_MIN_DURATION', OFFSET))
+
+COLUMNS = ['filepath', 'emotion', 'duration', 'sample_rate', 'channels', 'frames', 'format', 'subtype',
+           'size', 'mtime_ns']
+
+LABEL_SCHEMES = {}
+
+
+def register_scheme(name):
+    def register(fn):
+        LABEL_SCHEMES[name] = fn
+        return fn
+    return register
+
+
+RAVDESS_EMOTIONS = {
+    '01': 'neutral',
+    '02': 'calm',
+    '03': 'happy',
+    '04': 'sad',
+    '05': 'angry',
+    '06': 'fearful',
+    '07': 'disgust',
+    '08': 'surprised',
+}
+
+
+@register_scheme('ravdess')
+def ravdess_label(path):
+    """03-01-05-01-02-01-12.wav: the third field is the emotion code."""
+    parts = os.path.basename(path).split('-')
+    return RAVDESS_EMOTIONS.get(parts[2]) if len(parts) > 2 else None
+
+
+CREMA_EMOTIONS = {'ANG': 'angry', 'DIS': 'disgust', 'FEA': 'fearful', 'HAP': 'happy', 'NEU': 'neutral',
+                  'SAD': 'sad'}
+
+
+@register_scheme('crema')
+def crema_label(path):
+    """CREMA-D, 1001_DFA_ANG_XX.wav: the third field is the emotion."""
+    parts = os.path.basename(path).split('_')
+    return CREMA_EMOTIONS.get(parts[2]) if len(parts) > 2 else None
+
+
+@register_scheme('tess')
+def tess_label(path):
+    """TESS, OAF_back_angry.wav: the last field is the emotion ('ps' is pleasant surprise)."""
+    emotion = os.path.splitext(os.path.basename(path))[0].split('_')[-1].lower()
+    return {'ps': 'surprised', 'fear': 'fearful'}.get(emotion, emotion)
+
+
+@register_scheme('directory')
+def directory_label(path):
+    """<root>/<emotion>/clip.wav, as in data/user_audio."""
+    return os.path.basename(os.path.dirname(path)).lower() or None
+
+
+def get_scheme(name):
+    """A registered scheme, or a 'module:function' to import."""
+    if name in LABEL_SCHEMES:
+        return LABEL_SCHEMES[name]
+    if ':' in name:
+        module, attr = name.split(':', 1)
+        return getattr(importlib.import_module(module), attr)
+    raise ValueError(f"Unknown label scheme '{name}', expected one of {sorted(LABEL_SCHEMES)} or module:function")
+
+
+def _declared_wav_frames(path):
+    """Frame count the RIFF header promises, or None if it can't be read that way."""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return None
+        block_align = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+            if chunk_id == b'fmt ':
+                fmt = f.read(size + (size & 1))
+                block_align = struct.unpack('<H', fmt[12:14])[0] if len(fmt) >= 14 else None
+            elif chunk_id == b'data':
+                # 0xFFFFFFFF: streamed or RF64-style size, nothing to compare against
+                if not block_align or size == 0xFFFFFFFF:
+                    return None
+                return size // block_align
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def probe(path, min_duration=MIN_DURATION):
+    """Header metadata for an audio file; raises ValueError for unusable files."""
+    try:
+        info = sf.info(path)
+    except Exception as e:
+        raise ValueError(f"unreadable header: {e}") from e
+    if info.frames <= 0 or info.samplerate <= 0:
+        raise ValueError("no audio frames")
+    if info.format == 'WAV':
+        declared = _declared_wav_frames(path)
+        if declared is not None and declared > info.frames:
+            raise ValueError(f"truncated: header declares {declared} frames, file holds {info.frames}")
+    if info.duration <= min_duration:
+        raise ValueError(f"too short: {info.duration:.2f}s")
+    return {
+        'duration': round(info.duration, 4),
+        'sample_rate': info.samplerate,
+        'channels': info.channels,
+        'frames': info.frames,
+        'format': info.format,
+        'subtype': info.subtype,
+    }
+
+
+def scan(roots, extensions=AUDIO_EXTENSIONS, workers=MANIFEST_WORKERS):
+    """Yield (path, stat) for every audio file under the roots, listing directories in parallel."""
+    extensions = tuple(ext.lower() for ext in extensions)
+
+    def list_dir(directory):
+        files, subdirs = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(extensions):
+                        files.append((entry.path, entry.stat()))
+        except OSError as e:
+            print(f"Cannot list {directory}: {e}")
+        return files, subdirs
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(list_dir, root) for root in roots}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                pending.update(pool.submit(list_dir, subdir) for subdir in subdirs)
+                yield from files
+
+
+def _read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='') as f:
+        return {row['filepath']: row for row in csv.DictReader(f) if set(COLUMNS) <= set(row)}
+
+
+def build_manifest(roots, output, scheme='ravdess', base_dir=None, extensions=AUDIO_EXTENSIONS,
+                   workers=MANIFEST_WORKERS, min_duration=MIN_DURATION, reuse=True):
+    """
+    Scan the roots and write the manifest CSV and its .rejected.csv.
+    File paths are written relative to base_dir when given.
+    Returns {'files', 'valid', 'rejected', 'unlabelled', 'reused', 'seconds'}.
+    """
+    label_of = get_scheme(scheme) if isinstance(scheme, str) else scheme
+    if isinstance(roots, str):
+        roots = [roots]
+    start = time.perf_counter()
+    previous = _read_manifest(output) if reuse else {}
+    counts = {'files': 0, 'unlabelled': 0, 'reused': 0}
+    lock = threading.Lock()
+    rows, rejected = [], []
+
+    def display(path):
+        if base_dir is None:
+            return path.replace('\\', '/')
+        return os.path.relpath(path, base_dir).replace('\\', '/')
+
+    def check(path, stat):
+        filepath = display(path)
+        label = label_of(path)
+        if label is None:
+            with lock:
+                counts['unlabelled'] += 1
+            return
+        known = previous.get(filepath)
+        if known and known['size'] == str(stat.st_size) and known['mtime_ns'] == str(stat.st_mtime_ns):
+            row = dict(known, emotion=label)
+            with lock:
+                counts['reused'] += 1
+                rows.append(row)
+            return
+        try:
+            meta = probe(path, min_duration)
+        except (ValueError, OSError) as e:
+            with lock:
+                rejected.append({'filepath': filepath, 'emotion': label, 'error': str(e)})
+            return
+        row = dict(filepath=filepath, emotion=label, size=stat.st_size, mtime_ns=stat.st_mtime_ns, **meta)
+        with lock:
+            rows.append(row)
+
+    def safe_check(path, stat):
+        # Nobody reads the futures, so any other error (a broken label scheme,
+        # an unexpected header) is recorded here instead of vanishing with them
+        try:
+            check(path, stat)
+        except Exception as e:
+            with lock:
+                rejected.append({'filepath': display(path), 'emotion': '', 'error': f"{type(e).__name__}: {e}"})
+
+    # Header probes run on a second pool while the scan is still listing directories.
+    # The semaphore bounds queued probes, so memory doesn't grow with the archive size.
+    slots = threading.BoundedSemaphore(workers * 4)
+
+    def run(path, stat):
+        try:
+            safe_check(path, stat)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, stat in scan(roots, extensions, workers):
+            counts['files'] += 1
+            slots.acquire()
+            pool.submit(run, path, stat)
+            if counts['files'] % 10000 == 0:
+                print(f"  found {counts['files']} files...")
+
+    rows.sort(key=lambda row: row['filepath'])
+    rejected.sort(key=lambda row: row['filepath'])
+    _write_csv(output, COLUMNS, rows)
+    _write_csv(rejected_path(output), ['filepath', 'emotion', 'error'], rejected)
+
+    summary = dict(counts, valid=len(rows), rejected=len(rejected), seconds=time.perf_counter() - start)
+    print(f"Scanned {summary['files']} files in {summary['seconds']:.1f}s: {summary['valid']} valid "
+          f"({summary['reused']} unchanged), {summary['rejected']} rejected, {summary['unlabelled']} unlabelled")
+    return summary
+
+
+def rejected_path(output):
+    return os.path.splitext(output)[0] + '.rejected.csv'
+
+
+def _write_csv(path, columns, rows):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(path + '.tmp', path)
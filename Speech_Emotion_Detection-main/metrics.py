@@ -0,0 +1,159 @@
+"""
+Minimal Prometheus metrics without a client library.
+
+Counters and histograms are updated in-process and rendered in the
+Prometheus text exposition format by Registry.render(). Gauges are read from
+a callback at scrape time, so queue depth and model state are always current.
+Metrics are per process; under gunicorn each worker reports its own.
+"""
+
+import contextlib
+import math
+import threading
+import time
+
+# Seconds; covers a cached lookup (sub-ms) up to a long timeline (tens of seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name + '_total', list(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}  # label key -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [0] * len(self.buckets) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        counts = self._values.get(_label_key(self.labelnames, labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + '_bucket', pairs + [('le', _format_value(bound))], cumulative
+            yield self.name + '_sum', pairs, counts[-1]
+            yield self.name + '_count', pairs, cumulative
+
+
+class Gauge:
+    """A value read at scrape time: `fn` returns a number or {label tuple: number}."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+
+    def samples(self):
+        value = self._fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for key, sample in value.items():
+            yield self.name, list(zip(self.labelnames, key)), sample
+
+
+class Registry:
+    def __init__(self, namespace=''):
+        self.namespace = namespace
+        self._metrics = []
+
+    def _add(self, metric):
+        if self.namespace:
+            metric.name = f'{self.namespace}_{metric.name}'
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, fn, labelnames=()):
+        return self._add(Gauge(name, documentation, fn, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, pairs, value in metric.samples():
+                if value is None:
+                    continue
+                lines.append(f'{name}{_format_labels(pairs)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
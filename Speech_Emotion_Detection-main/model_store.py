@@ -0,0 +1,130 @@
+"""
+Background model loading and hot reload for the API.
+
+ModelStore loads the inference engine on a background thread, so the server
+accepts connections immediately, and reports its readiness. It then polls the
+model artifacts and, when they change on disk, loads the new engine next to
+the old one and swaps the reference. Requests that already hold the old
+engine finish with it; nothing is dropped. A failed load (for example a
+half-written file) keeps the current engine and is retried on the next poll.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 5.0))
+
+
+class ModelStore:
+    def __init__(self, loader, artifact_paths, poll_interval=MODEL_RELOAD_INTERVAL):
+        self._loader = loader
+        self.artifact_paths = list(artifact_paths)
+        self.poll_interval = poll_interval
+        self.engine = None
+        self.version = None
+        self.loaded_at = None
+        self.state = 'starting'  # starting -> loading -> ready
+        self.error = None
+        self._signature = None
+        self._loaded = threading.Event()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def available(self):
+        return self.engine is not None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def _current_signature(self):
+        signature = []
+        for path in self.artifact_paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _version(self, signature):
+        digest = hashlib.sha1()
+        for path, _, _ in signature:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()[:12] if signature else None
+
+    def load(self):
+        """(Re)load the engine if the artifacts changed. Returns True if it was swapped."""
+        with self._lock:
+            signature = self._current_signature()
+            if signature == self._signature:
+                return False
+            try:
+                engine = self._loader()
+                version = self._version(signature)
+            except FileNotFoundError:
+                engine, version = None, None
+            except Exception as e:
+                # Keep serving the current engine; retried on the next poll
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Model load failed, keeping the current model: {self.error}")
+                return False
+            if engine is None and self.engine is not None:
+                # Artifacts were removed: keep serving what we have
+                self._signature = signature
+                return False
+            self.engine, self.version = engine, version
+            self.loaded_at = time.time()
+            self.error = None
+            self._signature = signature
+            return True
+
+    def start(self, warmup=None):
+        """Load in the background, run the optional warm-up, then watch for changes."""
+        def run():
+            self.state = 'loading'
+            self.load()
+            if self.available:
+                print(f"Model {self.version} loaded.")
+            else:
+                print("Warning: Trained models not found. Running in demo mode.")
+                print("To train models, run: python models/train_models.py")
+            self._loaded.set()
+            if warmup is not None:
+                try:
+                    warmup(self.engine)
+                except Exception as e:
+                    print(f"Warm-up failed: {e}")
+            self.state = 'ready'
+            self._ready.set()
+
+            while self.poll_interval > 0:
+                time.sleep(self.poll_interval)
+                if self.load():
+                    print(f"Model artifacts changed, now serving model {self.version}.")
+
+        self._thread = threading.Thread(target=run, name='model-store', daemon=True)
+        self._thread.start()
+
+    def wait_loaded(self, timeout=None):
+        """Block until the first load attempt finished (model or demo mode)."""
+        return self._loaded.wait(timeout)
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'model_available': self.available,
+            'model_version': self.version,
+            'loaded_at': self.loaded_at,
+            'load_error': self.error,
+        }
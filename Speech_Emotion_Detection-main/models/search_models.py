@@ -0,0 +1,74 @@
+"""
+Hyperparameter search over cached features.
+
+Scores every configuration in hyperparam_search.PARAM_GRID (or --n-iter random
+ones) with k-fold cross-validation in parallel, writes a leaderboard, and
+exports the best configuration (refitted on all data) as the active model.
+
+Usage: python models/search_models.py [--folds 5] [--n-iter 20] [--jobs -1] [--no-export]
+"""
+
+import argparse
+import os
+import sys
+
+import joblib
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature_cache import FeatureCache
+from feature_store import build_matrix
+from hyperparam_search import SEARCH_FOLDS, SEARCH_JOBS, run_search
+from incremental import TrainState
+from inference import DEFAULT_MODEL_PATH, export_model
+
+LEADERBOARD_PATH = 'models/leaderboard.csv'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cross-validated hyperparameter search for the emotion MLP.')
+    parser.add_argument('--manifest', default='data/sample_data.csv')
+    parser.add_argument('--folds', type=int, default=SEARCH_FOLDS)
+    parser.add_argument('--n-iter', type=int, default=0, help='random configurations to try (0 = full grid)')
+    parser.add_argument('--jobs', type=int, default=SEARCH_JOBS, help='parallel fits (-1 = all cores)')
+    parser.add_argument('--max-iter', type=int, default=500)
+    parser.add_argument('--leaderboard', default=LEADERBOARD_PATH)
+    parser.add_argument('--no-export', action='store_true', help='only write the leaderboard')
+    args = parser.parse_args()
+
+    # Vectors of unchanged files come from the feature cache; only new files are decoded
+    data_df = pd.read_csv(args.manifest)
+    feature_cache = FeatureCache()
+    matrix, errors = build_matrix(zip(data_df.filepath, data_df.emotion), cache=feature_cache)
+    feature_cache.save()
+    labels = matrix.label_names()
+    if errors:
+        print(f"Skipped {len(errors)} files that could not be processed.")
+    print(f"Feature cache: {feature_cache.hits} hits, {feature_cache.misses} misses")
+
+    print(f"Searching over {len(labels)} samples with {args.folds}-fold cross-validation...")
+    search, encoder, board = run_search(matrix.features, labels, folds=args.folds, n_iter=args.n_iter,
+                                        jobs=args.jobs, max_iter=args.max_iter)
+
+    pd.DataFrame(board).to_csv(args.leaderboard, index=False)
+    print(pd.DataFrame(board).head(10).to_string(index=False))
+    print(f"Leaderboard written to {args.leaderboard}")
+    if args.no_export:
+        return
+
+    scaler = search.best_estimator_.named_steps['scaler']
+    model = search.best_estimator_.named_steps['mlp']
+    joblib.dump(model, 'models/saved_model.pkl')
+    joblib.dump(scaler, 'models/scaler.pkl')
+    joblib.dump(encoder, 'models/label_encoder.pkl')
+    export_model(model, scaler, encoder, DEFAULT_MODEL_PATH)
+
+    # The exported model is a full training run, so --incremental can build on it
+    state = TrainState()
+    state.reset(matrix.entries())
+    state.save()
+    print(f"Best configuration ({search.best_score_*100:.2f}% CV accuracy) exported to {DEFAULT_MODEL_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,104 +1,115 @@
+import argparse
 import os
+import sys
 import pandas as pd
 import numpy as np
-import librosa
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.neural_network import MLPClassifier
 import joblib
 
-# --- Feature Extraction ---
-def extract_features(file_path):
-    try:
-        data, sample_rate = librosa.load(file_path, duration=2.5, offset=0.6)
-        
-        result = np.array([])
-        
-        # ZCR
-        zcr = np.mean(librosa.feature.zero_crossing_rate(y=data).T, axis=0)
-        result = np.hstack((result, zcr))
-        
-        # Chroma_stft
-        stft = np.abs(librosa.stft(data))
-        chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, chroma_stft))
-        
-        # MFCC
-        mfcc = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, mfcc))
-        
-        # RMS Value
-        rms = np.mean(librosa.feature.rms(y=data).T, axis=0)
-        result = np.hstack((result, rms))
-        
-        # MelSpectogram
-        mel = np.mean(librosa.feature.melspectrogram(y=data, sr=sample_rate).T, axis=0)
-        result = np.hstack((result, mel))
-        
-        return result
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
-        return None
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature_cache import FeatureCache
+from feature_store import build_matrix, evaluate, fit_scaler, train_streaming
+from inference import DEFAULT_MODEL_PATH, compare_precisions, export_model
+from incremental import TrainState, update_model
 
 # --- Main Training Script ---
-print("Starting simple model training...")
-
-# Load the dataset manifest
-data_df = pd.read_csv('data/sample_data.csv')
-
-# Extract features
-print("Extracting features for all audio files...")
-X, Y = [], []
-for path, emotion in zip(data_df.filepath, data_df.emotion):
-    features = extract_features(path)
-    if features is not None:
-        X.append(features)
-        Y.append(emotion)
-
-print(f"Extracted features for {len(Y)} audio samples.")
-
-# Prepare data for modeling
-X = np.array(X)
-Y = np.array(Y)
-
-# Encode the labels
-encoder = LabelEncoder()
-Y = encoder.fit_transform(Y)
-
-# Split the data
-x_train, x_test, y_train, y_test = train_test_split(X, Y, random_state=0, shuffle=True)
-print(f"Training set size: {x_train.shape[0]}")
-print(f"Test set size: {x_test.shape[0]}")
-
-# Scale the features
-scaler = StandardScaler()
-x_train = scaler.fit_transform(x_train)
-x_test = scaler.transform(x_test)
-
-# --- Build and Train the MLP Model ---
-print("Building and training the MLP model...")
-model = MLPClassifier(
-    hidden_layer_sizes=(256, 128, 64), 
-    activation='relu', 
-    solver='adam', 
-    alpha=0.0001, 
-    batch_size=32, 
-    learning_rate='adaptive', 
-    max_iter=500, 
-    random_state=42,
-    verbose=True
-)
-
-model.fit(x_train, y_train)
-
-# --- Evaluate the Model ---
-accuracy = model.score(x_test, y_test)
-print(f"Model Accuracy: {accuracy*100:.2f}%")
-
-# --- Save the Model and Preprocessors ---
-print("Saving the simple model and preprocessors...")
-joblib.dump(model, 'models/saved_model.pkl')
-joblib.dump(scaler, 'models/scaler.pkl')
-joblib.dump(encoder, 'models/label_encoder.pkl')
-
-print("Simple model training complete. The new MLP model is now active.")
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description='Train the emotion MLP on data/sample_data.csv.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only learn from files added or changed since the last training run')
+    parser.add_argument('--stream', action='store_true',
+                        help='train chunk by chunk from the on-disk feature matrix (bounded memory)')
+    parser.add_argument('--epochs', type=int, default=50, help='passes over the data with --stream')
+    args = parser.parse_args()
+
+    # Load the dataset manifest
+    data_df = pd.read_csv('data/sample_data.csv')
+    entries = list(zip(data_df.filepath, data_df.emotion))
+
+    if args.incremental:
+        print("Starting incremental model update...")
+        feature_cache = FeatureCache()
+        summary = update_model(entries, feature_cache)
+        feature_cache.save()
+        if summary is not None:
+            print("Incremental update complete.")
+            return
+        print("Falling back to a full training run.")
+
+    print("Starting simple model training...")
+
+    # Extract features in parallel (EXTRACT_WORKERS processes) straight into the
+    # float32 feature matrix; vectors of unchanged files come from the feature cache
+    print("Extracting features for all audio files...")
+    feature_cache = FeatureCache()
+    matrix, errors = build_matrix(entries, cache=feature_cache)
+    feature_cache.save()
+
+    print(f"Extracted features for {len(matrix)} audio samples.")
+    if errors:
+        print(f"Skipped {len(errors)} files that could not be processed.")
+    print(f"Feature cache: {feature_cache.hits} hits, {feature_cache.misses} misses")
+
+    # Label codes in the matrix are the LabelEncoder codes
+    encoder = LabelEncoder().fit(matrix.classes)
+
+    # Split the data
+    train_rows, test_rows = train_test_split(np.arange(len(matrix)), random_state=0, shuffle=True)
+    print(f"Training set size: {len(train_rows)}")
+    print(f"Test set size: {len(test_rows)}")
+
+    # --- Build and Train the MLP Model ---
+    print("Building and training the MLP model...")
+    model = MLPClassifier(
+        hidden_layer_sizes=(256, 128, 64), 
+        activation='relu', 
+        solver='adam', 
+        alpha=0.0001, 
+        batch_size=32, 
+        learning_rate='adaptive', 
+        max_iter=500, 
+        random_state=42,
+        verbose=not args.stream
+    )
+
+    if args.stream:
+        # Chunked passes over the memory-mapped matrix, for corpora that don't fit in RAM
+        scaler = fit_scaler(matrix, train_rows)
+        train_streaming(model, scaler, matrix, train_rows, epochs=args.epochs)
+    else:
+        scaler = StandardScaler()
+        model.fit(scaler.fit_transform(matrix.features[train_rows]), matrix.labels[train_rows])
+
+    # --- Evaluate the Model ---
+    accuracy = evaluate(model, scaler, matrix, np.sort(test_rows))
+    print(f"Model Accuracy: {accuracy*100:.2f}%")
+
+    # --- Save the Model and Preprocessors ---
+    print("Saving the simple model and preprocessors...")
+    joblib.dump(model, 'models/saved_model.pkl')
+    joblib.dump(scaler, 'models/scaler.pkl')
+    joblib.dump(encoder, 'models/label_encoder.pkl')
+
+    # Compact NumPy export used by the API (no sklearn needed to serve it)
+    engine = export_model(model, scaler, encoder, DEFAULT_MODEL_PATH)
+    print(f"Exported inference model to {DEFAULT_MODEL_PATH}")
+
+    # How the reduced-precision modes (INFERENCE_PRECISION) do on the test set
+    test_rows = np.sort(test_rows)
+    report = compare_precisions(engine, matrix.features[test_rows], matrix.label_names(test_rows))
+    for precision, check in report.items():
+        print(f"  {precision:<8} accuracy {check['accuracy']*100:.2f}%, agrees with float64 on "
+              f"{check['agreement']*100:.2f}%, {check['nbytes'] / 1024:.0f} KiB in memory, "
+              f"{check['stored_nbytes'] / 1024:.0f} KiB saved")
+
+    # Remember what this model was trained on, for --incremental
+    state = TrainState()
+    state.reset(matrix.entries())
+    state.save()
+
+    print("Simple model training complete. The new MLP model is now active.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Opt-in cProfile capture for individual requests.
+
+A request is profiled when it carries the PROFILE_TOKEN in its X-Profile
+header, or at random with probability PROFILE_SAMPLE_RATE. The work is run
+under cProfile and the stats are written to PROFILE_DIR as <id>.prof, for
+download and inspection with pstats or snakeviz. Only one request is profiled
+at a time; when profiling is off the cost is a header lookup.
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'data/profiles')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+
+_PROFILE_ID = re.compile(r'^[\w.-]+$')
+
+
+class Profiler:
+    def __init__(self, directory=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, token=PROFILE_TOKEN,
+                 max_files=PROFILE_MAX_FILES):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.max_files = max_files
+        self._busy = threading.Lock()
+
+    def authorized(self, header_value):
+        """True if no token is configured or the header carries it."""
+        if not self.token:
+            return True
+        return header_value is not None and hmac.compare_digest(header_value, self.token)
+
+    def request_profile(self, name, header_value=None):
+        """Return a new profile id if this request should be profiled, else None."""
+        requested = bool(self.token) and header_value is not None and self.authorized(header_value)
+        if not requested and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return None
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:8]}"
+
+    def run(self, profile_id, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs), under cProfile if profile_id is set. Runs
+        unprofiled if another profile is already being captured.
+        """
+        if profile_id is None or not self._busy.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # another profiler is active in this interpreter
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._save(profile, profile_id)
+        finally:
+            self._busy.release()
+
+    def _save(self, profile, profile_id):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, profile_id + '.prof'))
+        # Keep the most recent PROFILE_MAX_FILES
+        for name in self.list()[self.max_files:]:
+            try:
+                os.remove(self.path(name['id']))
+            except OSError:
+                pass
+
+    def path(self, profile_id):
+        """Path of a stored profile, or None if the id is invalid or unknown."""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + '.prof')
+        return path if os.path.isfile(path) else None
+
+    def list(self):
+        """Stored profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.prof'):
+                stat = entry.stat()
+                profiles.append({'id': entry.name[:-len('.prof')], 'size': stat.st_size,
+                                 'created': stat.st_mtime})
+        return sorted(profiles, key=lambda profile: profile['created'], reverse=True)
+
+    def summary(self, profile_id, limit=40, sort='cumulative'):
+        """Top functions of a stored profile as pstats text."""
+        out = io.StringIO()
+        pstats.Stats(self.path(profile_id), stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
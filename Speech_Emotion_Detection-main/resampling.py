@@ -0,0 +1,77 @@
+"""
+The one resampler used by training and serving.
+
+Every signal is brought to features.SAMPLE_RATE before feature extraction, so
+the mel/chroma filterbanks and frame lengths see the same rate whatever the
+input was. RESAMPLE_QUALITY picks the method:
+
+  soxr_vhq, soxr_hq, soxr_mq, soxr_lq, soxr_qq   libsoxr at that quality
+  polyphase                                       scipy.signal.resample_poly
+
+soxr_hq is librosa's default, so features match the ones librosa.load gave
+during training. benchmarks/bench_resample.py compares speed and feature error.
+"""
+
+import math
+import os
+
+import numpy as np
+import soxr
+
+RESAMPLE_QUALITY = os.environ.get('RESAMPLE_QUALITY', 'soxr_hq')
+
+SOXR_QUALITIES = {
+    'soxr_vhq': 'VHQ',
+    'soxr_hq': 'HQ',
+    'soxr_mq': 'MQ',
+    'soxr_lq': 'LQ',
+    'soxr_qq': 'QQ',
+}
+QUALITIES = tuple(SOXR_QUALITIES) + ('polyphase',)
+
+
+def _check(quality):
+    if quality not in QUALITIES:
+        raise ValueError(f"Unknown resample quality '{quality}', expected one of {QUALITIES}")
+
+
+def resample(samples, orig_sr, target_sr, quality=RESAMPLE_QUALITY):
+    """Resample a mono float32 signal; returns it unchanged if the rates match."""
+    _check(quality)
+    samples = np.asarray(samples, dtype=np.float32)
+    if orig_sr == target_sr:
+        return samples
+    if quality == 'polyphase':
+        from scipy.signal import resample_poly
+
+        ratio = math.gcd(int(orig_sr), int(target_sr))
+        out = resample_poly(samples, int(target_sr) // ratio, int(orig_sr) // ratio)
+    else:
+        out = soxr.resample(samples, orig_sr, target_sr, quality=SOXR_QUALITIES[quality])
+    # Output length as in librosa.resample
+    n_samples = int(math.ceil(len(samples) * target_sr / orig_sr))
+    out = out[:n_samples] if len(out) >= n_samples else np.pad(out, (0, n_samples - len(out)))
+    return np.ascontiguousarray(out, dtype=np.float32)
+
+
+class StreamResampler:
+    """
+    Chunk-by-chunk resampling for streams and long files. Uses libsoxr; the
+    polyphase mode has no streaming form and uses soxr_hq here.
+    """
+
+    def __init__(self, orig_sr, target_sr, quality=RESAMPLE_QUALITY):
+        _check(quality)
+        self.passthrough = orig_sr == target_sr
+        if not self.passthrough:
+            self._stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype='float32',
+                                               quality=SOXR_QUALITIES.get(quality, 'HQ'))
+
+    def push(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        return samples if self.passthrough else self._stream.resample_chunk(samples)
+
+    def flush(self):
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        return self._stream.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
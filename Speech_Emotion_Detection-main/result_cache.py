@@ -0,0 +1,164 @@
+"""
+Cache of finished predictions for uploads that are submitted more than once.
+
+Entries are keyed by the upload's content key (feature_cache.stream_key: file
+bytes plus extractor settings) and the version of the model that produced
+them. The first lookup with a new model version drops every entry of other
+versions, so a retrained model never serves the old model's answers. Entries
+already stored under the new version stay: with the shared sqlite store,
+workers that pick up the new model later keep what earlier ones cached.
+Entries expire after RESULT_CACHE_TTL seconds, and beyond RESULT_CACHE_SIZE
+entries the least recently used one is dropped.
+
+RESULT_CACHE_BACKEND picks where entries live:
+
+  memory   an OrderedDict in this process (default)
+  sqlite   RESULT_CACHE_PATH, shared by every gunicorn worker on the host
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 10000))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 3600))
+RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'memory')
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', 'data/result_cache.sqlite3')
+
+
+class MemoryStore:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+
+    def get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        if entry[0] <= now:
+            del self._entries[key]
+            return None, True
+        self._entries.move_to_end(key)
+        return entry[1], False
+
+    def put(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def retain(self, prefix):
+        for key in [key for key in self._entries if not key.startswith(prefix)]:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(key TEXT PRIMARY KEY, value TEXT, expires_at REAL, used_at REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used_at)')
+
+    def get(self, key, now):
+        row = self._db.execute('SELECT value, expires_at FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None, False
+        if row[1] <= now:
+            self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+            return None, True
+        self._db.execute('UPDATE results SET used_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0]), False
+
+    def put(self, key, value, expires_at):
+        self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                         (key, json.dumps(value), expires_at, time.time()))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._db.execute('DELETE FROM results WHERE key IN '
+                             '(SELECT key FROM results ORDER BY used_at LIMIT ?)', (excess,))
+        return max(excess, 0)
+
+    def retain(self, prefix):
+        self._db.execute('DELETE FROM results WHERE substr(key, 1, ?) != ?', (len(prefix), prefix))
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+
+class ResultCache:
+    """Bounded TTL/LRU cache of JSON-serialisable results per (content key, model version)."""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, backend=RESULT_CACHE_BACKEND,
+                 path=RESULT_CACHE_PATH):
+        if backend == 'memory':
+            self._store = MemoryStore(max_entries)
+        elif backend == 'sqlite':
+            self._store = SQLiteStore(path, max_entries)
+        else:
+            raise ValueError(f"Unknown RESULT_CACHE_BACKEND '{backend}', expected 'memory' or 'sqlite'")
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # Called with the lock held
+        if version != self.version:
+            if self.version is not None:
+                self._store.retain(f'{version}:')
+                self.invalidations += 1
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            value, expired = self._store.get(f'{version}:{key}', time.time())
+            self.expired += expired
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            # A result from a model that has since been replaced is not kept
+            if version != self.version and self.version is not None:
+                return
+            self._check_version(version)
+            self.evicted += self._store.put(f'{version}:{key}', value, time.time() + self.ttl)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'entries': len(self._store),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'invalidations': self.invalidations,
+                'model_version': self.version,
+            }
@@ -0,0 +1,137 @@
+"""
+Sliding-window feature extraction over a live PCM stream.
+
+Samples are consumed as they arrive and each new STFT frame (one per
+HOP_LENGTH samples) is computed exactly once and kept in a ring buffer that
+spans the DURATION analysis window. Every `hop` seconds the window is
+summarised into the same 162-dim vector as features.compute_features, so the
+expensive part of an update is only the handful of new FFT frames.
+"""
+
+import numpy as np
+import librosa
+
+from features import DURATION, HOP_LENGTH, N_FFT, SAMPLE_RATE, summarize_frames
+
+DEFAULT_HOP = 0.25  # seconds between emitted feature vectors
+MIN_HOP = 0.05  # a few STFT frames; shorter hops would run the model on nearly every frame
+MIN_STREAM_RATE, MAX_STREAM_RATE = 8000, 192000  # client sample rates a stream may declare
+
+PCM_FORMATS = {
+    'f32': np.dtype('<f4'),
+    's16': np.dtype('<i2'),
+}
+
+
+def pcm_to_float32(data, fmt='f32'):
+    """Convert little-endian PCM bytes (float32 or int16, mono) to float32 samples."""
+    if fmt not in PCM_FORMATS:
+        raise ValueError(f"Unsupported PCM format '{fmt}', expected one of {sorted(PCM_FORMATS)}")
+    dtype = PCM_FORMATS[fmt]
+    usable = len(data) - len(data) % dtype.itemsize
+    samples = np.frombuffer(data[:usable], dtype=dtype)
+    if fmt == 's16':
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32)
+
+
+def stream_settings(config):
+    """
+    (sample_rate, hop) from a client's stream configuration, with the same
+    defaults as a stream that sends none. Raises ValueError for a rate or hop
+    outside the supported range (including inf and nan); int() of an infinite
+    rate raises OverflowError.
+    """
+    sample_rate = int(config.get('sample_rate', SAMPLE_RATE))
+    hop = float(config.get('hop', DEFAULT_HOP))
+    if not MIN_STREAM_RATE <= sample_rate <= MAX_STREAM_RATE:
+        raise ValueError(f"sample_rate must be between {MIN_STREAM_RATE} and {MAX_STREAM_RATE}")
+    if not MIN_HOP <= hop <= DURATION:
+        raise ValueError(f"hop must be between {MIN_HOP} and {DURATION} seconds")
+    return sample_rate, hop
+
+
+class StreamingFeatureExtractor:
+    """
+    Feed PCM chunks with push(); it returns a list of (time, feature vector)
+    pairs, one per completed hop. `time` is the end of the analysis window in
+    seconds from the start of the stream.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, window=DURATION, hop=DEFAULT_HOP):
+        self.sample_rate = sample_rate
+        self.window_frames = 1 + int(window * sample_rate) // HOP_LENGTH
+        self.hop_frames = max(1, int(round(hop * sample_rate / HOP_LENGTH)))
+
+        self._fft_window = librosa.filters.get_window('hann', N_FFT, fftbins=True).astype(np.float32)
+
+        # Ring buffers of per-frame values covering one analysis window
+        self._magnitude = np.zeros((self.window_frames, 1 + N_FFT // 2), dtype=np.float32)
+        self._zcr = np.zeros(self.window_frames)
+        self._rms = np.zeros(self.window_frames, dtype=np.float32)
+        self._frames = 0
+        self._since_emit = 0
+
+        # Like the centered offline STFT, frame k is centred on sample k * HOP_LENGTH
+        self._pending = np.zeros(N_FFT // 2, dtype=np.float32)
+
+    def push(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        buffer = np.concatenate([self._pending, samples])
+        if len(buffer) < N_FFT:
+            self._pending = buffer
+            return []
+
+        # Only the frames completed by this chunk are transformed
+        frames = librosa.util.frame(buffer, frame_length=N_FFT, hop_length=HOP_LENGTH)
+        n_new = frames.shape[1]
+        self._pending = buffer[n_new * HOP_LENGTH:]
+
+        magnitude = np.abs(np.fft.rfft(frames.T * self._fft_window, axis=-1)).astype(np.float32)
+        zcr = np.mean(librosa.zero_crossings(frames, axis=0, pad=False), axis=0)
+        rms = np.sqrt(np.mean(frames ** 2, axis=0))
+
+        emitted = []
+        for i in range(n_new):
+            slot = self._frames % self.window_frames
+            self._magnitude[slot] = magnitude[i]
+            self._zcr[slot] = zcr[i]
+            self._rms[slot] = rms[i]
+            self._frames += 1
+            self._since_emit += 1
+
+            if self._frames >= self.window_frames and self._since_emit >= self.hop_frames:
+                emitted.append(self._window())
+        return emitted
+
+    def flush(self):
+        """
+        End of stream: pad like the centered offline STFT and emit a last
+        window if at least half a hop arrived since the previous one. A stream
+        shorter than one window is summarised over the frames it has.
+        """
+        emitted = self.push(np.zeros(N_FFT // 2, dtype=np.float32))
+        self._pending = np.zeros(0, dtype=np.float32)
+        short = 0 < self._frames < self.window_frames
+        if not emitted and (short or 2 * self._since_emit >= self.hop_frames):
+            emitted.append(self._window())
+        return emitted
+
+    def voiced_ratio(self, threshold_db):
+        """Fraction of frames in the window whose RMS level is above threshold_db (dBFS)."""
+        n = min(self._frames, self.window_frames)
+        if n == 0:
+            return 0.0
+        level = 20 * np.log10(np.maximum(self._rms[:n], 1e-10))
+        return float(np.mean(level > threshold_db))
+
+    def _window(self):
+        # One emitted item: (end time of the window, feature vector)
+        self._since_emit = 0
+        return (self._frames - 1) * HOP_LENGTH / self.sample_rate, self.features()
+
+    def features(self):
+        """Feature vector for the frames currently in the window."""
+        n = min(self._frames, self.window_frames)
+        # Every feature is a mean over frames, so the ring order doesn't matter
+        return summarize_frames(self._zcr[:n], self._magnitude[:n].T, self._rms[:n], self.sample_rate)
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Keep the app's feature cache out of the working tree
+os.environ.setdefault('FEATURE_CACHE_DIR', tempfile.mkdtemp(prefix='feature_cache_'))
+# ... and async jobs on the in-process queue
+os.environ.setdefault('JOB_DIR', tempfile.mkdtemp(prefix='jobs_'))
+os.environ.setdefault('ASYNC_JOB_BACKEND', 'memory')
+
+
+def make_tone(sample_rate=22050, duration=4.0, seed=0):
+    """A short synthetic 'voice': a few harmonics plus a little noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    data = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((220.0, 440.0, 660.0)))
+    data = 0.3 * data + 0.01 * rng.standard_normal(t.shape)
+    return data.astype(np.float32)
+
+
+@pytest.fixture
+def wav_file(tmp_path):
+    import soundfile as sf
+
+    path = tmp_path / 'tone.wav'
+    sf.write(str(path), make_tone(), 22050)
+    return str(path)
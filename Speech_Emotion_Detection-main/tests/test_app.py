@@ -0,0 +1,384 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import zipfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from conftest import PROJECT_ROOT, make_tone
+from features import N_FEATURES
+from inference import NumpyMLP
+
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'app'))
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    import app as app_module
+
+    # A tiny model trained on random vectors stands in for the real artifacts
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(80, N_FEATURES))
+    Y = np.repeat(['happy', 'sad', 'angry', 'calm'], 20)
+    encoder = LabelEncoder()
+    scaler = StandardScaler()
+    model = MLPClassifier(hidden_layer_sizes=(16,), max_iter=50, random_state=0)
+    model.fit(scaler.fit_transform(X), encoder.fit_transform(Y))
+
+    # Let the background load settle first so it can't replace the stand-in
+    app_module.model_store.wait_loaded()
+    monkeypatch.setattr(app_module.model_store, 'engine', NumpyMLP.from_estimators(model, scaler, encoder))
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def wav_bytes(seed):
+    buffer = io.BytesIO()
+    sf.write(buffer, make_tone(seed=seed, duration=3.5), 22050, format='WAV')
+    return buffer.getvalue()
+
+
+def predict_one(client, data, filename='clip.wav'):
+    return client.post('/predict', data={'file': (io.BytesIO(data), filename)}).get_json()
+
+
+def test_predict_batch_matches_single_predictions(client):
+    clips = {f'clip{i}.wav': wav_bytes(i) for i in range(3)}
+    response = client.post('/predict_batch', data={
+        'files': [(io.BytesIO(data), name) for name, data in clips.items()]
+    }).get_json()
+
+    assert response['count'] == 3
+    assert response['failed'] == 0
+    for result in response['results']:
+        single = predict_one(client, clips[result['filename']])
+        assert result['emotion'] == single['emotion']
+        assert result['confidence'] == pytest.approx(single['confidence'])
+
+
+def test_predict_batch_accepts_zip_and_reports_failures_per_file(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('a/one.wav', wav_bytes(1))
+        zf.writestr('a/broken.wav', b'not audio')
+        zf.writestr('notes.txt', b'ignored')
+    archive.seek(0)
+
+    response = client.post('/predict_batch', data={'files': [(archive, 'clips.zip')]}).get_json()
+
+    by_name = {result['filename']: result for result in response['results']}
+    assert set(by_name) == {'a/one.wav', 'a/broken.wav'}
+    assert 'emotion' in by_name['a/one.wav']
+    assert by_name['a/broken.wav']['error'] == 'Feature extraction failed.'
+    assert response['failed'] == 1
+
+
+def test_predict_batch_rejects_archives_that_unpack_too_large(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'BATCH_MAX_MEMBER_BYTES', 1024 * 1024)
+    monkeypatch.setattr(app_module, 'BATCH_MAX_ARCHIVE_BYTES', 3 * 1024 * 1024)
+    opened = []
+    make_spool = app_module.spooled_upload_file
+    monkeypatch.setattr(app_module, 'spooled_upload_file', lambda: opened.append(1) or make_spool())
+
+    def post(*members):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for name, size in members:
+                zf.writestr(name, bytes(size))  # zeros: a few KiB compressed
+        archive.seek(0)
+        return client.post('/predict_batch', data={'files': [(archive, 'bomb.zip')]})
+
+    # Besides the request body, only members within the limits are unpacked
+    response = post(('big.wav', 2 * 1024 * 1024))
+    assert response.status_code == 413
+    assert 'big.wav' in response.get_json()['error']
+    assert len(opened) == 1
+
+    opened.clear()
+    response = post(*((f'clip{i}.wav', 1024 * 1024) for i in range(4)))
+    assert response.status_code == 413
+    assert 'Archive contents' in response.get_json()['error']
+    assert len(opened) == 1 + 3
+
+
+def test_predict_batch_without_files(client):
+    assert client.post('/predict_batch', data={}).get_json() == {'error': 'No file part'}
+
+
+def test_predict_decodes_webm_in_memory(client):
+    from test_audio_io import webm_bytes
+
+    result = predict_one(client, webm_bytes(), filename='recording.webm')
+    assert 'emotion' in result
+
+
+def test_concurrent_uploads_with_same_filename(client):
+    from concurrent.futures import ThreadPoolExecutor
+
+    clips = [wav_bytes(seed) for seed in range(6)]
+    expected = [predict_one(client, data) for data in clips]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda data: predict_one(client, data, 'recording.wav'), clips))
+
+    assert results == expected
+
+
+def test_large_uploads_spill_to_unique_temp_files(app_module, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'UPLOAD_SPILL_BYTES', 1024)
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(tmp_path))
+    monkeypatch.setattr(app_module, 'feature_cache', None)
+    spools = []
+    make_spool = app_module.spooled_upload_file
+    monkeypatch.setattr(app_module, 'spooled_upload_file', lambda: spools.append(make_spool()) or spools[-1])
+
+    result = predict_one(client, wav_bytes(7))
+
+    assert 'emotion' in result
+    assert spools and all(spool._rolled for spool in spools)
+    assert list(tmp_path.iterdir()) == []
+
+
+@contextlib.contextmanager
+def stream_client(app_module):
+    simple_websocket = pytest.importorskip('simple_websocket')
+    pytest.importorskip('flask_sock')
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        ws = simple_websocket.Client.connect(f'ws://127.0.0.1:{server.server_port}/stream')
+        yield ws
+        ws.close()
+    finally:
+        server.shutdown()
+
+
+def test_stream_endpoint_emits_emotion_per_hop(app_module):
+    with stream_client(app_module) as ws:
+        ws.send(json.dumps({'sample_rate': 22050, 'format': 's16', 'hop': 0.5}))
+        pcm = (make_tone(duration=3.2) * 32767).astype('<i2').tobytes()
+        for start in range(0, len(pcm), 8192):
+            ws.send(pcm[start:start + 8192])
+
+        updates = [json.loads(ws.receive(timeout=10)) for _ in range(2)]
+
+    assert [round(update['time'], 1) for update in updates] == [2.5, 3.0]
+    assert all('emotion' in update and 'confidence' in update for update in updates)
+
+
+def test_stream_ignores_a_configuration_that_is_not_an_object(app_module):
+    with stream_client(app_module) as ws:
+        ws.send('5')
+        assert json.loads(ws.receive(timeout=10)) == {'error': 'Invalid stream configuration'}
+
+        # The default f32 format at SAMPLE_RATE still applies
+        ws.send(make_tone(duration=3.2).astype('<f4').tobytes())
+        update = json.loads(ws.receive(timeout=10))
+
+    assert 'emotion' in update
+
+
+def test_stream_rejects_configurations_out_of_range(app_module):
+    with stream_client(app_module) as ws:
+        for config in ('{"hop": 1e308}', '{"hop": Infinity}', '{"hop": 0}',
+                       '{"sample_rate": 1e12}', '{"sample_rate": Infinity}'):
+            ws.send(config)
+            assert json.loads(ws.receive(timeout=10)) == {'error': 'Invalid stream configuration'}
+
+        # The handler is still alive and uses the defaults
+        ws.send(make_tone(duration=3.2).astype('<f4').tobytes())
+        update = json.loads(ws.receive(timeout=10))
+
+    assert 'emotion' in update
+
+
+def test_stream_reports_a_prediction_timeout(app_module, monkeypatch):
+    from concurrent.futures import Future
+
+    # Nothing ever answers these predictions
+    monkeypatch.setattr(app_module.predict_batcher, 'submit', lambda features: Future())
+    monkeypatch.setattr(app_module, 'REQUEST_TIMEOUT', 0.1)
+    with stream_client(app_module) as ws:
+        ws.send(json.dumps({'hop': 0.5}))
+        ws.send(make_tone(duration=3.2).astype('<f4').tobytes())
+        update = json.loads(ws.receive(timeout=10))
+
+    assert update['error'] == 'Request timed out.'
+
+
+def test_predict_timeline_batches_all_windows(app_module, client, monkeypatch):
+    from test_timeline import speech_and_silence, wav_bytes as timeline_wav
+
+    batches = []
+    predict = app_module.predict_emotions
+    monkeypatch.setattr(app_module, 'predict_emotions', lambda matrix: batches.append(len(matrix)) or predict(matrix))
+
+    response = client.post('/predict_timeline', data={
+        'file': (io.BytesIO(timeline_wav(speech_and_silence())), 'call.wav'),
+        'mode': 'vad',
+        'hop': '1.0',
+    }).get_json()
+
+    timeline = response['timeline']
+    spoken = [entry for entry in timeline if not entry.get('silence')]
+    assert batches == [len(spoken)]
+    assert any(entry.get('silence') for entry in timeline)
+    assert all('emotion' in entry for entry in spoken)
+    assert response['duration'] == pytest.approx(12.0, abs=0.05)
+    assert sum(response['emotion_counts'].values()) == len(spoken)
+
+
+def test_predict_timeline_rejects_bad_mode(client):
+    response = client.post('/predict_timeline', data={
+        'file': (io.BytesIO(wav_bytes(0)), 'clip.wav'),
+        'mode': 'sliding',
+    }).get_json()
+    assert 'error' in response
+
+
+def test_health_reports_readiness(app_module, client):
+    app_module.model_store.wait_ready()
+    health = client.get('/health').get_json()
+    assert health['ready'] is True
+    assert health['state'] == 'ready'
+    assert health['model_available'] is True
+    assert health['threads']['intra_op_threads'] >= 1
+    assert client.get('/ready').status_code == 200
+
+
+def test_predict_returns_429_when_queue_is_full(app_module, client, monkeypatch):
+    from job_queue import JobQueue
+
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_pending=1)
+    monkeypatch.setattr(app_module, 'job_queue', queue)
+    queue.submit(release.wait)
+    try:
+        response = client.post('/predict', data={'file': (io.BytesIO(wav_bytes(0)), 'clip.wav')})
+    finally:
+        release.set()
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert 'error' in response.get_json()
+
+
+def test_metrics_report_stages_and_predictions(app_module, client):
+    predict_one(client, wav_bytes(5))
+    client.post('/predict', data={'file': (io.BytesIO(b'not audio'), 'broken.webm')})
+
+    text = client.get('/metrics').get_data(as_text=True)
+    for stage in ('upload', 'decode', 'feature_stft', 'feature_mfcc', 'model', 'job_queue_wait'):
+        assert f'aurasense_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'aurasense_predictions_total{mode="model"}' in text
+    assert 'aurasense_decode_failures_total{format="webm"}' in text
+    assert 'aurasense_request_seconds_bucket{endpoint="predict",le="+Inf"}' in text
+    assert 'aurasense_job_queue_depth' in text
+    assert 'aurasense_model_info{' in text
+
+
+def test_profile_header_captures_a_downloadable_profile(app_module, client, monkeypatch, tmp_path):
+    from profiling import Profiler
+
+    monkeypatch.setattr(app_module, 'profiler', Profiler(directory=str(tmp_path), token='secret'))
+    response = client.post('/predict', data={'file': (io.BytesIO(wav_bytes(6)), 'clip.wav')},
+                           headers={'X-Profile': 'secret'})
+    profile_id = response.headers['X-Profile-Id']
+
+    assert client.get('/profiles').status_code == 403
+    listing = client.get('/profiles', headers={'X-Profile': 'secret'}).get_json()
+    assert [profile['id'] for profile in listing['profiles']] == [profile_id]
+    text = client.get(f'/profiles/{profile_id}?format=text', headers={'X-Profile': 'secret'})
+    assert 'upload_features' in text.get_data(as_text=True)
+    assert client.get(f'/profiles/{profile_id}', headers={'X-Profile': 'secret'}).status_code == 200
+
+
+def test_uploads_get_the_same_features_as_training(app_module, tmp_path):
+    from features import extract_features
+
+    # A 44.1 kHz upload is resampled exactly like a training file
+    path = tmp_path / 'clip.wav'
+    sf.write(str(path), make_tone(sample_rate=44100), 44100)
+    with open(path, 'rb') as f:
+        served, error = app_module.upload_features('clip.wav', io.BytesIO(f.read()))
+    assert error is None
+    np.testing.assert_allclose(served, extract_features(str(path)), rtol=1e-6)
+
+
+def wait_for_job(client, job_id, timeout=30):
+    import time
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_async_job_matches_synchronous_prediction(client):
+    data = wav_bytes(7)
+    response = client.post('/jobs', data={'file': (io.BytesIO(data), 'clip.wav')})
+    assert response.status_code == 202
+    submitted = response.get_json()
+    assert response.headers['Location'] == submitted['status_url']
+    assert submitted['status'] == 'queued'
+
+    job = wait_for_job(client, submitted['id'])
+    assert job['status'] == 'done'
+    expected = predict_one(client, data)
+    assert job['result']['emotion'] == expected['emotion']
+    assert job['result']['confidence'] == pytest.approx(expected['confidence'])
+
+
+def test_async_timeline_job_and_errors(client):
+    buffer = io.BytesIO()
+    sf.write(buffer, make_tone(duration=6.0), 22050, format='WAV')
+    submitted = client.post('/jobs', data={'file': (io.BytesIO(buffer.getvalue()), 'long.wav'),
+                                           'kind': 'timeline'}).get_json()
+    job = wait_for_job(client, submitted['id'])
+    assert job['status'] == 'done'
+    assert job['result']['segments'] == 2
+
+    broken = client.post('/jobs', data={'file': (io.BytesIO(b'not audio'), 'broken.wav')}).get_json()
+    assert wait_for_job(client, broken['id'])['status'] == 'failed'
+
+    assert client.post('/jobs', data={'file': (io.BytesIO(b'x'), 'a.wav'), 'kind': 'nope'}).status_code == 400
+    assert client.post('/jobs', data={'file': (io.BytesIO(b'x'), 'a.wav'),
+                                      'callback_url': 'http://example.com/hook'}).status_code == 400
+    assert client.get('/jobs/unknown').status_code == 404
+
+
+def test_duplicate_uploads_are_served_from_the_result_cache(app_module, client, monkeypatch):
+    from result_cache import ResultCache
+
+    monkeypatch.setattr(app_module, 'result_cache', ResultCache(backend='memory'))
+    monkeypatch.setattr(app_module.model_store, 'version', 'v1')
+    data = wav_bytes(8)
+    first = predict_one(client, data)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('a cached clip should not reach the job queue')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module.job_queue, 'run', fail)
+        assert predict_one(client, data) == first
+    assert app_module.result_cache.stats()['hits'] == 1
+
+    # A new model version invalidates the cached result
+    monkeypatch.setattr(app_module.model_store, 'version', 'v2')
+    predict_one(client, data)
+    stats = app_module.result_cache.stats()
+    assert (stats['hits'], stats['invalidations'], stats['model_version']) == (1, 1, 'v2')
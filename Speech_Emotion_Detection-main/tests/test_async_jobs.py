@@ -0,0 +1,126 @@
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from async_jobs import AsyncJobs, MemoryBackend, SQLiteBackend, new_record, validate_callback
+from job_queue import QueueFull
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    backend = MemoryBackend() if request.param == 'memory' else SQLiteBackend(str(tmp_path / 'jobs.sqlite3'))
+    yield backend
+    backend.close()
+
+
+def test_backend_hands_out_jobs_in_order(backend):
+    first, second = new_record('predict', 'a.wav'), new_record('timeline', 'b.wav', {'hop': 1.0})
+    backend.enqueue(first)
+    backend.enqueue(second)
+    assert backend.pending() == 2
+
+    claimed = backend.claim(timeout=1)
+    assert claimed['id'] == first['id'] and claimed['status'] == 'running'
+    assert backend.claim(timeout=1)['options'] == {'hop': 1.0}
+    assert backend.claim(timeout=0.1) is None
+
+    backend.update(first['id'], status='done', result={'emotion': 'happy'}, finished_at=10.0)
+    assert backend.get(first['id'])['result'] == {'emotion': 'happy'}
+    assert backend.purge(before=20.0) == [first['id']]
+    assert backend.get(first['id']) is None
+    assert backend.get(second['id'])['status'] == 'running'
+
+
+def test_sqlite_requeues_only_jobs_whose_lease_expired(tmp_path):
+    import time
+
+    path = str(tmp_path / 'jobs.sqlite3')
+    backend = SQLiteBackend(path, lease=0.6)
+    record = new_record('predict')
+    backend.enqueue(record)
+    assert backend.claim(timeout=1)['id'] == record['id']
+
+    # Another worker starting up leaves a job with a live owner alone,
+    # even after the initial lease, because the owner keeps renewing it
+    other = SQLiteBackend(path, lease=0.6)
+    assert other.claim(timeout=0.1) is None
+    time.sleep(1.0)
+    assert other.claim(timeout=0.1) is None
+
+    # Once the owner stops (e.g. a crashed worker), the job runs again
+    backend.close()
+    time.sleep(1.0)
+    assert other.claim(timeout=1)['id'] == record['id']
+    other.close()
+
+
+def wait_finished(jobs, job_id):
+    import time
+
+    for _ in range(200):
+        record = jobs.get(job_id)
+        if record['status'] in ('done', 'failed') and (not record['callback_url'] or record['callback_status']):
+            return record
+        time.sleep(0.02)
+    raise AssertionError('job did not finish')
+
+
+def test_workers_run_jobs_and_record_failures(tmp_path):
+    def handler(record, upload_path):
+        with open(upload_path, 'rb') as f:
+            data = f.read()
+        if data == b'bad':
+            raise ValueError('Feature extraction failed.')
+        return {'size': len(data)}
+
+    jobs = AsyncJobs(handler, MemoryBackend(), workers=2, job_dir=str(tmp_path)).start()
+    try:
+        good = jobs.submit('predict', io.BytesIO(b'x' * 3000000), 'a.wav')
+        bad = jobs.submit('predict', io.BytesIO(b'bad'), 'b.wav')
+        assert wait_finished(jobs, good['id'])['result'] == {'size': 3000000}
+        failed = wait_finished(jobs, bad['id'])
+        assert (failed['status'], failed['error']) == ('failed', 'Feature extraction failed.')
+    finally:
+        jobs.shutdown()
+
+
+def test_submit_refuses_when_queue_is_full(tmp_path):
+    jobs = AsyncJobs(lambda record, path: None, MemoryBackend(), workers=0, job_dir=str(tmp_path), max_pending=1)
+    jobs.submit('predict', io.BytesIO(b'x'))
+    with pytest.raises(QueueFull):
+        jobs.submit('predict', io.BytesIO(b'x'))
+
+
+def test_callbacks_only_go_to_local_hosts(tmp_path):
+    validate_callback('http://localhost:8000/hook')
+    for url in ('http://example.com/hook', 'ftp://localhost/hook', 'localhost'):
+        with pytest.raises(ValueError):
+            validate_callback(url)
+
+    received = []
+
+    class Hook(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Hook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    jobs = AsyncJobs(lambda record, path: {'emotion': 'calm'}, MemoryBackend(), workers=1,
+                     job_dir=str(tmp_path)).start()
+    try:
+        record = jobs.submit('predict', io.BytesIO(b'x'),
+                             callback_url=f'http://127.0.0.1:{server.server_port}/hook')
+        assert wait_finished(jobs, record['id'])['callback_status'] == 204
+        assert received[0]['id'] == record['id']
+        assert received[0]['result'] == {'emotion': 'calm'}
+    finally:
+        jobs.shutdown()
+        server.shutdown()
@@ -0,0 +1,81 @@
+import io
+
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+
+import audio_io
+from audio_io import DecodeError, decode_audio, decode_window
+from conftest import make_tone
+from features import DURATION, OFFSET, SAMPLE_RATE, compute_features, extract_features
+
+
+def wav_bytes(sample_rate=22050, channels=1):
+    tone = make_tone(sample_rate=sample_rate)
+    buffer = io.BytesIO()
+    sf.write(buffer, np.stack([tone] * channels, axis=1), sample_rate, format='WAV')
+    return buffer.getvalue()
+
+
+def webm_bytes(sample_rate=48000):
+    av = pytest.importorskip('av')
+    buffer = io.BytesIO()
+    tone = make_tone(sample_rate=sample_rate)
+    with av.open(buffer, 'w', format='webm') as container:
+        stream = container.add_stream('libopus', rate=sample_rate, layout='mono')
+        frame = av.AudioFrame.from_ndarray(tone.reshape(1, -1), format='flt', layout='mono')
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('sr,channels', [(None, 1), (SAMPLE_RATE, 2), (16000, 1)])
+def test_wav_window_matches_librosa_load(tmp_path, sr, channels):
+    data = wav_bytes(sample_rate=44100, channels=channels)
+    path = tmp_path / 'clip.wav'
+    path.write_bytes(data)
+
+    expected, expected_sr = librosa.load(str(path), duration=DURATION, offset=OFFSET, sr=sr)
+    samples, sample_rate = decode_window(data, sr=sr)
+
+    assert sample_rate == expected_sr
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, expected, atol=1e-6)
+
+
+def test_decoded_wav_gives_same_features(wav_file):
+    with open(wav_file, 'rb') as f:
+        data = f.read()
+    np.testing.assert_allclose(compute_features(*decode_window(data)), extract_features(wav_file), rtol=1e-6)
+
+
+def test_webm_decodes_in_process():
+    samples, sample_rate = decode_audio(webm_bytes(), sr=SAMPLE_RATE)
+    assert sample_rate == SAMPLE_RATE
+    assert samples.ndim == 1 and samples.dtype == np.float32
+    assert abs(len(samples) - 4.0 * SAMPLE_RATE) < 0.05 * SAMPLE_RATE
+
+
+def test_ffmpeg_fallback_matches_pyav(monkeypatch):
+    if not audio_io.FFMPEG_BINARY:
+        pytest.skip('no ffmpeg binary')
+    data = webm_bytes()
+    in_process, _ = decode_audio(data, sr=SAMPLE_RATE)
+
+    monkeypatch.setattr(audio_io, 'av', None)
+    piped, sample_rate = decode_audio(data, sr=SAMPLE_RATE)
+
+    assert sample_rate == SAMPLE_RATE
+    n = min(len(piped), len(in_process))
+    assert abs(len(piped) - len(in_process)) < 0.01 * SAMPLE_RATE
+    np.testing.assert_allclose(piped[:n], in_process[:n], atol=1e-3)
+
+
+def test_undecodable_bytes_raise(monkeypatch):
+    monkeypatch.setattr(audio_io, 'FFMPEG_BINARY', None)
+    with pytest.raises(DecodeError):
+        decode_audio(b'not audio')
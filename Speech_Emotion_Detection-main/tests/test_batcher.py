@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher
+
+
+def test_concurrent_rows_share_a_batch_and_get_their_own_result():
+    calls = []
+
+    def fn(matrix):
+        calls.append(len(matrix))
+        return [float(row[0]) * 2 for row in matrix]
+
+    batcher = MicroBatcher(fn, max_batch=64, max_wait=0.05)
+    results = {}
+    barrier = threading.Barrier(16)
+
+    def request(i):
+        barrier.wait()
+        results[i] = batcher.predict(np.full(4, i), timeout=5)
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: 2.0 * i for i in range(16)}
+    assert sum(calls) == 16
+    assert len(calls) < 16
+    stats = batcher.stats()
+    assert stats['items'] == 16
+    assert stats['mean_batch_size'] > 1
+
+
+def test_max_batch_caps_batch_size():
+    calls = []
+    release = threading.Event()
+
+    def fn(matrix):
+        release.wait()
+        calls.append(len(matrix))
+        return list(range(len(matrix)))
+
+    batcher = MicroBatcher(fn, max_batch=3, max_wait=0.0)
+    pending = [batcher.submit(np.zeros(2)) for _ in range(7)]
+    release.set()
+    for future in pending:
+        future.result(5)
+    assert max(calls) <= 3
+    assert sum(calls) == 7
+
+
+def test_errors_reach_every_request_in_the_batch():
+    def fn(matrix):
+        raise ValueError('bad batch')
+
+    batcher = MicroBatcher(fn, max_wait=0.01)
+    pending = [batcher.submit(np.zeros(2)) for _ in range(3)]
+    for future in pending:
+        with pytest.raises(ValueError):
+            future.result(5)
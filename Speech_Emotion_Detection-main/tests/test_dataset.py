@@ -0,0 +1,47 @@
+import numpy as np
+import soundfile as sf
+
+from conftest import make_tone
+from dataset import extract_dataset
+from feature_cache import FeatureCache
+from features import extract_features
+
+
+def write_clips(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = str(tmp_path / f'clip{i}.wav')
+        sf.write(path, make_tone(seed=i), 22050)
+        paths.append(path)
+    return paths
+
+
+def test_parallel_extraction_keeps_order_and_isolates_failures(tmp_path):
+    paths = write_clips(tmp_path, 4)
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'not audio')
+    paths.insert(2, str(broken))
+
+    vectors, errors = extract_dataset(paths, workers=2)
+
+    assert len(vectors) == len(paths)
+    assert vectors[2] is None
+    assert [path for path, _ in errors] == [str(broken)]
+    for path, vector in zip(paths, vectors):
+        if path != str(broken):
+            # Equal-length clips are extracted as a batch, equal up to float32 rounding
+            np.testing.assert_allclose(vector, extract_features(path), rtol=1e-5, atol=1e-5)
+
+
+def test_extraction_reuses_cache(tmp_path):
+    paths = write_clips(tmp_path, 3)
+    cache = FeatureCache(str(tmp_path / 'cache'), max_entries=8)
+
+    first, _ = extract_dataset(paths, workers=1, cache=cache)
+    assert cache.misses == 3
+
+    second, errors = extract_dataset(paths, workers=1, cache=cache)
+    assert errors == []
+    assert cache.hits == 3
+    for a, b in zip(first, second):
+        np.testing.assert_allclose(a, b, rtol=1e-6)
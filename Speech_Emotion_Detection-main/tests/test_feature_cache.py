@@ -0,0 +1,98 @@
+import numpy as np
+
+import features
+from feature_cache import FeatureCache, content_key, file_key
+
+
+def vector(value):
+    return np.full(features.N_FEATURES, value, dtype=np.float64)
+
+
+def test_put_get_and_persistence(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_entries=4)
+    cache.put('a' * 40, vector(1.5))
+    np.testing.assert_array_equal(cache.get('a' * 40), vector(1.5))
+    assert cache.get('b' * 40) is None
+    cache.save()
+
+    reopened = FeatureCache(str(tmp_path), max_entries=4)
+    np.testing.assert_array_equal(reopened.get('a' * 40), vector(1.5))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_entries=2)
+    cache.put('a' * 40, vector(1))
+    cache.put('b' * 40, vector(2))
+    cache.get('a' * 40)
+    cache.put('c' * 40, vector(3))
+
+    assert len(cache) == 2
+    assert 'b' * 40 not in cache
+    np.testing.assert_array_equal(cache.get('a' * 40), vector(1))
+
+
+def test_resize_keeps_most_recent_entries(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_entries=3)
+    for i, key in enumerate(('a', 'b', 'c')):
+        cache.put(key * 40, vector(i))
+    cache.save()
+
+    smaller = FeatureCache(str(tmp_path), max_entries=2)
+    assert 'a' * 40 not in smaller
+    np.testing.assert_array_equal(smaller.get('c' * 40), vector(2))
+
+
+def test_key_depends_on_content_and_sample_rate(wav_file):
+    with open(wav_file, 'rb') as f:
+        data = f.read()
+    assert file_key(wav_file) == content_key(data)
+    assert content_key(data, sr=None) != content_key(data)
+    assert content_key(data + b'\0') != content_key(data)
+
+
+def test_second_extraction_skips_decoding(tmp_path, wav_file, monkeypatch):
+    cache = FeatureCache(str(tmp_path / 'cache'), max_entries=8)
+    expected = cache.extract_features(wav_file)
+    np.testing.assert_allclose(expected, features.extract_features(wav_file), rtol=1e-6)
+    cache.save()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('audio was decoded again')
+
+    monkeypatch.setattr(features, 'extract_features', fail)
+    reopened = FeatureCache(str(tmp_path / 'cache'), max_entries=8)
+    # Vectors are stored as float32
+    np.testing.assert_allclose(reopened.extract_features(wav_file), expected, rtol=1e-6)
+    assert reopened.hits == 1
+
+
+def test_processes_can_share_one_directory(tmp_path):
+    # Two instances stand in for two gunicorn workers on the same cache
+    first = FeatureCache(str(tmp_path), max_entries=2)
+    second = FeatureCache(str(tmp_path), max_entries=2)
+
+    first.put('a' * 40, vector(1))
+    second.put('b' * 40, vector(2))
+    # The other instance's entries are found, and empty slots are not claimed twice
+    np.testing.assert_array_equal(first.get('b' * 40), vector(2))
+    np.testing.assert_array_equal(second.get('a' * 40), vector(1))
+
+    # Full: evicts the least recently used slot, written by the other instance
+    first.put('c' * 40, vector(3))
+    second.put('d' * 40, vector(4))
+    assert len(first) == len(second) == 2
+    np.testing.assert_array_equal(second.get('c' * 40), vector(3))
+    np.testing.assert_array_equal(first.get('d' * 40), vector(4))
+    assert first.get('a' * 40) is None
+
+
+def test_follows_a_resize_by_another_process(tmp_path):
+    first = FeatureCache(str(tmp_path), max_entries=2)
+    first.put('a' * 40, vector(1))
+
+    FeatureCache(str(tmp_path), max_entries=3).put('b' * 40, vector(2))
+    first.put('c' * 40, vector(3))
+
+    reopened = FeatureCache(str(tmp_path), max_entries=3)
+    for key, value in (('a', 1), ('b', 2), ('c', 3)):
+        np.testing.assert_array_equal(reopened.get(key * 40), vector(value))
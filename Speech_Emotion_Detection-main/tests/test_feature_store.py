@@ -0,0 +1,86 @@
+import numpy as np
+import soundfile as sf
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+
+from conftest import make_tone
+from feature_cache import FeatureCache
+from feature_store import FeatureMatrix, build_matrix, evaluate, fit_scaler, train_streaming
+from features import N_FEATURES, extract_features
+
+
+def write_entries(tmp_path, labels):
+    entries = []
+    for i, label in enumerate(labels):
+        path = str(tmp_path / f'{label}_{i}.wav')
+        sf.write(path, make_tone(seed=i, duration=3.2), 22050)
+        entries.append((path, label))
+    return entries
+
+
+def test_build_writes_float32_rows_and_drops_failures(tmp_path):
+    entries = write_entries(tmp_path, ['sad', 'happy', 'sad'])
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'not audio')
+    entries.insert(1, (str(broken), 'angry'))
+
+    matrix, errors = build_matrix(entries, str(tmp_path / 'matrix'), workers=2)
+
+    assert [path for path, _ in errors] == [str(broken)]
+    assert matrix.features.dtype == np.float32
+    assert matrix.features.shape == (3, N_FEATURES)
+    # failed rows are removed, so 'angry' is not a class
+    assert matrix.classes == ['happy', 'sad']
+    assert matrix.entries() == [entry for entry in entries if entry[0] != str(broken)]
+    for (path, _), row in zip(matrix.entries(), matrix.features):
+        np.testing.assert_allclose(row, extract_features(path), rtol=1e-5, atol=1e-4)
+
+    reopened = FeatureMatrix(str(tmp_path / 'matrix'))
+    np.testing.assert_array_equal(reopened.labels, [1, 0, 1])
+
+
+def test_build_reuses_feature_cache(tmp_path):
+    entries = write_entries(tmp_path, ['sad', 'happy'])
+    cache = FeatureCache(str(tmp_path / 'cache'), max_entries=8)
+    build_matrix(entries, str(tmp_path / 'matrix'), workers=1, cache=cache)
+    build_matrix(entries, str(tmp_path / 'matrix'), workers=1, cache=cache)
+    assert (cache.misses, cache.hits) == (2, 2)
+
+
+def fake_matrix(tmp_path, n=300, seed=0):
+    """A matrix directory with separable synthetic rows, without any audio."""
+    import json
+
+    rng = np.random.default_rng(seed)
+    labels = (np.arange(n) % 3).astype(np.int32)
+    features = (rng.normal(size=(n, N_FEATURES)) + labels[:, None] * 3).astype(np.float32)
+    np.save(tmp_path / 'features.npy', features)
+    np.save(tmp_path / 'labels.npy', labels)
+    with open(tmp_path / 'index.json', 'w') as f:
+        json.dump({'classes': ['a', 'b', 'c'], 'paths': [f'{i}.wav' for i in range(n)], 'params': ''}, f)
+    return FeatureMatrix(str(tmp_path)), features, labels
+
+
+def test_chunks_cover_rows_in_order(tmp_path):
+    matrix, features, labels = fake_matrix(tmp_path)
+    chunks = list(matrix.iter_chunks(chunk_rows=64))
+    assert [len(y) for _, y in chunks] == [64, 64, 64, 64, 44]
+    np.testing.assert_array_equal(np.vstack([X for X, _ in chunks]), features)
+
+    rows = np.array([5, 17, 250])
+    X, y = next(matrix.iter_chunks(rows))
+    np.testing.assert_array_equal(X, features[rows])
+    np.testing.assert_array_equal(y, labels[rows])
+
+
+def test_streaming_training_matches_in_memory_statistics(tmp_path):
+    matrix, features, _ = fake_matrix(tmp_path)
+    scaler = fit_scaler(matrix, chunk_rows=50)
+    reference = StandardScaler().fit(features)
+    np.testing.assert_allclose(scaler.mean_, reference.mean_, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(scaler.scale_, reference.scale_, rtol=1e-4)
+
+    train_rows, test_rows = np.arange(0, 300, 2), np.arange(1, 300, 2)
+    model = MLPClassifier(hidden_layer_sizes=(16,), random_state=0)
+    train_streaming(model, scaler, matrix, train_rows, epochs=30, chunk_rows=50)
+    assert evaluate(model, scaler, matrix, test_rows, chunk_rows=50) > 0.9
@@ -0,0 +1,96 @@
+import librosa
+import numpy as np
+import pytest
+
+from conftest import make_tone
+from features import (DURATION, N_FEATURES, compute_features, compute_features_batch, compute_features_grouped,
+                      extract_features, load_audio)
+
+
+def legacy_extract_features(file_path, sr=22050):
+    # The per-feature implementation that used to be copied into each script
+    data, sample_rate = librosa.load(file_path, duration=2.5, offset=0.6, sr=sr)
+    result = np.array([])
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y=data).T, axis=0)
+    result = np.hstack((result, zcr))
+    stft = np.abs(librosa.stft(data))
+    chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate).T, axis=0)
+    result = np.hstack((result, chroma_stft))
+    mfcc = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate).T, axis=0)
+    result = np.hstack((result, mfcc))
+    rms = np.mean(librosa.feature.rms(y=data).T, axis=0)
+    result = np.hstack((result, rms))
+    mel = np.mean(librosa.feature.melspectrogram(y=data, sr=sample_rate).T, axis=0)
+    result = np.hstack((result, mel))
+    return result
+
+
+def test_matches_legacy_extractor(wav_file):
+    expected = legacy_extract_features(wav_file)
+    features = extract_features(wav_file)
+
+    assert features.shape == (N_FEATURES,)
+    assert features.dtype == expected.dtype
+    np.testing.assert_allclose(features, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_matches_legacy_extractor_at_native_rate(tmp_path):
+    import soundfile as sf
+
+    path = str(tmp_path / 'tone_16k.wav')
+    sf.write(path, make_tone(sample_rate=16000), 16000)
+
+    expected = legacy_extract_features(path, sr=None)
+    np.testing.assert_allclose(extract_features(path, sr=None), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_compute_features_on_loaded_signal(wav_file):
+    data, sample_rate = load_audio(wav_file)
+    np.testing.assert_array_equal(compute_features(data, sample_rate), extract_features(wav_file))
+
+
+def test_unreadable_file_returns_none(tmp_path):
+    path = tmp_path / 'broken.wav'
+    path.write_bytes(b'not audio')
+    assert extract_features(str(path)) is None
+
+
+def batch_of_clips(sample_rate, length):
+    # Different pitches, levels and noise per clip, plus a silent one
+    clips = [make_tone(sample_rate=sample_rate, duration=length / sample_rate + 0.01, seed=seed)[:length]
+             * (0.2 + seed) for seed in range(4)]
+    clips[1] = np.roll(clips[1], 1000) * np.linspace(0, 1, length, dtype=np.float32)
+    return np.stack(clips + [np.zeros(length, dtype=np.float32)])
+
+
+@pytest.mark.parametrize('sample_rate,length', [(22050, int(22050 * DURATION)), (16000, 40001), (22050, 1500)])
+def test_batch_matches_per_clip_features(sample_rate, length):
+    clips = batch_of_clips(sample_rate, length)
+    expected = np.stack([compute_features(clip, sample_rate) for clip in clips])
+
+    features = compute_features_batch(clips, sample_rate)
+
+    assert features.shape == (len(clips), N_FEATURES)
+    assert features.dtype == np.float64
+    # Equal up to float32 rounding in the spectrogram sums
+    np.testing.assert_allclose(features, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_batch_records_stage_timings():
+    timings = {}
+    compute_features_batch(batch_of_clips(22050, 22050), 22050, timings=timings)
+    assert set(timings) == {'zcr', 'stft', 'rms', 'chroma', 'mel', 'mfcc'}
+
+
+def test_batch_needs_a_2d_array():
+    with pytest.raises(ValueError):
+        compute_features_batch(np.zeros(22050, dtype=np.float32), 22050)
+
+
+def test_grouped_extraction_keeps_order_across_lengths():
+    signals = [make_tone(duration=seconds, seed=i) for i, seconds in enumerate((2.5, 1.0, 2.5, 2.5, 1.0))]
+
+    features = compute_features_grouped(signals, 22050, batch_size=2)
+
+    expected = np.stack([compute_features(signal, 22050) for signal in signals])
+    np.testing.assert_allclose(features, expected, rtol=1e-5, atol=1e-5)
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+
+from hyperparam_search import build_search, run_search
+
+GRID = {'hidden_layer_sizes': [(8,), (16,)], 'alpha': [1e-4, 1e-2]}
+
+
+def make_data(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = np.array(['happy', 'sad', 'angry'])[np.arange(n) % 3]
+    X = rng.normal(size=(n, 12)) * 50 + 100
+    X[:, 0] += (np.arange(n) % 3) * 200
+    return X, labels
+
+
+def test_leaderboard_covers_every_configuration_best_first():
+    X, labels = make_data()
+    search, encoder, board = run_search(X, labels, param_grid=GRID, folds=3, jobs=2, max_iter=300)
+
+    assert len(board) == 4
+    assert [row['rank'] for row in board] == sorted(row['rank'] for row in board)
+    assert board[0]['mean_accuracy'] == max(row['mean_accuracy'] for row in board)
+    assert json.loads(board[0]['params']).keys() == GRID.keys()
+    assert list(encoder.classes_) == ['angry', 'happy', 'sad']
+    # refit on all samples; predictions decode back to the string labels
+    assert set(encoder.inverse_transform(search.best_estimator_.predict(X))) <= set(labels)
+
+
+def test_random_search_samples_n_iter_configurations():
+    search = build_search(param_grid=GRID, folds=3, n_iter=2, jobs=1, max_iter=200)
+    X, labels = make_data()
+    search.fit(X, np.searchsorted(['angry', 'happy', 'sad'], labels))
+    assert len(search.cv_results_['params']) == 2
+
+
+def test_scaler_is_fitted_per_fold():
+    # The scaler lives inside the pipeline, so every fold gets its own statistics
+    search = build_search(param_grid=GRID, folds=3, jobs=1)
+    assert search.estimator.steps[0][0] == 'scaler'
@@ -0,0 +1,109 @@
+import os
+
+import joblib
+import numpy as np
+import soundfile as sf
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from conftest import make_tone
+import incremental
+from dataset import extract_dataset
+from feature_cache import FeatureCache
+from incremental import TrainState, rescale_first_layer, update_model
+from inference import NumpyMLP
+
+
+def write_clips(directory, labels, start_seed):
+    entries = []
+    for i, label in enumerate(labels):
+        path = os.path.join(directory, f'{label}_{start_seed + i}.wav')
+        sf.write(path, make_tone(seed=start_seed + i, duration=3.2), 22050)
+        entries.append((path, label))
+    return entries
+
+
+def full_train(entries, model_dir, cache):
+    vectors, _ = extract_dataset([path for path, _ in entries], workers=1, cache=cache)
+    encoder = LabelEncoder()
+    scaler = StandardScaler()
+    y = encoder.fit_transform([label for _, label in entries])
+    model = MLPClassifier(hidden_layer_sizes=(16,), max_iter=200, random_state=0)
+    model.fit(scaler.fit_transform(np.array(vectors)), y)
+    joblib.dump(model, os.path.join(model_dir, 'saved_model.pkl'))
+    joblib.dump(scaler, os.path.join(model_dir, 'scaler.pkl'))
+    joblib.dump(encoder, os.path.join(model_dir, 'label_encoder.pkl'))
+    state = TrainState(model_dir)
+    state.reset(entries)
+    state.save()
+
+
+def test_rescaled_first_layer_keeps_predictions():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=3.0, scale=2.0, size=(60, 10))
+    y = np.repeat([0, 1, 2], 20)
+    scaler = StandardScaler().fit(X[:30])
+    model = MLPClassifier(hidden_layer_sizes=(8,), max_iter=100, random_state=0).fit(scaler.transform(X), y)
+    before = model.predict_proba(scaler.transform(X))
+
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X[30:] * 1.5 + 1.0)
+    rescale_first_layer(model, old_mean, old_scale, scaler.mean_, scaler.scale_)
+    np.testing.assert_allclose(model.predict_proba(scaler.transform(X)), before, atol=1e-8)
+
+
+def test_update_only_processes_new_files(tmp_path, monkeypatch):
+    model_dir = tmp_path / 'models'
+    model_dir.mkdir()
+    cache = FeatureCache(str(tmp_path / 'cache'), max_entries=100)
+    old = write_clips(str(tmp_path), ['happy', 'sad'] * 6, start_seed=0)
+    full_train(old, str(model_dir), cache)
+
+    new = write_clips(str(tmp_path), ['happy', 'sad'], start_seed=100)
+    extracted = []
+    real_extract = incremental.extract_dataset
+    monkeypatch.setattr(incremental, 'extract_dataset',
+                        lambda paths, **kwargs: extracted.extend(paths) or real_extract(paths, **kwargs))
+
+    summary = update_model(old + new, cache, model_dir=str(model_dir), epochs=3)
+    assert extracted == [path for path, _ in new]
+    assert summary['new'] == 2
+    assert summary['replayed'] > 0
+    assert set(TrainState(str(model_dir)).files) == {os.path.abspath(path) for path, _ in old + new}
+    engine = NumpyMLP.load(str(model_dir / 'model.npz'))
+    assert set(engine.labels) == {'happy', 'sad'}
+
+    assert update_model(old + new, cache, model_dir=str(model_dir))['new'] == 0
+
+
+def test_unseen_label_needs_full_retrain(tmp_path):
+    model_dir = tmp_path / 'models'
+    model_dir.mkdir()
+    cache = FeatureCache(str(tmp_path / 'cache'), max_entries=100)
+    old = write_clips(str(tmp_path), ['happy', 'sad'] * 3, start_seed=0)
+    full_train(old, str(model_dir), cache)
+
+    new = write_clips(str(tmp_path), ['angry'], start_seed=50)
+    assert update_model(old + new, cache, model_dir=str(model_dir)) is None
+    assert update_model(old, FeatureCache(str(tmp_path / 'other'), max_entries=10),
+                        model_dir=str(tmp_path / 'missing')) is None
+
+
+def test_update_skips_files_deleted_after_the_manifest(tmp_path):
+    model_dir = tmp_path / 'models'
+    model_dir.mkdir()
+    cache = FeatureCache(str(tmp_path / 'cache'), max_entries=100)
+    old = write_clips(str(tmp_path), ['happy', 'sad'] * 4, start_seed=0)
+    full_train(old, str(model_dir), cache)
+
+    new = write_clips(str(tmp_path), ['happy', 'sad', 'sad'], start_seed=100)
+    os.remove(new[2][0])  # never trained on
+    os.remove(old[0][0])  # trained on, and may be picked for replay
+
+    state = TrainState(str(model_dir))
+    assert state.changed(old + new) == new[:2]
+    assert state.vanished(old + new) == [old[0][0], new[2][0]]
+
+    summary = update_model(old + new, cache, model_dir=str(model_dir), epochs=3, replay=10)
+    assert summary['new'] == 2
+    assert summary['vanished'] == 2
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from inference import NumpyMLP, compare_precisions, export_model
+
+
+def fit(labels, activation='relu', hidden=(32, 16)):
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=3.0, scale=[1.0, 10.0, 0.1] * 4, size=(120, 12))
+    Y = np.resize(labels, 120)
+    encoder = LabelEncoder()
+    scaler = StandardScaler()
+    model = MLPClassifier(hidden_layer_sizes=hidden, activation=activation, max_iter=300, random_state=0)
+    model.fit(scaler.fit_transform(X), encoder.fit_transform(Y))
+    return X, model, scaler, encoder
+
+
+@pytest.mark.parametrize('activation', ['relu', 'tanh', 'logistic', 'identity'])
+def test_matches_sklearn_pipeline(activation):
+    X, model, scaler, encoder = fit(['happy', 'sad', 'angry'], activation=activation)
+    engine = NumpyMLP.from_estimators(model, scaler, encoder)
+
+    labels, probabilities = engine.predict(X)
+
+    expected = model.predict_proba(scaler.transform(X))
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(labels, encoder.inverse_transform(model.predict(scaler.transform(X))))
+
+
+def test_binary_classifier():
+    X, model, scaler, encoder = fit(['calm', 'angry'])
+    labels, probabilities = NumpyMLP.from_estimators(model, scaler, encoder).predict(X)
+
+    np.testing.assert_allclose(probabilities, model.predict_proba(scaler.transform(X)), rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(labels, encoder.inverse_transform(model.predict(scaler.transform(X))))
+
+
+def test_export_round_trip(tmp_path):
+    X, model, scaler, encoder = fit(['happy', 'sad', 'angry'])
+    path = str(tmp_path / 'model.npz')
+    exported = export_model(model, scaler, encoder, path)
+
+    loaded = NumpyMLP.load(path)
+
+    assert list(loaded.labels) == ['angry', 'happy', 'sad']
+    np.testing.assert_array_equal(loaded.predict_proba(X), exported.predict_proba(X))
+    # A single row works too
+    assert loaded.predict(X[0])[0][0] == exported.predict(X[:1])[0][0]
+
+
+def test_rejects_unknown_format_version(tmp_path):
+    X, model, scaler, encoder = fit(['happy', 'sad'])
+    path = str(tmp_path / 'model.npz')
+    export_model(model, scaler, encoder, path)
+    data = dict(np.load(path))
+    data['format_version'] = np.int64(99)
+    np.savez(path, **data)
+
+    with pytest.raises(ValueError, match='format version'):
+        NumpyMLP.load(path)
+
+
+def test_reduced_precision_agrees_with_float64():
+    X, model, scaler, encoder = fit(['happy', 'sad', 'angry', 'calm'], hidden=(64, 32))
+    engine = NumpyMLP.from_estimators(model, scaler, encoder)
+    report = compare_precisions(engine, X, encoder.inverse_transform(model.predict(scaler.transform(X))))
+
+    assert report['float32']['agreement'] == 1.0
+    assert report['float32']['max_proba_error'] < 1e-5
+    # Labels hold up; confidences of this overfitted net can move by several points
+    assert report['int8']['agreement'] >= 0.97
+    assert report['int8']['max_proba_error'] < 0.25
+    assert report['float32']['nbytes'] * 2 == report['float64']['nbytes']
+    assert report['int8']['stored_nbytes'] < report['float64']['stored_nbytes'] / 4
+    # Served as float32; the int8 arrays are only kept for saving
+    assert report['int8']['nbytes'] < report['float32']['nbytes'] * 1.3
+
+    int8 = engine.with_precision('int8')
+    assert int8.weights[0].dtype == np.int8
+    assert int8.predict_proba(X).dtype == np.float32
+    assert all(w.dtype == np.float32 for w in int8._forward_weights)
+    # Dequantized weights stay within half a quantization step
+    for original, restored, scales in zip(engine.weights, int8.float_weights(), int8.scales):
+        step = scales * (int8.input_scale[:, None] if original is engine.weights[0] else 1)
+        assert np.all(np.abs(original - restored) <= step / 2 + 1e-9)
+
+
+def test_quantized_export_round_trip(tmp_path):
+    X, model, scaler, encoder = fit(['happy', 'sad', 'angry'])
+    path = str(tmp_path / 'model.npz')
+    exported = export_model(model, scaler, encoder, path, precision='int8')
+
+    loaded = NumpyMLP.load(path)
+    assert loaded.precision == 'int8'
+    np.testing.assert_array_equal(loaded.predict_proba(X), exported.predict_proba(X))
+
+    # Files written before precisions existed load as float64
+    export_model(model, scaler, encoder, path)
+    data = dict(np.load(path))
+    data['format_version'] = np.int64(1)
+    del data['precision']
+    np.savez(path, **data)
+    assert NumpyMLP.load(path).precision == 'float64'
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, QueueFull
+
+
+def test_run_returns_result():
+    queue = JobQueue(workers=2, max_pending=4)
+    assert queue.run(lambda x, y: x + y, 2, y=3) == 5
+    assert queue.stats()['completed'] == 1
+    assert queue.stats()['pending'] == 0
+
+
+def test_full_queue_rejects_with_retry_after():
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_pending=2)
+    blocked = [queue.submit(release.wait) for _ in range(2)]
+
+    with pytest.raises(QueueFull) as error:
+        queue.submit(release.wait)
+    assert error.value.retry_after >= 1
+    assert queue.stats()['rejected'] == 1
+
+    release.set()
+    for future in blocked:
+        future.result(5)
+    assert queue.run(lambda: 'ok') == 'ok'
+
+
+def test_timeout_drops_waiting_job():
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_pending=3)
+    queue.submit(release.wait)
+    ran = []
+
+    with pytest.raises(TimeoutError):
+        queue.run(ran.append, 1, timeout=0.05)
+    release.set()
+    time.sleep(0.1)
+    assert ran == []
+    assert queue.stats()['pending'] == 0
+
+
+def test_timed_out_running_job_frees_its_worker():
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_pending=3)
+
+    try:
+        with pytest.raises(TimeoutError):
+            queue.run(release.wait, timeout=0.05)
+        # The slow job is still running, but the next one doesn't wait behind it
+        assert queue.run(lambda: 'ok', timeout=1) == 'ok'
+        assert queue.stats()['abandoned'] == 1
+        assert queue.stats()['pending'] == 1
+    finally:
+        release.set()
+    time.sleep(0.1)
+    assert queue.stats()['pending'] == 0
+    # Only one job runs at a time again
+    assert queue.run(lambda: 'again') == 'again'
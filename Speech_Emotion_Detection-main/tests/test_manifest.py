@@ -0,0 +1,89 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from conftest import make_tone
+from manifest import build_manifest, get_scheme, probe, rejected_path, scan
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = tmp_path / 'RAVDESS'
+    for actor in ('Actor_01', 'Actor_02'):
+        (root / actor).mkdir(parents=True)
+    sf.write(str(root / 'Actor_01' / '03-01-05-01-01-01-01.wav'), make_tone(duration=2.0), 22050)
+    sf.write(str(root / 'Actor_02' / '03-01-03-01-01-01-02.wav'),
+             np.stack([make_tone(48000, duration=2.0)] * 2, axis=1), 48000)
+    # truncated copy: the header still declares the full length
+    data = (root / 'Actor_01' / '03-01-05-01-01-01-01.wav').read_bytes()
+    (root / 'Actor_02' / '03-01-04-01-01-01-02.wav').write_bytes(data[:len(data) // 2])
+    (root / 'Actor_02' / 'README.txt').write_text('not audio')
+    (root / 'Actor_02' / 'notes.wav').write_bytes(b'')
+    return root
+
+
+def test_scan_walks_nested_directories(dataset):
+    found = sorted(os.path.basename(path) for path, _ in scan([str(dataset)], workers=4))
+    assert found == ['03-01-03-01-01-01-02.wav', '03-01-04-01-01-01-02.wav', '03-01-05-01-01-01-01.wav',
+                     'notes.wav']
+
+
+def test_probe_reads_header_and_catches_truncation(dataset):
+    meta = probe(str(dataset / 'Actor_02' / '03-01-03-01-01-01-02.wav'))
+    assert (meta['sample_rate'], meta['channels'], meta['format']) == (48000, 2, 'WAV')
+    assert meta['duration'] == pytest.approx(2.0)
+
+    with pytest.raises(ValueError, match='truncated'):
+        probe(str(dataset / 'Actor_02' / '03-01-04-01-01-01-02.wav'))
+    with pytest.raises(ValueError, match='too short'):
+        probe(str(dataset / 'Actor_01' / '03-01-05-01-01-01-01.wav'), min_duration=5.0)
+
+
+def test_manifest_keeps_valid_files_and_reports_the_rest(dataset, tmp_path):
+    output = str(tmp_path / 'manifest.csv')
+    summary = build_manifest(str(dataset), output, base_dir=str(tmp_path), workers=4)
+
+    assert (summary['files'], summary['valid'], summary['rejected'], summary['unlabelled']) == (4, 2, 1, 1)
+    rows = read_rows(output)
+    assert [(row['filepath'], row['emotion'], row['sample_rate']) for row in rows] == [
+        ('RAVDESS/Actor_01/03-01-05-01-01-01-01.wav', 'angry', '22050'),
+        ('RAVDESS/Actor_02/03-01-03-01-01-01-02.wav', 'happy', '48000'),
+    ]
+    assert [row['emotion'] for row in read_rows(rejected_path(output))] == ['sad']
+
+    # Unchanged files are not probed again
+    summary = build_manifest(str(dataset), output, base_dir=str(tmp_path), workers=4)
+    assert summary['reused'] == 2
+    assert read_rows(output) == rows
+
+
+def test_errors_in_a_label_function_are_reported_as_rejected(dataset, tmp_path):
+    def label_of(path):
+        if '03-01-03' in path:
+            raise KeyError('no label for this actor')
+        return get_scheme('ravdess')(path)
+
+    output = str(tmp_path / 'manifest.csv')
+    summary = build_manifest(str(dataset), output, scheme=label_of, base_dir=str(tmp_path), workers=4)
+
+    assert (summary['files'], summary['valid'], summary['rejected'], summary['unlabelled']) == (4, 1, 2, 1)
+    rejected = {row['filepath']: row['error'] for row in read_rows(rejected_path(output))}
+    assert rejected['RAVDESS/Actor_02/03-01-03-01-01-01-02.wav'] == "KeyError: 'no label for this actor'"
+
+
+def test_label_schemes():
+    assert get_scheme('ravdess')('/a/03-01-08-02-02-02-24.wav') == 'surprised'
+    assert get_scheme('crema')('/a/1001_DFA_ANG_XX.wav') == 'angry'
+    assert get_scheme('tess')('/a/OAF_back_ps.wav') == 'surprised'
+    assert get_scheme('directory')('/data/user_audio/happy/clip.wav') == 'happy'
+    assert get_scheme('os.path:basename')('/a/b.wav') == 'b.wav'
+    with pytest.raises(ValueError):
+        get_scheme('nope')
@@ -0,0 +1,37 @@
+import pytest
+
+from metrics import Registry
+
+
+def test_render_counters_histograms_and_gauges():
+    registry = Registry('test')
+    requests = registry.counter('requests', 'Requests.', ('status',))
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    registry.gauge('depth', 'Depth.', lambda: 3)
+
+    requests.inc(status=200)
+    requests.inc(2, status=429)
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_requests counter' in lines
+    assert 'test_requests_total{status="200"} 1.0' in lines
+    assert 'test_requests_total{status="429"} 2.0' in lines
+    assert '# TYPE test_latency_seconds histogram' in lines
+    assert 'test_latency_seconds_bucket{le="0.1"} 1.0' in lines
+    assert 'test_latency_seconds_bucket{le="1.0"} 2.0' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3.0' in lines
+    assert 'test_latency_seconds_count 3.0' in lines
+    assert 'test_latency_seconds_sum 5.55' in lines
+    assert 'test_depth 3.0' in lines
+
+
+def test_labels_must_match_and_are_escaped():
+    registry = Registry()
+    info = registry.gauge('info', 'Info.', lambda: {('a"b',): 1}, ('version',))
+    counter = registry.counter('things', 'Things.', ('kind',))
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+    assert 'info{version="a\\"b"} 1.0' in registry.render()
+    assert info.name == 'info'
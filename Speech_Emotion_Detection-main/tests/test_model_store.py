@@ -0,0 +1,93 @@
+import os
+import threading
+
+import numpy as np
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from features import N_FEATURES
+from inference import NumpyMLP, export_model
+from model_store import ModelStore
+
+
+def fit_and_export(path, labels, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(40, N_FEATURES))
+    Y = np.repeat(labels, 40 // len(labels))
+    encoder = LabelEncoder()
+    scaler = StandardScaler()
+    model = MLPClassifier(hidden_layer_sizes=(8,), max_iter=20, random_state=seed)
+    model.fit(scaler.fit_transform(X), encoder.fit_transform(Y))
+    export_model(model, scaler, encoder, path)
+
+
+def test_missing_artifacts_mean_demo_mode(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    store = ModelStore(lambda: NumpyMLP.load(path), [path], poll_interval=0)
+    store.start()
+    assert store.wait_ready(10)
+    assert store.status()['model_available'] is False
+    assert store.status()['state'] == 'ready'
+
+
+def test_reload_swaps_engine_when_artifacts_change(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    fit_and_export(path, ['happy', 'sad'], seed=0)
+    store = ModelStore(lambda: NumpyMLP.load(path), [path], poll_interval=0)
+    assert store.load()
+    first, first_version = store.engine, store.version
+    assert not store.load()  # unchanged on disk
+
+    fit_and_export(path, ['angry', 'calm', 'fearful', 'neutral'], seed=1)
+    os.utime(path, ns=(0, 1))  # the rewrite may land within the same mtime tick
+    assert store.load()
+    assert store.engine is not first
+    assert store.version != first_version
+    assert set(store.engine.labels) == {'angry', 'calm', 'fearful', 'neutral'}
+    # A request that grabbed the old engine can still finish with it
+    assert first.predict(np.zeros((1, N_FEATURES)))[0][0] in ('happy', 'sad')
+
+
+def test_failed_reload_keeps_current_engine(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    fit_and_export(path, ['happy', 'sad'], seed=0)
+    store = ModelStore(lambda: NumpyMLP.load(path), [path], poll_interval=0)
+    store.load()
+    engine = store.engine
+
+    with open(path, 'wb') as f:
+        f.write(b'half written')
+    assert not store.load()
+    assert store.engine is engine
+    assert store.status()['load_error']
+
+    fit_and_export(path, ['happy', 'sad'], seed=2)
+    assert store.load()
+    assert store.status()['load_error'] is None
+
+
+def test_requests_keep_being_served_during_reloads(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    fit_and_export(path, ['happy', 'sad'], seed=0)
+    store = ModelStore(lambda: NumpyMLP.load(path), [path], poll_interval=0)
+    store.load()
+
+    failures = []
+    done = threading.Event()
+
+    def serve():
+        while not done.is_set():
+            try:
+                store.engine.predict(np.zeros((4, N_FEATURES)))
+            except Exception as e:
+                failures.append(e)
+
+    worker = threading.Thread(target=serve)
+    worker.start()
+    for seed in range(1, 6):
+        fit_and_export(path, ['happy', 'sad'], seed=seed)
+        os.utime(path, ns=(seed, seed))
+        store.load()
+    done.set()
+    worker.join()
+    assert failures == []
@@ -0,0 +1,36 @@
+import time
+
+from profiling import Profiler
+
+
+def busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profile_is_stored_and_summarised(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), token='secret')
+    profile_id = profiler.request_profile('predict', 'secret')
+    assert profile_id is not None
+
+    assert profiler.run(profile_id, busy_work, 1000) == busy_work(1000)
+    assert profiler.path(profile_id) is not None
+    assert [profile['id'] for profile in profiler.list()] == [profile_id]
+    assert 'busy_work' in profiler.summary(profile_id)
+
+
+def test_off_by_default_and_wrong_token_is_ignored(tmp_path):
+    assert Profiler(directory=str(tmp_path)).request_profile('predict', 'anything') is None
+    profiler = Profiler(directory=str(tmp_path), token='secret')
+    assert profiler.request_profile('predict', 'wrong') is None
+    assert profiler.request_profile('predict') is None
+    assert profiler.run(None, busy_work, 10) == busy_work(10)
+    assert profiler.list() == []
+
+
+def test_sampling_rate_and_rotation(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), sample_rate=1.0, max_files=2)
+    for i in range(4):
+        profiler.run(profiler.request_profile(f'run{i}'), busy_work, 10)
+        time.sleep(0.01)
+    assert len(profiler.list()) == 2
+    assert profiler.path('../etc/passwd') is None
@@ -0,0 +1,43 @@
+import librosa
+import numpy as np
+import pytest
+
+from conftest import make_tone
+from features import SAMPLE_RATE, compute_features
+from resampling import QUALITIES, StreamResampler, resample
+
+
+def test_default_matches_librosa():
+    tone = make_tone(sample_rate=44100)
+    expected = librosa.resample(tone, orig_sr=44100, target_sr=SAMPLE_RATE)
+    np.testing.assert_allclose(resample(tone, 44100, SAMPLE_RATE), expected, atol=1e-6)
+
+
+@pytest.mark.parametrize('quality', QUALITIES)
+@pytest.mark.parametrize('orig_sr', [16000, 48000])
+def test_every_quality_gives_close_features(quality, orig_sr):
+    tone = make_tone(sample_rate=orig_sr, duration=2.5)
+    reference = compute_features(resample(tone, orig_sr, SAMPLE_RATE, quality='soxr_vhq'), SAMPLE_RATE)
+    samples = resample(tone, orig_sr, SAMPLE_RATE, quality=quality)
+
+    assert samples.dtype == np.float32
+    assert len(samples) == int(np.ceil(len(tone) * SAMPLE_RATE / orig_sr))
+    features = compute_features(samples, SAMPLE_RATE)
+    assert np.linalg.norm(features - reference) / np.linalg.norm(reference) < 0.1
+
+
+def test_unknown_quality_is_rejected():
+    with pytest.raises(ValueError):
+        resample(np.zeros(10), 16000, SAMPLE_RATE, quality='sinc_best')
+
+
+def test_stream_resampler_matches_whole_signal():
+    tone = make_tone(sample_rate=48000, duration=2.0)
+    stream = StreamResampler(48000, SAMPLE_RATE)
+    chunks = [stream.push(chunk) for chunk in np.array_split(tone, 17)] + [stream.flush()]
+    streamed = np.concatenate(chunks)
+    whole = resample(tone, 48000, SAMPLE_RATE)
+
+    assert abs(len(streamed) - len(whole)) <= 1
+    n = min(len(streamed), len(whole))
+    np.testing.assert_allclose(streamed[1000:n - 1000], whole[1000:n - 1000], atol=1e-3)
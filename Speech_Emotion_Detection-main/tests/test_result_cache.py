@@ -0,0 +1,75 @@
+import pytest
+
+from result_cache import ResultCache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    def make(**options):
+        return ResultCache(backend=request.param, path=str(tmp_path / 'results.sqlite3'), **options)
+    return make
+
+
+def test_hits_and_misses(make_cache):
+    cache = make_cache()
+    assert cache.get('clip', 'v1') is None
+    cache.put('clip', 'v1', ['happy', 87.5])
+    assert list(cache.get('clip', 'v1')) == ['happy', 87.5]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_new_model_version_invalidates(make_cache):
+    cache = make_cache()
+    cache.get('clip', 'v1')
+    cache.put('clip', 'v1', ['happy', 87.5])
+    assert cache.get('clip', 'v2') is None
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['invalidations'] == 1
+
+    # A late result from the replaced model is dropped
+    cache.put('clip', 'v1', ['happy', 87.5])
+    assert cache.stats()['entries'] == 0
+
+
+def test_ttl_and_lru_eviction(make_cache, monkeypatch):
+    import result_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now[0])
+    cache = make_cache(max_entries=2, ttl=60)
+    cache.put('a', 'v1', 1)
+    now[0] += 1
+    cache.put('b', 'v1', 2)
+    now[0] += 1
+    assert cache.get('a', 'v1') == 1  # 'b' is now least recently used
+    now[0] += 1
+    cache.put('c', 'v1', 3)
+    assert cache.get('b', 'v1') is None
+    assert cache.stats()['evicted'] == 1
+
+    now[0] += 120
+    assert cache.get('a', 'v1') is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    first, second = ResultCache(backend='sqlite', path=path), ResultCache(backend='sqlite', path=path)
+    first.put('clip', 'v1', ['calm', 70.0])
+    assert second.get('clip', 'v1') == ['calm', 70.0]
+
+
+def test_sqlite_workers_keep_entries_of_the_new_version(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    first, second = ResultCache(backend='sqlite', path=path), ResultCache(backend='sqlite', path=path)
+    first.put('old', 'v1', ['sad', 60.0])
+    second.get('old', 'v1')
+
+    # The first worker reloads the model and stores a result before the second one notices
+    assert first.get('clip', 'v2') is None
+    first.put('clip', 'v2', ['calm', 70.0])
+    assert second.get('clip', 'v2') == ['calm', 70.0]
+    assert second.get('old', 'v2') is None
+    assert second.stats()['entries'] == 1
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import thread_limits
+
+
+@pytest.fixture(autouse=True)
+def restore_pool_limits(monkeypatch):
+    # configure() limits the pools for the whole process; put them back so
+    # later tests don't run single-threaded
+    monkeypatch.setattr(thread_limits, '_applied', thread_limits._applied)
+    if thread_limits.threadpool_info is None:
+        yield
+        return
+    before = thread_limits.threadpool_info()
+    yield
+    thread_limits.threadpool_limits(limits=before)
+
+
+def test_default_threads_splits_cores_between_jobs():
+    assert thread_limits.default_threads(processes=1, jobs=1, cores=8) == 8
+    assert thread_limits.default_threads(processes=2, jobs=2, cores=8) == 2
+    # Never below one thread, even with more jobs than cores
+    assert thread_limits.default_threads(processes=4, jobs=4, cores=8) == 1
+
+
+def test_configure_exports_limits_without_overriding(monkeypatch):
+    # A throwaway environment, so the exported variables don't outlive the test
+    monkeypatch.setattr(os, 'environ', {'MKL_NUM_THREADS': '3'})
+
+    assert thread_limits.configure(1) == 1
+    assert os.environ['OMP_NUM_THREADS'] == '1'
+    assert os.environ['OPENBLAS_NUM_THREADS'] == '1'
+    assert os.environ['MKL_NUM_THREADS'] == '3'
+
+
+def test_report_shows_effective_pool_sizes():
+    pytest.importorskip('threadpoolctl')
+    import numpy  # noqa: F401 -- loads the BLAS pool
+
+    thread_limits.configure(1)
+    report = thread_limits.report()
+    assert report['intra_op_threads'] == 1
+    assert report['cores'] >= 1
+    assert report['pools'] and all(pool['threads'] == 1 for pool in report['pools'])
+
@@ -0,0 +1,62 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import audio_io
+from audio_io import iter_audio_blocks
+from conftest import make_tone
+from features import SAMPLE_RATE
+from timeline import iter_segments
+
+
+def speech_and_silence():
+    # 6s of tone, 3s of silence, 3s of tone
+    silence = np.zeros(3 * SAMPLE_RATE, dtype=np.float32)
+    return np.concatenate([make_tone(duration=6.0), silence, make_tone(duration=3.0, seed=1)])
+
+
+def wav_bytes(signal, sample_rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    sf.write(buffer, signal, sample_rate, format='WAV')
+    return buffer.getvalue()
+
+
+def test_blocks_cover_the_whole_file():
+    signal = speech_and_silence()
+    blocks = list(iter_audio_blocks(wav_bytes(signal), sr=None, block_seconds=1.0))
+
+    assert all(rate == SAMPLE_RATE for _, rate in blocks)
+    assert max(len(block) for block, _ in blocks) == SAMPLE_RATE
+    np.testing.assert_allclose(np.concatenate([block for block, _ in blocks]), signal, atol=1e-4)
+
+
+def test_blocks_are_resampled_when_requested():
+    signal = make_tone(sample_rate=44100, duration=3.0)
+    total = sum(len(block) for block, _ in iter_audio_blocks(wav_bytes(signal, 44100), sr=SAMPLE_RATE))
+    assert abs(total - 3 * SAMPLE_RATE) <= 2
+
+
+def test_fixed_windows_span_the_recording():
+    segments = list(iter_segments(wav_bytes(speech_and_silence()), block_seconds=0.7))
+
+    assert [segment['end'] for segment in segments] == pytest.approx([2.5, 5.0, 7.5, 10.0, 12.0], abs=0.05)
+    assert all(segment['features'] is not None for segment in segments)
+
+
+def test_vad_marks_silent_windows():
+    signal = speech_and_silence()
+    segments = list(iter_segments(wav_bytes(signal), hop=1.0, vad=True))
+    silent = [segment for segment in segments if segment['features'] is None]
+
+    # Windows that are at least 70% inside the 6s-9s gap
+    assert silent
+    assert all(segment['start'] >= 5.2 and segment['end'] <= 9.8 for segment in silent)
+    assert all(segment['voiced'] < 0.3 for segment in silent)
+
+
+def test_undecodable_input_raises(monkeypatch):
+    monkeypatch.setattr(audio_io, 'FFMPEG_BINARY', None)
+    with pytest.raises(audio_io.DecodeError):
+        list(iter_segments(b'not audio'))
@@ -0,0 +1,89 @@
+"""
+Intra-op thread limits for the BLAS, OpenMP and numba pools.
+
+NumPy's BLAS (OpenBLAS or MKL), OpenMP and numba each start one thread per
+core by default. The server already runs its work in parallel: gunicorn
+processes (WEB_CONCURRENCY), each with INFERENCE_WORKERS job threads, and
+BATCH_WORKERS threads per batch upload. On top of that, per-core pools in
+every process give far more runnable threads than cores, and they spend
+their time spinning and being descheduled.
+
+The budget for one host is
+
+    processes x concurrent jobs per process x INTRA_OP_THREADS <= cores
+
+Feature extraction is mostly single-threaded librosa/NumPy code and scales
+by running more jobs. Only the model's matrix products use intra-op threads,
+and only large batches gain from them. So by default each process gets
+cores // (processes x INFERENCE_WORKERS) threads, at least 1.
+gunicorn.conf.py works this out from its worker count. INTRA_OP_THREADS
+overrides it.
+
+configure() applies the limit to the pools that are already loaded, through
+threadpoolctl. It also exports OMP_NUM_THREADS and the other variables, so
+child processes start with the same limit. A variable that is already set
+in the environment is left alone. report() shows what each pool actually
+uses, and /health includes it.
+"""
+
+import os
+import sys
+
+try:
+    from threadpoolctl import threadpool_info, threadpool_limits
+except ImportError:  # ships with scikit-learn; without it only the environment is set
+    threadpool_info = threadpool_limits = None
+
+from job_queue import INFERENCE_WORKERS
+
+INTRA_OP_THREADS = int(os.environ.get('INTRA_OP_THREADS', 0))  # 0: derive from the core count
+
+# Read by the BLAS/OpenMP/numba runtimes when they load
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS',
+                   'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS', 'NUMBA_NUM_THREADS')
+
+_applied = None
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset/cgroup CPU affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS, Windows
+        return os.cpu_count() or 1
+
+
+def default_threads(processes=1, jobs=INFERENCE_WORKERS, cores=None):
+    """Intra-op threads per process when `processes` processes each run `jobs` jobs at once."""
+    cores = available_cores() if cores is None else cores
+    return max(1, cores // max(1, processes * jobs))
+
+
+def configure(threads=None):
+    """Limit every intra-op pool in this process to `threads` (default INTRA_OP_THREADS or derived)."""
+    global _applied
+    threads = threads or INTRA_OP_THREADS or default_threads()
+    for var in THREAD_ENV_VARS:
+        os.environ.setdefault(var, str(threads))
+    if threadpool_limits is not None:
+        # Called outside a with block, the limit stays in place for the process
+        threadpool_limits(limits=threads)
+    _applied = threads
+    return threads
+
+
+def report():
+    """The configured limit, the environment and the threads each loaded pool uses."""
+    pools = None
+    if threadpool_info is not None:
+        pools = [{'api': pool['user_api'], 'library': pool['internal_api'], 'threads': pool['num_threads']}
+                 for pool in threadpool_info()]
+    numba = sys.modules.get('numba')
+    return {
+        'intra_op_threads': _applied,
+        'cores': available_cores(),
+        'inference_workers': INFERENCE_WORKERS,
+        'env': {var: os.environ.get(var) for var in THREAD_ENV_VARS},
+        'pools': pools,
+        'numba_threads': numba.get_num_threads() if numba is not None else None,
+    }
@@ -0,0 +1,54 @@
+"""
+Emotion timelines for long recordings.
+
+The file is decoded block by block (audio_io.iter_audio_blocks) and fed to the
+streaming extractor, so a recording of any length is decoded once with flat
+memory. It is cut into fixed windows of DURATION seconds, every `hop` seconds
+(non-overlapping by default). In VAD mode, windows whose frames are mostly
+below an energy threshold are reported as silence and never reach the model.
+"""
+
+from audio_io import iter_audio_blocks
+from features import DURATION, SAMPLE_RATE
+from streaming import StreamingFeatureExtractor
+
+DEFAULT_VAD_THRESHOLD_DB = -45.0
+DEFAULT_MIN_VOICED = 0.3
+
+
+class _SegmentExtractor(StreamingFeatureExtractor):
+    # Also records how much of each emitted window is above the VAD threshold
+
+    def __init__(self, vad_threshold_db, **kwargs):
+        super().__init__(**kwargs)
+        self.vad_threshold_db = vad_threshold_db
+
+    def _window(self):
+        time, features = super()._window()
+        return time, features, self.voiced_ratio(self.vad_threshold_db)
+
+
+def iter_segments(source, sr=SAMPLE_RATE, hop=DURATION, vad=False,
+                  vad_threshold_db=DEFAULT_VAD_THRESHOLD_DB, min_voiced=DEFAULT_MIN_VOICED,
+                  block_seconds=10.0):
+    """
+    Yield one dict per window: {'start', 'end', 'voiced', 'features'}.
+    'features' is None for windows that VAD marked as silence.
+    """
+    extractor = None
+
+    def segments(emitted):
+        for end, features, voiced in emitted:
+            yield {
+                'start': round(max(0.0, end - DURATION), 3),
+                'end': round(end, 3),
+                'voiced': round(voiced, 3),
+                'features': None if vad and voiced < min_voiced else features,
+            }
+
+    for samples, sample_rate in iter_audio_blocks(source, sr=sr, block_seconds=block_seconds):
+        if extractor is None:
+            extractor = _SegmentExtractor(vad_threshold_db, sample_rate=sample_rate, hop=hop)
+        yield from segments(extractor.push(samples))
+    if extractor is not None:
+        yield from segments(extractor.flush())
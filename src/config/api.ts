@@ -5,10 +5,41 @@ export const API_CONFIG = {
     : 'http://localhost:5000',
   ENDPOINTS: {
     PREDICT: '/predict',
+    JOBS: '/jobs',
     HEALTH: '/health'
-  }
+  },
+  // Uploads larger than this go through the async job API instead of /predict
+  ASYNC_UPLOAD_BYTES: 5 * 1024 * 1024,
+  JOB_POLL_INTERVAL_MS: 1000,
+  JOB_TIMEOUT_MS: 10 * 60 * 1000
 };
 
 export const getApiUrl = (endpoint: string) => {
   return `${API_CONFIG.BASE_URL}${endpoint}`;
 };
+
+// Submit an upload as an async job and poll until it finishes.
+// Resolves with the job result, or with { error } like /predict does.
+export const runJob = async (formData: FormData) => {
+  const response = await fetch(getApiUrl(API_CONFIG.ENDPOINTS.JOBS), {
+    method: 'POST',
+    body: formData,
+  });
+  const job = await response.json();
+  if (!response.ok) {
+    return { error: job.error || `Job submission failed (${response.status})` };
+  }
+
+  const deadline = Date.now() + API_CONFIG.JOB_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, API_CONFIG.JOB_POLL_INTERVAL_MS));
+    const status = await (await fetch(getApiUrl(job.status_url))).json();
+    if (status.status === 'done') {
+      return status.result;
+    }
+    if (status.status === 'failed' || status.error) {
+      return { error: status.error || 'Job failed' };
+    }
+  }
+  return { error: 'Timed out waiting for the analysis' };
+};
@@ -4,7 +4,7 @@ import { Upload, Mic, Play, Pause, RotateCcw, Download } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Progress } from "@/components/ui/progress";
 import Typewriter from "@/components/Typewriter";
-import { getApiUrl, API_CONFIG } from "@/config/api";
+import { getApiUrl, API_CONFIG, runJob } from "@/config/api";
 
 type EmotionResult = {
   emotion: string;
@@ -71,12 +71,13 @@ const Analyze = () => {
       const formData = new FormData();
       formData.append('file', selectedFile);
       
-      const response = await fetch(getApiUrl(API_CONFIG.ENDPOINTS.PREDICT), {
-        method: 'POST',
-        body: formData,
-      });
-      
-      const data = await response.json();
+      // Large files run as an async job so the request doesn't hit proxy timeouts
+      const data = selectedFile.size > API_CONFIG.ASYNC_UPLOAD_BYTES
+        ? await runJob(formData)
+        : await (await fetch(getApiUrl(API_CONFIG.ENDPOINTS.PREDICT), {
+            method: 'POST',
+            body: formData,
+          })).json();
       
           if (data.error) {
             console.error('API Error:', data.error);